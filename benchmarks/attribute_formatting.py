@@ -0,0 +1,75 @@
+"""Time and memory for building a large tree with the attribute name
+cache turned off, with it on, and with value interning on as well.
+
+    python benchmarks/attribute_formatting.py [--n 1000000]
+
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+import svg_helpers
+from svg_helpers import element
+
+
+def build(n):
+    svg = svg_helpers.make_svg(width=1000, height=1000)
+    for i in range(n):
+        svg.add_element(
+            "circle",
+            cx=i % 1000,
+            cy=i // 1000,
+            r=2.5,
+            fill=f"#{(i % 8) * 32:02x}4080",
+            stroke="none",
+            stroke_width=0.5,
+            fill_opacity=0.8,
+        )
+    return svg
+
+
+def configure(mode):
+    element._name_caches.clear()
+    element._interned_values.clear()
+    element._NAME_CACHE_SIZE = 0 if mode == "no name cache" else 1024
+    element.Element.intern_attribute_values = mode == "interning"
+
+
+def measure(mode, n):
+    configure(mode)
+    gc.collect()
+    start = time.perf_counter()
+    svg = build(n)
+    seconds = time.perf_counter() - start
+    del svg
+
+    configure(mode)
+    gc.collect()
+    tracemalloc.start()
+    svg = build(n)
+    megabytes = tracemalloc.get_traced_memory()[0] / 1e6
+    tracemalloc.stop()
+    del svg
+    return seconds, megabytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"{args.n:,} <circle> elements, 7 attributes each")
+    baseline = None
+    for mode in ("no name cache", "name cache", "interning"):
+        seconds, megabytes = measure(mode, args.n)
+        baseline = baseline or (seconds, megabytes)
+        print(
+            f"{mode:>14}: {seconds:6.2f} s ({seconds / baseline[0]:.0%})"
+            f"  {megabytes:8.1f} MB ({megabytes / baseline[1]:.0%})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,500 @@
+"""Benchmarks for the library's hot paths.
+
+    python benchmarks/run.py                  # run all, compare to baseline
+    python benchmarks/run.py -k to_string     # only names containing this
+    python benchmarks/run.py --save-baseline  # store results as the baseline
+
+Each benchmark reports the best wall time over `--repeat` runs and the
+peak memory allocated (per `tracemalloc`) during one more run. Results
+are written as JSON to `--output`, then compared against `--baseline`:
+a benchmark that got slower, or allocates more, by more than
+`--threshold` (a fraction, 0.25 = 25%) counts as a regression, and the
+script exits with status 1.
+
+Timings depend on the machine, so only compare against a baseline
+recorded on the same one. `make bench` and `make bench-baseline` wrap
+the two common invocations.
+
+"""
+
+import argparse
+import concurrent.futures
+import contextlib
+import copy
+import gc
+import json
+import os
+import pathlib
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+from xml.etree import ElementTree
+
+import shapely
+
+import svg_helpers
+from svg_helpers.recipes import make_text
+from svg_helpers.shapely_helpers import (
+    Viewport,
+    make_path,
+    make_paths_from_shape,
+)
+
+HERE = pathlib.Path(__file__).parent
+
+BENCHMARKS = {}
+
+
+def benchmark(setup):
+    """Register a benchmark. `setup` builds the inputs and returns the
+    zero-argument function to measure, or yields it, to clean up once
+    it's measured.
+
+    """
+    BENCHMARKS[setup.__name__.removeprefix("bench_")] = setup
+    return setup
+
+
+def big_ring():
+    return shapely.Point(0, 0).buffer(100, quad_segs=25_000).exterior
+
+
+def big_multipolygon():
+    return shapely.MultiPolygon(
+        [
+            shapely.Point(i * 3, j * 3).buffer(1, quad_segs=16)
+            for i in range(40)
+            for j in range(50)
+        ]
+    )
+
+
+def big_tree(n=20_000, make_svg=svg_helpers.make_svg):
+    svg = make_svg(width=1000, height=1000)
+    for i in range(n // 10):
+        g = svg.add_element("g", id=f"g{i}", transform=f"translate({i},0)")
+        for j in range(9):
+            g.add_element("circle", cx=j, cy=i, r=1.5, fill="steelblue")
+    svg.recipes.add_text("a\nfew\nlines", x=10, y=10)
+    return svg
+
+
+@benchmark
+def bench_make_path():
+    coords = big_ring().coords
+    return lambda: make_path(coords, closed=True)
+
+
+@benchmark
+def bench_make_path_precision():
+    coords = big_ring().coords
+    return lambda: make_path(coords, closed=True, precision=2)
+
+
+@benchmark
+def bench_make_path_compact():
+    coords = big_ring().coords
+    return lambda: make_path(coords, closed=True, precision=2, compact=True)
+
+
+@benchmark
+def bench_make_paths_from_multipolygon():
+    shape = big_multipolygon()
+    return lambda: make_paths_from_shape(shape, precision=2)
+
+
+@benchmark
+def bench_make_paths_in_processes():
+    shape = big_multipolygon()
+    with concurrent.futures.ProcessPoolExecutor() as executor:
+        make_paths_from_shape(shape, executor=executor)  # start the workers
+        yield lambda: make_paths_from_shape(
+            shape, precision=2, executor=executor
+        )
+
+
+@benchmark
+def bench_make_paths_from_geojson():
+    decoded = json.loads(shapely.to_geojson(big_multipolygon()))
+    return lambda: svg_helpers.geojson.make_paths_from_geojson(
+        decoded, precision=2
+    )
+
+
+@benchmark
+def bench_make_paths_from_wkb():
+    wkb = shapely.to_wkb(big_multipolygon())
+    return lambda: svg_helpers.buffers.make_paths_from_wkb(wkb, precision=2)
+
+
+@benchmark
+def bench_make_paths_from_ragged_array():
+    ragged = shapely.to_ragged_array(list(big_multipolygon().geoms))
+    return lambda: svg_helpers.buffers.make_paths_from_ragged_array(
+        *ragged, precision=2
+    )
+
+
+@benchmark
+def bench_make_paths_simplified():
+    shape = big_multipolygon()
+    return lambda: make_paths_from_shape(shape, precision=1, simplify=True)
+
+
+@benchmark
+def bench_make_paths_topology():
+    # A grid of adjacent, wiggly cells: every border is shared.
+    shape = shapely.MultiPolygon(
+        [
+            shapely.box(i, j, i + 1, j + 1).segmentize(0.02)
+            for i in range(40)
+            for j in range(25)
+        ]
+    )
+    return lambda: make_paths_from_shape(
+        shape, precision=1, simplify=True, topology=True
+    )
+
+
+@benchmark
+def bench_add_shape_viewport():
+    shape = big_multipolygon()
+
+    def run():
+        svg = svg_helpers.make_svg(viewBox="20 20 40 40")
+        svg.add_shape(shape, viewport=Viewport.from_svg(svg, clip=True))
+
+    return run
+
+
+@benchmark
+def bench_export_tiles():
+    features = [
+        (polygon, {"fill": "steelblue"})
+        for polygon in big_multipolygon().geoms
+    ]
+    directory = tempfile.mkdtemp()
+    return lambda: svg_helpers.tiles.export_tiles(
+        features,
+        directory,
+        bounds=(-2, -2, 126, 126),
+        zooms=range(3),
+        precision=1,
+        processes=0,
+    )
+
+
+@benchmark
+def bench_make_paths_from_geometry_collection():
+    shape = shapely.GeometryCollection(
+        [
+            big_multipolygon(),
+            shapely.MultiLineString(
+                [[(i, 0), (i, 50), (i + 1, 100)] for i in range(1000)]
+            ),
+            shapely.MultiPoint([(i, i) for i in range(1000)]),
+        ]
+    )
+    return lambda: make_paths_from_shape(shape, precision=2)
+
+
+@benchmark
+def bench_add_element_fan_out():
+    def run():
+        svg = svg_helpers.make_svg(width=100, height=100)
+        for i in range(20_000):
+            svg.add_element("circle", cx=i, cy=i, r=2, stroke_width=0.5)
+
+    return run
+
+
+@benchmark
+def bench_add_shapes():
+    features = [
+        (shapely.Point(i % 200, i // 200).buffer(0.4, quad_segs=2), i % 5)
+        for i in range(20_000)
+    ]
+    colors = ["#ccc", "#c00", "#0c0", "#00c", "#cc0"]
+
+    def run():
+        svg = svg_helpers.make_svg(width=100, height=100)
+        svg.add_shapes(
+            features,
+            attributes=lambda i: {"fill": colors[i], "stroke": "white"},
+            precision=2,
+            group=True,
+        )
+
+    return run
+
+
+@benchmark
+def bench_add_from_string():
+    markup = [
+        f'<text x="{i}" y="20" class="label">Label <tspan>{i}</tspan></text>'
+        for i in range(200)
+    ]
+
+    def run():
+        svg = svg_helpers.make_svg(width=100, height=100)
+        for _ in range(20):
+            for fragment in markup:
+                svg.add_from_string(fragment)
+
+    return run
+
+
+@benchmark
+def bench_add_stamp():
+    stamp = svg_helpers.Stamp(
+        '<g transform="translate({x},{y})" class="marker">'
+        '<circle r="3" fill="{color}" stroke="black" />'
+        "</g>"
+    )
+
+    def run():
+        svg = svg_helpers.make_svg(width=100, height=100)
+        for i in range(20_000):
+            svg.add_stamp(stamp, x=i, y=i, color="red")
+
+    return run
+
+
+@benchmark
+def bench_make_text_many_lines():
+    text = "\n".join(f"line number {i}" for i in range(20_000))
+    return lambda: make_text(text, x=10, y=10, vertical_align="middle")
+
+
+@benchmark
+def bench_to_string_compact():
+    svg = big_tree()
+    return lambda: svg.to_string()
+
+
+@benchmark
+def bench_to_string_pretty():
+    svg = big_tree()
+    return lambda: svg.to_string(pretty=True)
+
+
+def path_tree():
+    svg = svg_helpers.make_svg(width=1000, height=1000)
+    for polygon in big_multipolygon().geoms:
+        svg.add_shape(polygon, precision=2, fill="steelblue", stroke="white")
+    return svg
+
+
+@benchmark
+def bench_to_string_paths():
+    svg = path_tree()
+    return lambda: svg.to_string()
+
+
+@benchmark
+def bench_to_string_paths_element_tree():
+    # What `to_string` used to cost, for comparison.
+    svg = path_tree()
+    return lambda: ElementTree.tostring(svg, encoding="unicode")
+
+
+@benchmark
+def bench_save():
+    svg = big_tree()
+    directory = tempfile.mkdtemp()
+    target = pathlib.Path(directory) / "bench.svg"
+    return lambda: svg.save(target)
+
+
+@benchmark
+def bench_deduplicate():
+    svg = svg_helpers.make_svg(width=1000, height=1000)
+    for i in range(2_000):
+        g = svg.add_element("g", transform=f"translate({i},0)", class_="icon")
+        for j in range(9):
+            g.add_element("circle", cx=j, r=1.5, fill="steelblue")
+    copies = [copy.deepcopy(svg) for _ in range(20)]
+    return lambda: svg_helpers.optimize.deduplicate(copies.pop())
+
+
+@benchmark
+def bench_extract_classes():
+    svg = svg_helpers.make_svg(width=1000, height=1000)
+    for i in range(20_000):
+        svg.add_element(
+            "path",
+            d=f"M{i},0L{i},10Z",
+            fill=["#ccc", "#c00", "#0c0", "#00c"][i % 4],
+            stroke="white",
+            stroke_width=0.5,
+        )
+    copies = [copy.deepcopy(svg) for _ in range(20)]
+    return lambda: svg_helpers.optimize.extract_classes(copies.pop())
+
+
+@benchmark
+def bench_build_tree():
+    # Its memory is the size of a 100k-node `Element` tree.
+    return lambda: big_tree(100_000)
+
+
+@benchmark
+def bench_build_compact_tree():
+    # The same tree, in the compact backend.
+    return lambda: big_tree(100_000, svg_helpers.compact.make_svg)
+
+
+@benchmark
+def bench_to_string_compact_tree():
+    svg = big_tree(make_svg=svg_helpers.compact.make_svg)
+    return lambda: svg.to_string()
+
+
+@benchmark
+def bench_to_string_cached_tree():
+    # A big static tree and a small overlay that changes every time.
+    svg = big_tree(make_svg=svg_helpers.cached.make_svg)
+    overlay = svg.add_element("g", id="overlay")
+
+    def run():
+        overlay.clear()
+        overlay.add_element("circle", cx=500, cy=500, r=10)
+        return svg.to_string()
+
+    return run
+
+
+@benchmark
+def bench_content_hash():
+    svg = big_tree()
+    return lambda: svg.content_hash()
+
+
+@benchmark
+def bench_diff():
+    # 100k nodes, with a few changes.
+    old = big_tree(100_000)
+    new = copy.deepcopy(old)
+    new[10].set("transform", "scale(2)")
+    new[20][3].set("r", "2")
+    new.remove(new[30])
+    moved = new[40]
+    new.remove(moved)
+    new.append(moved)
+    return lambda: svg_helpers.diff.diff(old, new)
+
+
+@benchmark
+def bench_deepcopy():
+    svg = big_tree()
+    return lambda: copy.deepcopy(svg)
+
+
+def measure(setup, repeat):
+    func = setup()
+    if isinstance(func, types.GeneratorType):
+        with contextlib.closing(func) as cleanup:
+            return _measure(next(cleanup), repeat)
+    return _measure(func, repeat)
+
+
+def _measure(func, repeat):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": min(times), "peak_bytes": peak}
+
+
+def compare(results, baseline, threshold):
+    """Print a comparison table and return the names of benchmarks that
+    regressed.
+
+    """
+    regressions = []
+    print(f"\n{'benchmark':<40} {'time':>9} {'vs base':>8} {'memory':>9}")
+    for name, result in results.items():
+        seconds = result["seconds"]
+        megabytes = result["peak_bytes"] / 1e6
+        line = f"{name:<40} {seconds * 1e3:7.1f}ms"
+        base = baseline.get(name)
+        if base is None:
+            print(f"{line} {'(new)':>8} {megabytes:7.1f}MB")
+            continue
+        time_ratio = seconds / base["seconds"]
+        memory_ratio = result["peak_bytes"] / max(base["peak_bytes"], 1)
+        flags = []
+        if time_ratio > 1 + threshold:
+            flags.append("SLOWER")
+        if memory_ratio > 1 + threshold:
+            flags.append("MORE MEMORY")
+        if flags:
+            regressions.append(name)
+        print(
+            f"{line} {time_ratio:7.0%} {megabytes:7.1f}MB"
+            f" {memory_ratio:5.0%} {' '.join(flags)}"
+        )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("-k", default="", help="only run names containing")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument(
+        "--output", type=pathlib.Path, default=HERE / "results.json"
+    )
+    parser.add_argument(
+        "--baseline", type=pathlib.Path, default=HERE / "baseline.json"
+    )
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if args.k in name:
+            print(f"running {name}", file=sys.stderr)
+            results[name] = measure(setup, args.repeat)
+
+    document = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "svg_helpers": svg_helpers.__version__,
+        "results": results,
+    }
+    args.output.write_text(json.dumps(document, indent=2) + "\n")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(document, indent=2) + "\n")
+        print(f"saved baseline to {args.baseline}")
+        return 0
+
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())["results"]
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\nregressed by more than {args.threshold:.0%}:")
+        for name in regressions:
+            print(f"  {name}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,8 +15,18 @@ print(svg)
 
 from importlib.metadata import version
 
-from svg_helpers import recipes  # noqa: F401  (re-exported for users)
+from svg_helpers import (
+    buffers,  # noqa: F401  (re-exported for users)
+    cached,  # noqa: F401  (re-exported for users)
+    compact,  # noqa: F401  (re-exported for users)
+    diff,  # noqa: F401  (re-exported for users)
+    geojson,  # noqa: F401  (re-exported for users)
+    optimize,  # noqa: F401  (re-exported for users)
+    recipes,  # noqa: F401  (re-exported for users)
+    tiles,  # noqa: F401  (re-exported for users)
+)
 from svg_helpers.element import Element
+from svg_helpers.stamp import Stamp  # noqa: F401  (re-exported for users)
 
 __version__ = version("svg-helpers")
 
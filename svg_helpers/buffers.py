@@ -0,0 +1,340 @@
+"""Make svg paths from geometries in binary buffers, without shapely.
+
+Two encodings are read directly:
+
+- WKB (and PostGIS EWKB), one geometry per blob, with
+  `make_paths_from_wkb`.
+- Flat coordinate buffers with offset arrays, the "native" GeoArrow
+  layout that `shapely.to_ragged_array` also produces, with
+  `make_paths_from_ragged_array`.
+
+Both give the same paths as `make_paths_from_shape` for the same
+geometries. Coordinates are read as NumPy views of the buffer when NumPy
+is installed, and all the numbers of a call are formatted together, so
+there's no Python object per coordinate along the way. For example:
+
+```python3
+from svg_helpers.buffers import make_paths_from_wkb
+
+for blob, color in rows:
+    group = svg.add_element("g", fill=color)
+    for d in make_paths_from_wkb(blob, precision=2):
+        group.add_element("path", d=d)
+```
+
+"""
+
+import itertools
+import math
+import struct
+
+from svg_helpers.shapely_helpers import (
+    _np,
+    _strip_trailing_zeros,
+    _validate_precision,
+    make_path,
+)
+
+# Geometry type codes, as in WKB and `shapely.GeometryType`.
+_POINT, _LINESTRING, _POLYGON = 1, 2, 3
+_MULTIPOINT, _MULTILINESTRING, _MULTIPOLYGON, _COLLECTION = 4, 5, 6, 7
+
+_RAGGED_TYPES = {
+    0: _POINT,
+    1: _LINESTRING,
+    3: _POLYGON,
+    4: _MULTIPOINT,
+    5: _MULTILINESTRING,
+    6: _MULTIPOLYGON,
+    "point": _POINT,
+    "linestring": _LINESTRING,
+    "polygon": _POLYGON,
+    "multipoint": _MULTIPOINT,
+    "multilinestring": _MULTILINESTRING,
+    "multipolygon": _MULTIPOLYGON,
+}
+
+# EWKB flags in the geometry type.
+_EWKB_Z = 0x80000000
+_EWKB_M = 0x40000000
+_EWKB_SRID = 0x20000000
+
+
+def make_paths_from_wkb(data, precision=None, compact=False) -> list:
+    """Make a list of svg path values that will draw a geometry given as
+    WKB: `bytes`, or anything else with the buffer protocol (a
+    `memoryview` into a bigger buffer, say). ISO and extended (PostGIS)
+    WKB with z and m values are read; z and m are ignored, as in
+    `make_path`.
+
+    The result is the same as `make_paths_from_shape(shapely.from_wkb(data))`.
+    Raises ValueError if the data isn't valid WKB.
+
+    """
+    _validate_precision(precision)
+    reader = _WKBReader(memoryview(data).cast("B"))
+    try:
+        paths = reader.read_geometry()
+    except (struct.error, ValueError, IndexError) as exc:
+        raise ValueError(f"invalid WKB: {exc}") from exc
+    if reader.position != len(reader.data):
+        raise ValueError(
+            f"invalid WKB: {len(reader.data) - reader.position} bytes left "
+            f"over"
+        )
+    result = _format_paths(reader.coordinates, paths, precision, compact)
+    return result or [""]
+
+
+def make_paths_from_ragged_array(
+    geometry_type, coordinates, offsets=(), precision=None, compact=False
+) -> list:
+    """Make the svg path values for each geometry of a column stored as
+    one coordinate buffer with offset arrays, the layout of GeoArrow's
+    native encodings. Returns one list of paths per geometry, each the
+    same as `make_paths_from_shape` gives for that geometry (`[""]` if
+    it's empty). For example:
+
+    ```python3
+    paths = make_paths_from_ragged_array(*shapely.to_ragged_array(shapes))
+    ```
+
+    The arguments are as returned by `shapely.to_ragged_array`:
+
+    - `geometry_type` is a `shapely.GeometryType` or its name, e.g.
+      `"multipolygon"`; all the geometries have this type.
+    - `coordinates` is an (n, 2+) array of interleaved coordinates, or a
+      sequence of per-dimension arrays `(xs, ys, ...)`.
+    - `offsets` are the offset arrays, innermost first: for polygons,
+      where each ring starts in `coordinates`, then where each
+      polygon starts in the rings. Points have none.
+
+    An empty point is stored as NaN coordinates.
+
+    """
+    _validate_precision(precision)
+    if _np is None:
+        raise ImportError("make_paths_from_ragged_array needs NumPy")
+    key = geometry_type
+    if isinstance(key, str):
+        key = key.lower()
+    if key not in _RAGGED_TYPES:
+        raise ValueError(f"unsupported geometry type {geometry_type!r}")
+    kind = _RAGGED_TYPES[key]
+
+    if isinstance(coordinates, (list, tuple)):
+        coordinates = _np.stack(coordinates[:2], axis=1)
+    coordinates = _np.asarray(coordinates, dtype=float)[:, :2]
+    offsets = [_np.asarray(o).tolist() for o in offsets]
+    expected = {_POINT: 0, _LINESTRING: 1, _MULTIPOINT: 1, _POLYGON: 2}
+    expected.update({_MULTILINESTRING: 2, _MULTIPOLYGON: 3})
+    if len(offsets) != expected[kind]:
+        raise ValueError(
+            f"{expected[kind]} offset arrays expected for "
+            f"{geometry_type!r}, got {len(offsets)}"
+        )
+
+    if kind in (_POINT, _MULTIPOINT):
+        empty = _np.isnan(coordinates).all(axis=1).tolist()
+        points = [
+            [[(i, i + 1, True)]] if not empty[i] else []
+            for i in range(len(coordinates))
+        ]
+        if kind == _POINT:
+            geometries = points
+        else:
+            geometries = _nest(points, offsets[0])
+    else:
+        # Lines and rings as runs of coordinates, then as paths: a line
+        # on its own, or the rings of a polygon together.
+        closed = kind in (_POLYGON, _MULTIPOLYGON)
+        bounds = offsets[0]
+        runs = [
+            (start, stop, closed) for start, stop in itertools.pairwise(bounds)
+        ]
+        if closed:
+            paths = [
+                [run for run in runs[start:stop] if run[0] < run[1]]
+                for start, stop in itertools.pairwise(offsets[1])
+            ]
+            paths = [[path] if path else [] for path in paths]
+            levels = offsets[2:]
+        else:
+            paths = [[[run]] if run[0] < run[1] else [] for run in runs]
+            levels = offsets[1:]
+        geometries = paths
+        for level in levels:
+            geometries = _nest(geometries, level)
+
+    flat = [path for geometry in geometries for path in geometry]
+    formatted = iter(_format_paths(coordinates, flat, precision, compact))
+    return [
+        [next(formatted) for _ in geometry] or [""] for geometry in geometries
+    ]
+
+
+def _nest(parts, bounds):
+    """Group the lists of paths of `parts` by the offsets `bounds`."""
+    return [
+        [path for part in parts[start:stop] for path in part]
+        for start, stop in itertools.pairwise(bounds)
+    ]
+
+
+def _format_paths(coordinates, paths, precision, compact):
+    """Format paths, each a list of `(start, stop, closed)` runs of
+    points in `coordinates`: an (n, 2) array, or with no NumPy a flat
+    list `[x0, y0, x1, y1, ...]`.
+
+    All the points are formatted by one `%` operation, and then trailing
+    zeros are stripped from all of them together, the same way
+    `make_path` formats each path's points.
+
+    """
+    if not paths:
+        return []
+    if compact:
+        return [
+            "".join(
+                make_path(
+                    _slice(coordinates, start, stop),
+                    closed=closed,
+                    precision=precision,
+                    compact=True,
+                )
+                for start, stop, closed in path
+            )
+            for path in paths
+        ]
+
+    if _np is not None:
+        flat = coordinates.ravel().tolist()
+    else:
+        flat = coordinates
+    spec = "%s" if precision is None else f"%.{precision}f"
+    text = f"{spec},{spec} " * (len(flat) // 2) % tuple(flat)
+    if precision:
+        text = _strip_trailing_zeros(text, precision, ", ")
+    points = text.split()
+    return [
+        "".join(
+            "M" + "L".join(points[start:stop]) + ("Z" if closed else "")
+            for start, stop, closed in path
+        )
+        for path in paths
+    ]
+
+
+def _slice(coordinates, start, stop):
+    if _np is not None:
+        return coordinates[start:stop]
+    return list(
+        zip(
+            coordinates[2 * start : 2 * stop : 2],
+            coordinates[2 * start + 1 : 2 * stop : 2],
+            strict=True,
+        )
+    )
+
+
+class _WKBReader:
+    """Reads WKB into coordinates and the paths made of them.
+
+    `read_geometry` returns the paths, each a list of `(start, stop,
+    closed)` runs of points, and `coordinates` has the x, y coordinates
+    of all the points, lines and rings read, in order: an (n, 2) array
+    (a flat list without NumPy).
+
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+        self.chunks = []
+        self.count = 0
+
+    @property
+    def coordinates(self):
+        if _np is None:
+            return [v for chunk in self.chunks for v in chunk]
+        if not self.chunks:
+            return _np.empty((0, 2))
+        return _np.concatenate(self.chunks)
+
+    def read_geometry(self):
+        byte_order = self.data[self.position]
+        if byte_order not in (0, 1):
+            raise ValueError(f"bad byte order {byte_order}")
+        order = "<" if byte_order else ">"
+        (code,) = struct.unpack_from(order + "I", self.data, self.position + 1)
+        self.position += 5
+        if code & _EWKB_SRID:
+            self.position += 4
+        dimensions = 2 + bool(code & _EWKB_Z) + bool(code & _EWKB_M)
+        code &= 0xFFFF
+        # ISO WKB: 1000s for z, 2000s for m, 3000s for both.
+        dimensions += (0, 1, 1, 2)[code // 1000]
+        kind = code % 1000
+
+        if kind == _POINT:
+            start = self.count
+            self.read_points(order, 1, dimensions)
+            if self.last_is_nan():
+                # An empty point
+                self.chunks.pop()
+                self.count -= 1
+                return []
+            return [[(start, start + 1, True)]]
+        if kind in (_LINESTRING, _POLYGON):
+            closed = kind == _POLYGON
+            rings = 1 if kind == _LINESTRING else self.read_count(order)
+            runs = []
+            for _ in range(rings):
+                start = self.count
+                self.read_points(order, self.read_count(order), dimensions)
+                if self.count > start:
+                    runs.append((start, self.count, closed))
+            return [runs] if runs else []
+        if _MULTIPOINT <= kind <= _COLLECTION:
+            return [
+                path
+                for _ in range(self.read_count(order))
+                for path in self.read_geometry()
+            ]
+        raise ValueError(f"unknown geometry type {code}")
+
+    def read_count(self, order):
+        (count,) = struct.unpack_from(order + "I", self.data, self.position)
+        self.position += 4
+        return count
+
+    def read_points(self, order, count, dimensions):
+        size = 8 * count * dimensions
+        if self.position + size > len(self.data):
+            raise ValueError("data ends in the middle of a geometry")
+        if _np is not None:
+            values = _np.frombuffer(
+                self.data,
+                dtype=order + "f8",
+                count=count * dimensions,
+                offset=self.position,
+            )
+            chunk = values.reshape(count, dimensions)[:, :2]
+        else:
+            values = struct.unpack_from(
+                f"{order}{count * dimensions}d", self.data, self.position
+            )
+            chunk = [
+                v
+                for i in range(0, len(values), dimensions)
+                for v in values[i : i + 2]
+            ]
+        self.chunks.append(chunk)
+        self.position += size
+        self.count += count
+
+    def last_is_nan(self):
+        chunk = self.chunks[-1]
+        if _np is not None:
+            return bool(_np.isnan(chunk).all())
+        return all(map(math.isnan, chunk))
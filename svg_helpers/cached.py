@@ -0,0 +1,265 @@
+"""Elements that keep their markup between calls to `to_string`.
+
+A document that is written over and over, with only a small part of it
+changing in between, is mostly written the same way every time. A
+`CachedElement` tree keeps the markup of each subtree written, and
+writes it again from there until something in that subtree changes:
+
+```python3
+from svg_helpers import cached
+
+svg = cached.make_svg(width=1000, height=1000)
+base = svg.add_element("g", id="base")
+for shape in shapes:
+    base.add_shape(shape, precision=1)
+overlay = svg.add_element("g", id="overlay")
+
+while True:
+    overlay.clear()
+    overlay.add_element("circle", cx=x, cy=y, r=5)
+    svg.save("dashboard.svg")  # `base` is written once, and reused
+```
+
+Changes through the element methods (`set`, `append`, `remove`, the
+`add_*` methods, ...), through `attrib`, and to `tag`, `text` and
+`tail` drop the markup kept for the element and its ancestors; the
+markup of the rest of the tree is kept. Markup is kept per set of `to_string`
+options, and per depth for `pretty` output, so a subtree moved to
+another depth is written again at the new depth.
+
+Some things aren't tracked, and their markup isn't kept (or goes stale):
+
+- Subtrees with elements that aren't `CachedElement`, like
+  `ElementTree.Comment`, or with Clark-notation (`{uri}name`) names,
+  whose prefixes depend on the rest of the document, aren't kept.
+- `ElementTree.SubElement` adds a child without going through `append`.
+- An element should be in one tree at a time: a copy made by
+  `copy.copy` shares its children with the original, and only the
+  last one they were added to sees their changes. `copy.deepcopy` is
+  fine.
+
+`content_hash` hashes the kept markup too, and keeps the digest until
+something in the subtree changes, so an unchanged document's ETag costs
+a lookup.
+
+The markup kept takes about as much memory as the document, times the
+depth of the tree, and it's only kept for elements with children.
+
+"""
+
+from __future__ import annotations
+
+import copy as _copy
+from xml.etree import ElementTree
+
+from svg_helpers.element import Element
+
+_tag = ElementTree.Element.tag
+_text = ElementTree.Element.text
+_tail = ElementTree.Element.tail
+_attrib = ElementTree.Element.attrib
+
+
+class _TrackedAttrib(dict):
+    """The `attrib` of a `CachedElement`, which tells the element when
+    it's changed.
+
+    """
+
+    __slots__ = ("owner",)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.owner._changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.owner._changed()
+
+    def __ior__(self, other):
+        super().__ior__(other)
+        self.owner._changed()
+        return self
+
+    def clear(self):
+        super().clear()
+        self.owner._changed()
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self.owner._changed()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self.owner._changed()
+        return item
+
+    def setdefault(self, key, default=None):
+        value = super().setdefault(key, default)
+        self.owner._changed()
+        return value
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.owner._changed()
+
+    # Copies are plain dicts, with no owner to tell.
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return _copy.deepcopy(dict(self), memo)
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+class CachedElement(Element):
+    """An `Element` that keeps the markup of its subtree when it's
+    written, until the subtree changes. See `svg_helpers.cached`.
+
+    """
+
+    # Read by `svg_helpers.serialize` to keep and reuse the markup.
+    caches_markup = True
+
+    def _changed(self):
+        """Drop the markup kept for this element and its ancestors."""
+        state = self.__dict__
+        state.pop("_markup", None)
+        parent = state.get("_parent")
+        # Markup is kept for an element only if it's kept for all its
+        # children with children, so an ancestor without any means
+        # there's none further up.
+        while parent is not None:
+            state = parent.__dict__
+            if state.pop("_markup", None) is None:
+                break
+            parent = state.get("_parent")
+
+    def _adopt(self, child):
+        if isinstance(child, CachedElement):
+            child.__dict__["_parent"] = self
+
+    def _orphan(self, child):
+        # A child moved to another parent before being removed here
+        # keeps its new parent.
+        if (
+            isinstance(child, CachedElement)
+            and child.__dict__.get("_parent") is self
+        ):
+            del child.__dict__["_parent"]
+
+    @property
+    def tag(self):
+        return _tag.__get__(self)
+
+    @tag.setter
+    def tag(self, value):
+        _tag.__set__(self, value)
+        self._changed()
+
+    @property
+    def text(self):
+        return _text.__get__(self)
+
+    @text.setter
+    def text(self, value):
+        _text.__set__(self, value)
+        self._changed()
+
+    @property
+    def tail(self):
+        return _tail.__get__(self)
+
+    @tail.setter
+    def tail(self, value):
+        _tail.__set__(self, value)
+        # The tail is written by the parent.
+        parent = self.__dict__.get("_parent")
+        if parent is not None:
+            parent._changed()
+
+    @property
+    def attrib(self):
+        attrib = _attrib.__get__(self)
+        if type(attrib) is not _TrackedAttrib:
+            attrib = _TrackedAttrib(attrib)
+            attrib.owner = self
+            _attrib.__set__(self, attrib)
+        return attrib
+
+    @attrib.setter
+    def attrib(self, value):
+        attrib = _TrackedAttrib(value)
+        attrib.owner = self
+        _attrib.__set__(self, attrib)
+        self._changed()
+
+    def set(self, key, value):
+        super().set(key, value)
+        self._changed()
+
+    def append(self, subelement):
+        super().append(subelement)
+        self._adopt(subelement)
+        self._changed()
+
+    def extend(self, elements):
+        elements = list(elements)
+        super().extend(elements)
+        for child in elements:
+            self._adopt(child)
+        self._changed()
+
+    def insert(self, index, subelement):
+        super().insert(index, subelement)
+        self._adopt(subelement)
+        self._changed()
+
+    def remove(self, subelement):
+        super().remove(subelement)
+        self._orphan(subelement)
+        self._changed()
+
+    def clear(self):
+        for child in self:
+            self._orphan(child)
+        super().clear()
+        self._changed()
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            for child in self[index]:
+                self._orphan(child)
+            value = list(value)
+            super().__setitem__(index, value)
+            for child in value:
+                self._adopt(child)
+        else:
+            self._orphan(self[index])
+            super().__setitem__(index, value)
+            self._adopt(value)
+        self._changed()
+
+    def __delitem__(self, index):
+        children = self[index]
+        if not isinstance(index, slice):
+            children = [children]
+        super().__delitem__(index)
+        for child in children:
+            self._orphan(child)
+        self._changed()
+
+
+def make_svg(**attributes) -> CachedElement:
+    """Like `svg_helpers.make_svg`, but returns a `CachedElement`:
+    `CachedElement("svg", **attributes)`, with the svg `xmlns` added.
+
+    """
+    defaults = {
+        "xmlns": "http://www.w3.org/2000/svg",
+    }
+    combined = {**defaults, **attributes}
+    return CachedElement("svg", **combined)
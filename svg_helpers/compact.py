@@ -0,0 +1,803 @@
+"""A compact tree backend for very large documents.
+
+Every `Element` is a full Python object with its own `attrib` dict, a
+few hundred bytes per node. A `CompactElement` tree keeps its nodes in
+shared arrays instead: a few integers per node for the tag and the
+links to its first child and next sibling, and the attribute values in
+one list, with the attribute names stored once for all the nodes that
+have the same names in the same order. Build it with the same methods
+as an `Element` tree:
+
+```python3
+from svg_helpers import compact
+
+svg = compact.make_svg(width=1000, height=1000)
+layer = svg.add_element("g", fill="steelblue")
+for shape in shapes:
+    layer.add_shape(shape, precision=1)
+svg.save("map.svg")
+```
+
+The output is the same as for the same `Element` tree. A
+`CompactElement` is only a handle on a node (as are the ones
+`add_element` and the other `add_*` methods return), so it costs
+nothing once it's dropped.
+
+Anything else an `Element` has (`find`, `iter`, `attrib`, ...) works
+too, by first converting the node and its subtree into `Element`
+objects, which then take their place in the tree: `element` does the
+conversion, and the tree keeps using (and writing) those objects from
+then on. Convert small subtrees rather than the whole document, or the
+memory savings are gone.
+
+"""
+
+from __future__ import annotations
+
+import hashlib
+from array import array
+from xml.etree import ElementTree
+
+from svg_helpers import serialize
+from svg_helpers.element import (
+    Element,
+    _as_viewport,
+    _intern_value,
+)
+from svg_helpers.serialize import DEFAULT_CHUNK_SIZE
+from svg_helpers.shapely_helpers import make_paths_from_shape
+
+# Pieces of markup collected before `_iter_markup` joins them.
+_PIECES_PER_JOIN = 64
+
+
+class _Store:
+    """The nodes of one compact tree. Node `i` has tag
+    `tags[tag[i]]`, attribute names `layouts[layout[i]]` and their
+    values at `values[start[i]:]`, and its children are `first[i]`,
+    `next[first[i]]`, ..., linked until -1. Text and tails are in
+    dicts, since most nodes have neither.
+
+    Nodes converted to `Element` objects are in `elements`, and their
+    entries in the arrays aren't used any more.
+
+    """
+
+    def __init__(self, element_class):
+        self.element_class = element_class
+        # Only used to format attributes the way `element_class` does.
+        self.prototype = element_class.__new__(element_class)
+        self.tags = []
+        self.tag_ids = {}
+        self.layouts = []
+        self.layout_ids = {}
+        self.tag = array("i")
+        self.layout = array("i")
+        self.start = array("i")
+        self.first = array("i")
+        self.last = array("i")
+        self.next = array("i")
+        self.values = []
+        self.texts = {}
+        self.tails = {}
+        self.elements = {}
+        # Whether the markup can be written out as it's made: with no
+        # Clark-notation names (whose declarations go on the root start
+        # tag, once they're all known), nothing that isn't a string,
+        # and no converted `Element` objects (which may have either).
+        self.streamable = True
+
+    def add(self, parent, tag, attrib):
+        """Add a node with an already formatted `attrib` as the last
+        child of `parent` (or as a root if it's -1), and return it.
+
+        """
+        tag_id = self.tag_ids.get(tag)
+        if tag_id is None:
+            tag_id = self.tag_ids[tag] = len(self.tags)
+            self.tags.append(tag)
+            if tag is not ElementTree.Comment and tag is not ElementTree.PI:
+                self._check_name(tag)
+        keys = tuple(attrib)
+        layout_id = self.layout_ids.get(keys)
+        if layout_id is None:
+            layout_id = self.layout_ids[keys] = len(self.layouts)
+            self.layouts.append(keys)
+            for key in keys:
+                self._check_name(key)
+
+        node = len(self.tag)
+        self.tag.append(tag_id)
+        self.layout.append(layout_id)
+        self.start.append(len(self.values))
+        self.values.extend(map(_intern_value, attrib.values()))
+        self.first.append(-1)
+        self.last.append(-1)
+        self.next.append(-1)
+        if parent >= 0:
+            if self.first[parent] < 0:
+                self.first[parent] = node
+            else:
+                self.next[self.last[parent]] = node
+            self.last[parent] = node
+        return node
+
+    def _check_name(self, name):
+        if not isinstance(name, str) or name[:1] == "{":
+            self.streamable = False
+
+    def absorb(self, parent, element):
+        """Copy `element` and its subtree into the store as the last
+        child of `parent`, and return the new node.
+
+        """
+        nodes = []
+        stack = [(parent, element)]
+        while stack:
+            parent, element = stack.pop()
+            node = self.add(parent, element.tag, element.attrib)
+            nodes.append(node)
+            if element.text is not None:
+                self.set_text(self.texts, node, element.text)
+            if element.tail is not None:
+                self.set_text(self.tails, node, element.tail)
+            stack.extend((node, child) for child in reversed(element))
+        if self.streamable:
+            values = self.values[self.start[nodes[0]] :]
+            if not all(type(value) is str for value in values):
+                self.streamable = False
+        return nodes[0]
+
+    def set_text(self, texts, node, text):
+        if text is None:
+            texts.pop(node, None)
+            return
+        if type(text) is not str:
+            self.streamable = False
+        texts[node] = text
+
+    def node_values(self, node):
+        start = self.start[node]
+        return self.values[
+            start : start + len(self.layouts[self.layout[node]])
+        ]
+
+    def children(self, node):
+        child = self.first[node]
+        while child >= 0:
+            yield child
+            child = self.next[child]
+
+    def get(self, node, key, default=None):
+        keys = self.layouts[self.layout[node]]
+        if key in keys:
+            return self.values[self.start[node] + keys.index(key)]
+        return default
+
+    def set(self, node, key, value):
+        keys = self.layouts[self.layout[node]]
+        start = self.start[node]
+        if key in keys:
+            self.values[start + keys.index(key)] = value
+        else:
+            # Moved to the end of `values` with the new one after them.
+            attrib = dict(zip(keys, self.node_values(node), strict=True))
+            attrib[key] = value
+            keys = tuple(attrib)
+            layout_id = self.layout_ids.get(keys)
+            if layout_id is None:
+                layout_id = self.layout_ids[keys] = len(self.layouts)
+                self.layouts.append(keys)
+                self._check_name(key)
+            self.layout[node] = layout_id
+            self.start[node] = len(self.values)
+            self.values.extend(attrib.values())
+        if type(value) is not str:
+            self.streamable = False
+
+    def convert(self, node, keep=True):
+        """Return node `node` and its subtree as `Element` objects. With
+        `keep`, they take the place of the nodes in the tree; otherwise
+        they are a copy (sharing the nodes converted before).
+
+        """
+        cls = self.element_class
+        new = cls.__new__
+        init = ElementTree.Element.__init__
+        elements = self.elements
+        root = None
+        stack = [(None, node)]
+        while stack:
+            parent, node = stack.pop()
+            element = elements.get(node)
+            if element is None:
+                tag = self.tags[self.tag[node]]
+                if tag is ElementTree.Comment or tag is ElementTree.PI:
+                    element = tag(self.texts.get(node))
+                else:
+                    element = new(cls)
+                    init(
+                        element,
+                        tag,
+                        dict(
+                            zip(
+                                self.layouts[self.layout[node]],
+                                self.node_values(node),
+                                strict=True,
+                            )
+                        ),
+                    )
+                    element.text = self.texts.get(node)
+                element.tail = self.tails.get(node)
+                if keep:
+                    elements[node] = element
+                stack.extend(
+                    (element, child)
+                    for child in reversed(list(self.children(node)))
+                )
+            if parent is None:
+                root = element
+            else:
+                parent.append(element)
+        if keep:
+            self.streamable = False
+        return root
+
+    def preserve_inner_whitespace(self, node):
+        """`serialize._preserve_inner_whitespace` for a node."""
+        tag = self.tags[self.tag[node]]
+        if (
+            serialize._local_tag(tag)
+            in serialize.PRESERVE_INNER_WHITESPACE_TAGS
+        ):
+            return True
+        return (
+            self.get(node, serialize._XML_SPACE_ATTR) == "preserve"
+            or self.get(node, "xml:space") == "preserve"
+        )
+
+
+def _iter_markup(store, root, short_empty_elements, indent, chunk_size):
+    """Yield the markup for node `root` of `store` in chunks of roughly
+    `chunk_size` characters, the same as `serialize.iter_markup` would
+    for its `Element` tree. A tree that isn't `streamable` is written
+    whole first, and comes out in one chunk.
+
+    The walk uses an explicit stack, as `iter_markup` does.
+
+    """
+    parts = []
+    write = parts.append
+    write_element, qualify, escape, namespaces = serialize._markup_writer(
+        parts, short_empty_elements, indent
+    )
+    escape_cdata = serialize._escape_cdata
+    comment_id = store.tag_ids.get(ElementTree.Comment)
+    processing_instruction_id = store.tag_ids.get(ElementTree.PI)
+    tags, layouts, values = store.tags, store.layouts, store.values
+    tag_of, layout_of, start_of = store.tag, store.layout, store.start
+    first, next_ = store.first, store.next
+    texts, tails, elements = store.texts, store.tails, store.elements
+    streamable = store.streamable
+    pretty = indent is not None
+    # Qualified tags by tag id, qualified names by layout id.
+    qtags = {}
+    qkeys = {}
+
+    chunk = []
+    size = 0
+    # One frame per open node: (node, its level, whether it's in an
+    # indented context, its end tag).
+    stack = []
+    node = root
+    level = 0
+    in_indented_context = pretty
+    while True:
+        element = elements.get(node)
+        if element is not None:
+            write_element(element, level, in_indented_context)
+        elif tag_of[node] == comment_id:
+            write(f"<!--{texts.get(node)}-->")
+        elif tag_of[node] == processing_instruction_id:
+            write(f"<?{texts.get(node)}?>")
+        else:
+            tag_id = tag_of[node]
+            qtag = qtags.get(tag_id)
+            if qtag is None:
+                qtag = qtags[tag_id] = qualify(tags[tag_id])
+            layout = layout_of[node]
+            keys = qkeys.get(layout)
+            if keys is None:
+                keys = qkeys[layout] = [
+                    qualify(key) for key in layouts[layout]
+                ]
+            start = "<" + qtag
+            if keys:
+                position = start_of[node]
+                for key, value in zip(
+                    keys, values[position : position + len(keys)], strict=True
+                ):
+                    start = f'{start} {key}="{escape(value)}"'
+            text = texts.get(node)
+            child = first[node]
+            if not (text or child >= 0 or not short_empty_elements):
+                write(start + " />")
+            else:
+                indent_children = (
+                    in_indented_context
+                    and child >= 0
+                    and not store.preserve_inner_whitespace(node)
+                )
+                if indent_children and serialize._is_blank(text):
+                    text = "\n" + indent * (level + 1)
+                write(start + ">")
+                if text:
+                    write(escape_cdata(text))
+                if child >= 0:
+                    stack.append(
+                        (node, level, in_indented_context, f"</{qtag}>")
+                    )
+                    node = child
+                    level += 1
+                    in_indented_context = indent_children
+                    continue
+                write(f"</{qtag}>")
+
+        # The node is written but for its tail: write tails and end
+        # tags until there's a next sibling to move on to.
+        while True:
+            if node == root:
+                element = elements.get(node)
+                tail = element.tail if element is not None else tails.get(node)
+                if tail:
+                    write(escape_cdata(tail))
+                break
+            element = elements.get(node)
+            tail = element.tail if element is not None else tails.get(node)
+            sibling = next_[node]
+            if in_indented_context and (not tail or tail.isspace()):
+                write("\n" + indent * (level if sibling >= 0 else level - 1))
+            elif tail:
+                write(escape_cdata(tail))
+            if sibling >= 0:
+                node = sibling
+                break
+            node, level, in_indented_context, end_tag = stack.pop()
+            write(end_tag)
+        if node == root and not stack:
+            break
+
+        if streamable and len(parts) >= _PIECES_PER_JOIN:
+            piece = "".join(parts)
+            parts.clear()
+            chunk.append(piece)
+            size += len(piece)
+            if size >= chunk_size:
+                yield "".join(chunk)
+                chunk.clear()
+                size = 0
+
+    if namespaces:
+        serialize._declare_namespaces(
+            parts, 0, qtags[tag_of[root]], namespaces
+        )
+    chunk.append("".join(parts))
+    yield "".join(chunk)
+
+
+def make_svg(**attributes) -> CompactElement:
+    """Like `svg_helpers.make_svg`, but returns the root of a compact
+    tree: `CompactElement("svg", **attributes)`, with the svg `xmlns`
+    added.
+
+    """
+    defaults = {
+        "xmlns": "http://www.w3.org/2000/svg",
+    }
+    combined = {**defaults, **attributes}
+    return CompactElement("svg", **combined)
+
+
+class CompactElement:
+    """A node of a compact tree. `CompactElement(tag, ...)` makes the
+    root of a new tree, taking the same arguments as `Element`; build
+    the rest by calling `add_*` methods on a parent, as with `Element`.
+
+    Attribute names and values are formatted by the methods of
+    `element_class` (`Element`, unless a subclass sets another), the
+    same as in an `Element` tree of that class, and its objects are
+    what nodes are converted to.
+
+    """
+
+    __slots__ = ("_node", "_store")
+
+    element_class = Element
+
+    def __init__(self, tag: str, attrib=None, **attributes):
+        store = _Store(self.element_class)
+        combined = {**(attrib or {}), **attributes}
+        self._store = store
+        self._node = store.add(
+            -1, tag, store.prototype._format_attributes(combined)
+        )
+
+    def _handle(self, node) -> CompactElement:
+        handle = type(self).__new__(type(self))
+        handle._store = self._store
+        handle._node = node
+        return handle
+
+    def _converted(self) -> Element | None:
+        return self._store.elements.get(self._node)
+
+    @property
+    def element(self) -> Element:
+        """This node and its subtree as `Element` objects, converted
+        the first time they're asked for. They stay in the tree in
+        place of the node, so changes to them show in the output.
+
+        """
+        element = self._converted()
+        if element is None:
+            element = self._store.convert(self._node)
+        return element
+
+    def __getattr__(self, name):
+        # Everything else an `Element` has, after converting.
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.element, name)
+
+    def __eq__(self, other):
+        if not isinstance(other, CompactElement):
+            return NotImplemented
+        return self._store is other._store and self._node == other._node
+
+    def __hash__(self):
+        return hash((id(self._store), self._node))
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.tag!r} at {id(self):#x}>"
+
+    def __str__(self) -> str:
+        return self.to_string()
+
+    @property
+    def tag(self):
+        element = self._converted()
+        if element is not None:
+            return element.tag
+        return self._store.tags[self._store.tag[self._node]]
+
+    @property
+    def text(self):
+        element = self._converted()
+        if element is not None:
+            return element.text
+        return self._store.texts.get(self._node)
+
+    @text.setter
+    def text(self, text):
+        element = self._converted()
+        if element is not None:
+            element.text = text
+        else:
+            self._store.set_text(self._store.texts, self._node, text)
+
+    @property
+    def tail(self):
+        element = self._converted()
+        if element is not None:
+            return element.tail
+        return self._store.tails.get(self._node)
+
+    @tail.setter
+    def tail(self, tail):
+        element = self._converted()
+        if element is not None:
+            element.tail = tail
+        else:
+            self._store.set_text(self._store.tails, self._node, tail)
+
+    def get(self, key, default=None):
+        element = self._converted()
+        if element is not None:
+            return element.get(key, default)
+        return self._store.get(self._node, key, default)
+
+    def set(self, key, value) -> None:
+        element = self._converted()
+        if element is not None:
+            element.set(key, value)
+        else:
+            self._store.set(self._node, key, value)
+
+    def keys(self) -> list:
+        element = self._converted()
+        if element is not None:
+            return element.keys()
+        return list(self._store.layouts[self._store.layout[self._node]])
+
+    def items(self) -> list:
+        return [(key, self.get(key)) for key in self.keys()]
+
+    def __len__(self):
+        element = self._converted()
+        if element is not None:
+            return len(element)
+        return sum(1 for _ in self._store.children(self._node))
+
+    def __iter__(self):
+        element = self._converted()
+        if element is not None:
+            return iter(element)
+        return map(self._handle, self._store.children(self._node))
+
+    def __getitem__(self, index):
+        element = self._converted()
+        if element is not None:
+            return element[index]
+        return list(self)[index]
+
+    def append(self, element: Element) -> CompactElement | None:
+        """Add a copy of `element` and its subtree as the last child,
+        and return it (unless this node is converted, in which case
+        `element` itself is appended, as to any `Element`).
+
+        """
+        converted = self._converted()
+        if converted is not None:
+            converted.append(element)
+            return None
+        return self._handle(self._store.absorb(self._node, element))
+
+    def add_element(self, tag_name: str, /, **attributes) -> CompactElement:
+        """Add a child element, as `Element.add_element` does."""
+        element = self._converted()
+        if element is not None:
+            return element.add_element(tag_name, **attributes)
+        store = self._store
+        attrib = store.prototype._format_attributes(attributes)
+        return self._handle(store.add(self._node, tag_name, attrib))
+
+    def add_from_string(self, markup: str) -> CompactElement:
+        """Add a child parsed from raw markup, as
+        `Element.add_from_string` does.
+
+        """
+        element = self._converted()
+        if element is not None:
+            return element.add_from_string(markup)
+        return self.append(self._store.element_class._from_string(markup))
+
+    def add_stamp(self, stamp, /, **values) -> CompactElement:
+        """Add a filled-in copy of a `Stamp`, as `Element.add_stamp`
+        does.
+
+        """
+        element = self._converted()
+        if element is not None:
+            return element.add_stamp(stamp, **values)
+        return self.append(stamp.make(**values))
+
+    def add_shape(
+        self,
+        shape,
+        /,
+        *,
+        precision=None,
+        compact=False,
+        simplify=False,
+        tolerance=None,
+        topology=False,
+        viewport=None,
+        executor=None,
+        **attributes,
+    ) -> CompactElement | None:
+        """Add a `<g>` with a `<path>` per part of a shapely geometry,
+        as `Element.add_shape` does, with the same options.
+
+        """
+        element = self._converted()
+        if element is not None:
+            return element.add_shape(
+                shape,
+                precision=precision,
+                compact=compact,
+                simplify=simplify,
+                tolerance=tolerance,
+                topology=topology,
+                viewport=viewport,
+                executor=executor,
+                **attributes,
+            )
+        if viewport is not None:
+            shape = _as_viewport(viewport).cull(shape)
+            if shape is None:
+                return None
+        paths = make_paths_from_shape(
+            shape,
+            precision=precision,
+            compact=compact,
+            simplify=simplify,
+            tolerance=tolerance,
+            topology=topology,
+            executor=executor,
+        )
+        store = self._store
+        format_attributes = store.prototype._format_attributes
+        group = store.add(self._node, "g", format_attributes(attributes))
+        for path in paths:
+            store.add(group, "path", format_attributes({"d": path}))
+        return self._handle(group)
+
+    def add_shapes(
+        self,
+        features,
+        /,
+        *,
+        attributes=None,
+        group=False,
+        precision=None,
+        compact=False,
+        simplify=False,
+        tolerance=None,
+        viewport=None,
+    ) -> list:
+        """Add many shapes as children, as `Element.add_shapes` does,
+        with the same options.
+
+        """
+        element = self._converted()
+        if element is not None:
+            return element.add_shapes(
+                features,
+                attributes=attributes,
+                group=group,
+                precision=precision,
+                compact=compact,
+                simplify=simplify,
+                tolerance=tolerance,
+                viewport=viewport,
+            )
+        store = self._store
+        if viewport is not None:
+            viewport = _as_viewport(viewport)
+        groups = {}
+        added = []
+        for feature in features:
+            if hasattr(feature, "geom_type"):
+                shape, properties = feature, None
+            else:
+                shape, properties = feature
+            if viewport is not None:
+                shape = viewport.cull(shape)
+                if shape is None:
+                    continue
+            paths = make_paths_from_shape(
+                shape,
+                precision=precision,
+                compact=compact,
+                simplify=simplify,
+                tolerance=tolerance,
+            )
+            paths = [path for path in paths if path]
+            if not paths:
+                continue
+            if attributes is not None:
+                properties = attributes(properties)
+            attrib = store.prototype._format_attributes(properties or {})
+
+            # As in `Element.add_shapes`, the path data isn't formatted.
+            if group and attrib:
+                key = frozenset(attrib.items())
+                parent = groups.get(key)
+                if parent is None:
+                    parent = groups[key] = store.add(self._node, "g", attrib)
+                    added.append(parent)
+            elif len(paths) == 1:
+                added.append(
+                    store.add(self._node, "path", {"d": paths[0], **attrib})
+                )
+                continue
+            else:
+                parent = store.add(self._node, "g", attrib)
+                added.append(parent)
+            for path in paths:
+                store.add(parent, "path", {"d": path})
+        return [self._handle(node) for node in added]
+
+    @property
+    def recipes(self):
+        """The helpers of `svg_helpers.recipes`, as for an `Element`.
+        What they add is copied into the tree, so the element a recipe
+        returns isn't the one in the tree.
+
+        """
+        from svg_helpers.recipes import _RecipeAccessor
+
+        return _RecipeAccessor(self)
+
+    def to_string(
+        self,
+        pretty=False,
+        xml_declaration=False,
+        short_empty_elements=True,
+    ) -> str:
+        """Generate the string representation of the element, the same
+        as `Element.to_string` gives for the same tree.
+
+        """
+        return "".join(
+            self.iter_serialize(
+                pretty=pretty,
+                xml_declaration=xml_declaration,
+                short_empty_elements=short_empty_elements,
+                chunk_size=float("inf"),
+            )
+        )
+
+    def iter_serialize(
+        self,
+        pretty=False,
+        xml_declaration=False,
+        short_empty_elements=True,
+        *,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+    ):
+        """Generate the string representation of the element in chunks
+        of roughly `chunk_size` characters, as `Element.iter_serialize`
+        does. A tree with namespaced (Clark-notation) names, or with
+        converted nodes, is written whole before the first chunk.
+
+        """
+        element = self._converted()
+        if element is not None:
+            return element.iter_serialize(
+                pretty=pretty,
+                xml_declaration=xml_declaration,
+                short_empty_elements=short_empty_elements,
+                chunk_size=chunk_size,
+            )
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+        return self._iter_serialize(
+            pretty, xml_declaration, short_empty_elements, chunk_size
+        )
+
+    def _iter_serialize(
+        self, pretty, xml_declaration, short_empty_elements, chunk_size
+    ):
+        indent = "  " if pretty else None
+        store = self._store
+        if xml_declaration:
+            yield serialize.XML_DECLARATION
+        try:
+            yield from _iter_markup(
+                store, self._node, short_empty_elements, indent, chunk_size
+            )
+        except (TypeError, RecursionError):
+            # Only trees that aren't `streamable` get here, and they're
+            # written whole, so nothing has been yielded yet: leave the
+            # tree to `serialize.markup`, which falls back on
+            # `iter_markup` for what it can't write either.
+            yield serialize.markup(
+                store.convert(self._node, keep=False),
+                short_empty_elements=short_empty_elements,
+                indent=indent,
+            )
+
+    # The same as `Element.save`, which only needs `iter_serialize`.
+    def content_hash(self, algorithm="sha256"):
+        """Return a hex digest of the node's content, the same as
+        `Element.content_hash` gives for the same tree, hashing the
+        markup chunk by chunk.
+
+        """
+        hasher = hashlib.new(algorithm)
+        for chunk in self.iter_serialize():
+            hasher.update(chunk.encode())
+        return hasher.hexdigest()
+
+    save = Element.save
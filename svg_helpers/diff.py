@@ -0,0 +1,391 @@
+"""Compare two `Element` trees, and patch one into the other.
+
+`diff(old, new)` returns the operations that turn `old` into `new`, to
+send to a client that has `old` already, instead of all of `new`. To
+diff a tree before and after changing it, diff a copy of it:
+
+```python3
+before = copy.deepcopy(svg)
+overlay.add_element("circle", cx=x, cy=y, r=5)
+operations = svg_helpers.diff.diff(before, svg)
+websocket.send(json.dumps([(type(op).__name__, *op) for op in operations]))
+```
+
+Each operation is a namedtuple whose `path` is the child indices from
+the root down to the element it changes, as they are when it's applied:
+operations apply in order. `patch(element, operations)` applies them
+to an `Element` tree.
+
+"""
+
+import bisect
+from collections import namedtuple
+from xml.etree import ElementTree
+
+from svg_helpers import serialize
+from svg_helpers.element import Element
+
+SetAttribute = namedtuple("SetAttribute", "path name value")
+RemoveAttribute = namedtuple("RemoveAttribute", "path name")
+SetText = namedtuple("SetText", "path text")
+SetTail = namedtuple("SetTail", "path tail")
+InsertChild = namedtuple("InsertChild", "path index markup")
+RemoveChild = namedtuple("RemoveChild", "path index")
+MoveChild = namedtuple("MoveChild", "path index new_index")
+
+_XML_NAMESPACE = "http://www.w3.org/XML/1998/namespace"
+
+
+def diff(old, new) -> list:
+    """Return the list of operations that turn the tree `old` into the
+    tree `new`:
+
+    - `SetAttribute(path, name, value)` and `RemoveAttribute(path,
+      name)` for attributes,
+    - `SetText(path, text)` and `SetTail(path, tail)` for text (`None`
+      for none),
+    - `InsertChild(path, index, markup)` for a new subtree, given as
+      its compact markup, with its tail,
+    - `RemoveChild(path, index)` for one that's gone, and
+      `MoveChild(path, index, new_index)` for a child that moves among
+      its siblings: it's taken out at `index`, then put back at
+      `new_index`.
+
+    The children of matching elements are matched by `id` where they
+    have one, and otherwise by tag, in order: the first `<g>` without
+    an `id` matches the first one of `new`, and so on. Matches must
+    have the same tag, so an element whose tag or `id` changes is
+    removed and inserted again, as is one with no match, and one that
+    moves to another parent. The fewest moves
+    are used for the rest. Attribute order isn't kept: a new attribute
+    goes last. The same object in both trees counts as unchanged.
+
+    Takes time about linear in the size of the trees. Raises ValueError
+    if the roots have different tags.
+
+    """
+    if old.tag != new.tag:
+        raise ValueError(
+            f"can't diff trees with different roots: {old.tag!r}, {new.tag!r}"
+        )
+    operations = []
+    add = operations.append
+    if old.tail != new.tail:
+        add(SetTail((), new.tail))
+    # Depth first, with explicit stack so deep trees don't hit the
+    # recursion limit. Children are reordered before they're visited,
+    # so their paths hold in the order they're visited.
+    stack = [(old, new, ())]
+    while stack:
+        old_node, new_node, path = stack.pop()
+        if old_node is new_node:
+            continue
+        old_attrib = old_node.attrib
+        new_attrib = new_node.attrib
+        if old_attrib != new_attrib:
+            for name, value in new_attrib.items():
+                if old_attrib.get(name) != value:
+                    add(SetAttribute(path, name, value))
+            for name in old_attrib:
+                if name not in new_attrib:
+                    add(RemoveAttribute(path, name))
+        if old_node.text != new_node.text:
+            add(SetText(path, new_node.text))
+
+        n = len(new_node)
+        if n == len(old_node):
+            if not n:
+                continue
+            # The same tags and ids in the same order: nothing moves.
+            for old_child, new_child in zip(old_node, new_node, strict=True):
+                if old_child is not new_child and (
+                    old_child.tag != new_child.tag
+                    or old_child.get("id") != new_child.get("id")
+                ):
+                    break
+            else:
+                for i in reversed(range(n)):
+                    old_child = old_node[i]
+                    new_child = new_node[i]
+                    if old_child.tail != new_child.tail:
+                        add(SetTail((*path, i), new_child.tail))
+                    stack.append((old_child, new_child, (*path, i)))
+                continue
+
+        pairs = _diff_children(old_node, new_node, path, add)
+        for old_child, new_child, child_path in reversed(pairs):
+            if old_child.tail != new_child.tail:
+                add(SetTail(child_path, new_child.tail))
+            stack.append((old_child, new_child, child_path))
+    return operations
+
+
+def _diff_children(old, new, path, add):
+    """Add the operations that turn the children of `old` into those
+    of `new`, where matching children stand for each other. Returns
+    the matching children as `(old_child, new_child, path)`, with
+    their place under `new`.
+
+    """
+    old_children = list(old)
+    new_children = list(new)
+    n = len(new_children)
+
+    # The old child matching each new one: by id for those with one,
+    # by tag for the others, in order.
+    by_key = {}
+    for i, child in enumerate(old_children):
+        by_key.setdefault((child.tag, child.get("id")), []).append(i)
+    for candidates in by_key.values():
+        candidates.reverse()
+    matches = [None] * n
+    used = [False] * len(old_children)
+    for j, child in enumerate(new_children):
+        candidates = by_key.get((child.tag, child.get("id")))
+        if candidates:
+            i = matches[j] = candidates.pop()
+            used[i] = True
+
+    for i in reversed(range(len(old_children))):
+        if not used[i]:
+            add(RemoveChild(path, i))
+
+    # What's left of the old children keeps its order, and the matches
+    # of the longest increasing run of them in the new order stay where
+    # they are. Each other match moves, once, to right after the
+    # element before it in the new order, and each new child is
+    # inserted there, so the children are:
+    #
+    #   moved and new ones that go before the first that stays,
+    #   the first that stays, the moved and new ones that go after it,
+    #   ...
+    #
+    # with the old children that aren't moved yet in between in old
+    # order. Each gets a fixed slot in that order, and a Fenwick tree
+    # of the slots in use gives the index of each.
+    ranks = {}
+    for i in range(len(old_children)):
+        if used[i]:
+            ranks[i] = len(ranks)
+    order = [ranks[i] for i in matches if i is not None]
+    stays = _longest_increasing(order)
+    # The moved and new children that go after each child that stays
+    # (by rank), and before the first one (-1).
+    runs = {-1: []}
+    run = runs[-1]
+    k = 0
+    for j, i in enumerate(matches):
+        if i is None:
+            run.append(j)
+            continue
+        rank = ranks[i]
+        if k in stays:
+            run = runs[rank] = []
+        else:
+            run.append(j)
+        k += 1
+    old_slots = [0] * len(ranks)
+    new_slots = [0] * n
+    occupied = []
+    for j in runs[-1]:
+        new_slots[j] = len(occupied)
+        occupied.append(0)
+    for rank in range(len(ranks)):
+        old_slots[rank] = len(occupied)
+        occupied.append(1)
+        for j in runs.get(rank, ()):
+            new_slots[j] = len(occupied)
+            occupied.append(0)
+    tree = _fenwick(occupied)
+
+    pairs = []
+    k = 0
+    for j, i in enumerate(matches):
+        child = new_children[j]
+        if i is None:
+            index = _count(tree, new_slots[j])
+            _add(tree, new_slots[j], 1)
+            add(InsertChild(path, index, serialize.markup(child)))
+            continue
+        if k not in stays:
+            slot = old_slots[ranks[i]]
+            index = _count(tree, slot)
+            _add(tree, slot, -1)
+            new_index = _count(tree, new_slots[j])
+            _add(tree, new_slots[j], 1)
+            add(MoveChild(path, index, new_index))
+        k += 1
+        pairs.append((old_children[i], child, (*path, j)))
+    return pairs
+
+
+def _longest_increasing(values) -> set:
+    """Return the positions of a longest increasing subsequence of the
+    distinct `values`.
+
+    """
+    # tails[k] is the position of the smallest value that ends an
+    # increasing subsequence of length k + 1.
+    tails = []
+    tail_values = []
+    previous = [None] * len(values)
+    for position, value in enumerate(values):
+        k = bisect.bisect_left(tail_values, value)
+        if k:
+            previous[position] = tails[k - 1]
+        if k == len(tails):
+            tails.append(position)
+            tail_values.append(value)
+        else:
+            tails[k] = position
+            tail_values[k] = value
+    result = set()
+    position = tails[-1] if tails else None
+    while position is not None:
+        result.add(position)
+        position = previous[position]
+    return result
+
+
+def _fenwick(values) -> list:
+    """Build a Fenwick tree of `values`, in linear time."""
+    tree = [0, *values]
+    for i in range(1, len(tree)):
+        parent = i + (i & -i)
+        if parent < len(tree):
+            tree[parent] += tree[i]
+    return tree
+
+
+def _add(tree, index, delta):
+    index += 1
+    while index < len(tree):
+        tree[index] += delta
+        index += index & -index
+
+
+def _count(tree, index) -> int:
+    """The sum of the values before `index`."""
+    total = 0
+    while index:
+        total += tree[index]
+        index -= index & -index
+    return total
+
+
+def patch(element, operations) -> None:
+    """Apply `operations`, as returned by `diff`, to the tree
+    `element`, in place. Inserted subtrees are parsed from their
+    markup into elements of the same class as their parent, with the
+    namespace prefixes declared by `xmlns:*` attributes of their
+    ancestors, as in `inkscape:label`.
+
+    Raises TypeError for anything that isn't an operation.
+
+    """
+    for operation in operations:
+        node = element
+        if isinstance(operation, InsertChild):
+            # The namespace declarations the inserted markup can use.
+            declarations = _declarations(node, {})
+            for index in operation.path:
+                node = node[index]
+                _declarations(node, declarations)
+        else:
+            for index in operation.path:
+                node = node[index]
+        if isinstance(operation, SetAttribute):
+            node.set(operation.name, operation.value)
+        elif isinstance(operation, RemoveAttribute):
+            del node.attrib[operation.name]
+        elif isinstance(operation, SetText):
+            node.text = operation.text
+        elif isinstance(operation, SetTail):
+            node.tail = operation.tail
+        elif isinstance(operation, InsertChild):
+            child = _parse(type(node), operation.markup, declarations)
+            node.insert(operation.index, child)
+        elif isinstance(operation, RemoveChild):
+            del node[operation.index]
+        elif isinstance(operation, MoveChild):
+            child = node[operation.index]
+            del node[operation.index]
+            node.insert(operation.new_index, child)
+        else:
+            raise TypeError(f"not a diff operation: {operation!r}")
+
+
+def _declarations(node, declarations) -> dict:
+    """Add the `xmlns` and `xmlns:*` attributes of `node` to the dict
+    `declarations`, and return it.
+
+    """
+    for key, value in node.attrib.items():
+        if key == "xmlns" or key.startswith("xmlns:"):
+            declarations[key] = value
+    return declarations
+
+
+def _parse(cls, markup, declarations=None):
+    """Parse the markup of one element, comment or processing
+    instruction, and its tail, into a new node, with elements of class
+    `cls`.
+
+    `declarations` are the `xmlns` attributes in force where it goes.
+    Names in those namespaces (and `xml:`) are given back with their
+    prefix, as in `inkscape:label`, or without one for the default
+    namespace; names in namespaces the markup declares itself come
+    back in Clark notation, as `ElementTree` parses them.
+
+    """
+    if issubclass(cls, Element):
+
+        def factory(tag, attrib):
+            # As in `Element._parse`: parsed names are already formatted.
+            element = cls.__new__(cls)
+            ElementTree.Element.__init__(element, tag, attrib)
+            return element
+
+    else:
+        factory = cls
+    parser = ElementTree.XMLParser(
+        target=ElementTree.TreeBuilder(
+            element_factory=factory,
+            comment_factory=ElementTree.Comment,
+            pi_factory=ElementTree.ProcessingInstruction,
+            insert_comments=True,
+            insert_pis=True,
+        )
+    )
+    declarations = declarations or {}
+    attributes = "".join(
+        f' {key}="{serialize._escape_attrib(uri)}"'
+        for key, uri in declarations.items()
+    )
+    # Wrapped, since a comment isn't a document by itself.
+    parser.feed(f"<wrapper{attributes}>{markup}</wrapper>")
+    node = parser.close()[0]
+
+    prefixes = {_XML_NAMESPACE: "xml:"}
+    for key, uri in declarations.items():
+        prefixes[uri] = key[6:] + ":" if key != "xmlns" else ""
+    for child in node.iter():
+        tag = child.tag
+        if isinstance(tag, str) and tag[:1] == "{":
+            child.tag = _prefixed(tag, prefixes)
+        if any(key[:1] == "{" for key in child.attrib):
+            child.attrib = {
+                _prefixed(key, prefixes): value
+                for key, value in child.attrib.items()
+            }
+    return node
+
+
+def _prefixed(name, prefixes):
+    """`name`, from Clark notation to prefixed if there's a prefix for
+    its namespace in `prefixes` (uri to prefix, with its colon).
+
+    """
+    uri, _, local = name[1:].partition("}")
+    prefix = prefixes.get(uri)
+    return name if prefix is None else prefix + local
@@ -1,84 +1,213 @@
 from __future__ import annotations
 
 import copy as _copy
+import gzip
+import io
+import os
+import threading
+from collections import OrderedDict, namedtuple
 from typing import Any
 from xml.etree import ElementTree
 
-from svg_helpers.shapely_helpers import make_paths_from_shape
-
-# SVG elements whose inter-child whitespace is rendered as a literal
-# space character per the XML default whitespace rules. Indenting
-# inside one of these shifts visible layout (e.g. a half-space per
-# chunk under text-anchor="middle"), so pretty-printing must leave
-# their contents untouched. From SVG 1.1 §10.10 ("Text content
-# elements") plus `foreignObject` (whose contents are non-SVG markup
-# where whitespace also matters).
-PRESERVE_INNER_WHITESPACE_TAGS = frozenset(
-    {"text", "tspan", "textPath", "tref", "altGlyph", "foreignObject"}
+from svg_helpers.serialize import (
+    DEFAULT_CHUNK_SIZE,
+    PRESERVE_INNER_WHITESPACE_TAGS,  # noqa: F401  (re-exported for users)
+    content_hash,
+    iter_serialize,
+    serialize,
 )
+from svg_helpers.shapely_helpers import Viewport, make_paths_from_shape
 
-_XML_SPACE_ATTR = "{http://www.w3.org/XML/1998/namespace}space"
+# Formatted attribute names, one dict per `format_attribute_name`
+# implementation (keyed by the function itself, not a bound method,
+# which is new for every element), so a subclass that overrides it
+# gets its own entries. Real documents use a few dozen
+# distinct names; each dict stops growing at _NAME_CACHE_SIZE.
+_NAME_CACHE_SIZE = 1024
+_name_caches = {}
 
+# Shared copies of short attribute values, used when
+# `Element.intern_attribute_values` is on. Long values (path data,
+# ...) are rarely repeated, so they aren't kept.
+_INTERN_MAX_LENGTH = 64
+_INTERN_TABLE_SIZE = 65536
+_interned_values = {}
 
-def _local_tag(tag):
-    """Strip a Clark-notation namespace prefix from a tag name."""
-    if isinstance(tag, str) and tag.startswith("{"):
-        return tag.split("}", 1)[1]
-    return tag
 
+MarkupCacheInfo = namedtuple("MarkupCacheInfo", "hits misses currsize")
 
-def _preserve_inner_whitespace(elem):
-    if _local_tag(elem.tag) in PRESERVE_INNER_WHITESPACE_TAGS:
-        return True
-    # xml:space="preserve" is the spec-defined escape hatch — check
-    # both the Clark-notation form (used by the parser) and the bare
-    # form (used by direct kwargs).
-    return (
-        elem.get(_XML_SPACE_ATTR) == "preserve"
-        or elem.get("xml:space") == "preserve"
-    )
 
+class _MarkupCache:
+    """Bounded LRU cache of parsed `add_from_string` markup, keyed by
+    (element class, markup). Entries are never handed out directly —
+    callers get a `_clone` — so the cached trees stay unmodified.
+
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            try:
+                tree = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return tree
+
+    def put(self, key, tree, maxsize):
+        with self._lock:
+            self._entries[key] = tree
+            self._entries.move_to_end(key)
+            while len(self._entries) > maxsize:
+                self._entries.popitem(last=False)
+
+    def info(self) -> MarkupCacheInfo:
+        with self._lock:
+            return MarkupCacheInfo(self.hits, self.misses, len(self._entries))
 
-def _indent_preserving_text(tree, space="  ", level=0):
-    """Like ``xml.etree.ElementTree.indent`` but does not insert
-    whitespace inside elements whose layout depends on character data
-    (text, tspan, textPath, foreignObject, ...) or that opt out via
-    ``xml:space="preserve"``.
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_markup_cache = _MarkupCache()
+
+
+def _clone(element):
+    """Copy an element and its subtree, keeping the element class.
+    Cheaper than `copy.deepcopy`, which also copies attribute values
+    and keeps a memo; values are strings here, so sharing them is safe.
 
     """
-    if not len(tree):
-        return
+    cls = type(element)
+    clone = cls.__new__(cls)
+    ElementTree.Element.__init__(clone, element.tag, element.attrib)
+    clone.text = element.text
+    clone.tail = element.tail
+    if len(element):
+        clone.extend([_clone(child) for child in element])
+    return clone
 
-    indentations = ["\n" + level * space]
 
-    def walk(elem, level):
-        if _preserve_inner_whitespace(elem):
-            return
+def _name_cache(format_name) -> dict:
+    # An override written as a plain method comes bound to the element.
+    function = getattr(format_name, "__func__", format_name)
+    cache = _name_caches.get(function)
+    if cache is None:
+        cache = _name_caches.setdefault(function, {})
+    return cache
 
-        child_level = level + 1
-        try:
-            child_indentation = indentations[child_level]
-        except IndexError:
-            child_indentation = indentations[level] + space
-            indentations.append(child_indentation)
 
-        if not elem.text or not elem.text.strip():
-            elem.text = child_indentation
+def _format_name(format_name, key):
+    """Format one attribute name through the cache. `_format_attributes`
+    inlines the same steps to save a call per attribute.
+
+    """
+    names = _name_cache(format_name)
+    name = names.get(key)
+    if name is None:
+        name = format_name(key)
+        if len(names) < _NAME_CACHE_SIZE:
+            names[key] = name
+    return name
+
+
+def _intern_value(value):
+    """Return a shared string equal to `value` if there is one (or
+    `value` itself, remembering it for next time).
+
+    """
+    if type(value) is not str or len(value) > _INTERN_MAX_LENGTH:
+        return value
+    shared = _interned_values.get(value)
+    if shared is not None:
+        return shared
+    if len(_interned_values) < _INTERN_TABLE_SIZE:
+        _interned_values[value] = value
+    return value
+
+
+def _as_column(value):
+    """Return the per-element values of an `add_elements` attribute as
+    a list, or None if `value` is a scalar to share between elements.
+
+    """
+    if isinstance(value, (str, bytes)) or getattr(value, "ndim", 1) == 0:
+        return None
+    dtype = getattr(value, "dtype", None)
+    if dtype is not None and (
+        dtype.kind in "iu" or (dtype.kind == "f" and dtype.itemsize == 8)
+    ):
+        # Python ints/floats print the same as these NumPy scalars but
+        # are much cheaper to make. Other dtypes (float32, bool_, ...)
+        # print differently once converted, so iterate them as-is.
+        return value.tolist()
+    try:
+        return list(value)
+    except TypeError:
+        return None
+
+
+def _as_viewport(viewport) -> Viewport:
+    """The `Viewport` for a `viewport=` argument: a `Viewport`, an
+    `<svg>` with a `viewBox`, or bounds.
+
+    """
+    if isinstance(viewport, Viewport):
+        return viewport
+    if isinstance(viewport, ElementTree.Element):
+        return Viewport.from_svg(viewport)
+    return Viewport(viewport)
+
+
+def _write_chunks(outfile, chunks, compress, compresslevel):
+    """Write serialized chunks to an open file object: as text, as
+    UTF-8 bytes if it's a binary file, or gzipped if `compress`.
+
+    """
+    if compress:
+        # mtime=0 keeps the output the same for the same document.
+        with gzip.GzipFile(
+            fileobj=outfile, mode="wb", compresslevel=compresslevel, mtime=0
+        ) as compressed:
+            for chunk in chunks:
+                compressed.write(chunk.encode("utf-8"))
+    elif _is_binary(outfile):
+        for chunk in chunks:
+            outfile.write(chunk.encode("utf-8"))
+    else:
+        chunks = iter(chunks)
+        first = next(chunks, "")
+        try:
+            outfile.write(first)
+        except TypeError:
+            # A binary file that doesn't say so: it takes bytes.
+            outfile.write(first.encode("utf-8"))
+            for chunk in chunks:
+                outfile.write(chunk.encode("utf-8"))
+        else:
+            for chunk in chunks:
+                outfile.write(chunk)
 
-        last_child = None
-        for child in elem:
-            if len(child):
-                walk(child, child_level)
-            if not child.tail or not child.tail.strip():
-                child.tail = child_indentation
-            last_child = child
 
-        if last_child is not None and (
-            not last_child.tail or not last_child.tail.strip()
-        ):
-            last_child.tail = indentations[level]
+def _is_binary(outfile) -> bool:
+    """Whether an open file object takes bytes, as far as it says: an
+    `io` binary file, or one with a "b" in its `mode`.
 
-    walk(tree, level)
+    """
+    if isinstance(outfile, (io.RawIOBase, io.BufferedIOBase)):
+        return True
+    mode = getattr(outfile, "mode", None)
+    return isinstance(mode, str) and "b" in mode
 
 
 class Element(ElementTree.Element):
@@ -94,6 +223,18 @@ class Element(ElementTree.Element):
 
     """
 
+    # Set to True (on a subclass, or on `Element` itself) to share one
+    # string object between equal short attribute values, e.g. every
+    # `r="2"` or `fill="#3b528b"` built from numbers or f-strings.
+    # Saves memory on large trees with repetitive styling.
+    intern_attribute_values = False
+
+    # Set to a positive number to keep that many parsed
+    # `add_from_string` fragments in an LRU cache, so markup that is
+    # added over and over (e.g. rendered from a small set of templates)
+    # is parsed once and copied after that. See `markup_cache_info`.
+    markup_cache_size = 0
+
     def __init__(self, tag: str, attrib=None, **attributes):
         combined = {**(attrib or {}), **attributes}
         super().__init__(tag, **self._format_attributes(combined))
@@ -105,13 +246,26 @@ class Element(ElementTree.Element):
         `format_attribute_value` methods. Attributes whose formatted
         value is `None` are dropped.
 
+        Formatted names are cached per `format_attribute_name`
+        implementation, so it only runs once for each distinct name.
+
         """
+        format_name = self.format_attribute_name
+        names = _name_cache(format_name)
+        intern = self.intern_attribute_values
         result = {}
         for k, v in attributes.items():
             formatted_value = self.format_attribute_value(v)
             if formatted_value is None:
                 continue
-            result[self.format_attribute_name(k)] = formatted_value
+            if intern:
+                formatted_value = _intern_value(formatted_value)
+            name = names.get(k)
+            if name is None:
+                name = format_name(k)
+                if len(names) < _NAME_CACHE_SIZE:
+                    names[k] = name
+            result[name] = formatted_value
         return result
 
     @staticmethod
@@ -121,7 +275,9 @@ class Element(ElementTree.Element):
         `stroke-width`. A trailing underscore is stripped first to
         allow escaping Python keywords (`class_` becomes `class`).
 
-        Override the method to format attribute names differently.
+        Override the method to format attribute names differently. It
+        should always return the same name for the same key, since
+        results are cached.
 
         """
         return key.rstrip("_").replace("_", "-")
@@ -168,13 +324,118 @@ class Element(ElementTree.Element):
         self.append(sub_element)
         return sub_element
 
+    def add_elements(
+        self, tag_name: str, count: int | None = None, /, **attributes
+    ) -> list[Element]:
+        """Add many elements with the same tag as children of this
+        element, with attribute values given column by column. For
+        example:
+
+        ```python3
+        parent.add_elements("circle", cx=xs, cy=ys, r=2, fill="red")
+        ```
+
+        Will add one <circle> per item of `xs` and `ys`, all with
+        `r="2"` and `fill="red"`. An attribute value is either a
+        column (list, tuple, NumPy array, ...) with one value per
+        element, or a scalar (strings included) shared by all of them.
+        If every value is a scalar, pass the number of elements as
+        `count`.
+
+        The result is the same as calling `add_element` once per row —
+        a `None` in a column drops that attribute from that one element
+        — but each attribute name is formatted once per call, and all
+        the children are appended at once. Returns the new elements.
+
+        """
+        format_name = self.format_attribute_name
+        format_value = self.format_attribute_value
+        if self.intern_attribute_values:
+
+            def format_value(value, format_value=format_value):
+                return _intern_value(format_value(value))
+
+        columns = []
+        for key, value in attributes.items():
+            name = _format_name(format_name, key)
+            column = _as_column(value)
+            if column is None:
+                columns.append((name, format_value(value), False))
+                continue
+            if count is None:
+                count = len(column)
+            elif len(column) != count:
+                raise ValueError(
+                    f"attribute {key!r} has {len(column)} values, "
+                    f"expected {count}"
+                )
+            columns.append((name, list(map(format_value, column)), True))
+
+        if count is None:
+            raise ValueError(
+                "can't tell how many elements to add: pass a count or at "
+                "least one attribute with a list of values"
+            )
+        if count < 0:
+            raise ValueError(f"count must be non-negative, got {count}")
+
+        rows = [{} for _ in range(count)]
+        for name, values, is_column in columns:
+            if is_column:
+                for attrib, value in zip(rows, values, strict=True):
+                    if value is not None:
+                        attrib[name] = value
+            elif values is not None:
+                for attrib in rows:
+                    attrib[name] = values
+
+        # Attributes are formatted above, so skip __init__ the same way
+        # `_from_string` does.
+        cls = type(self)
+        children = []
+        for attrib in rows:
+            element = cls.__new__(cls)
+            ElementTree.Element.__init__(element, tag_name, attrib)
+            children.append(element)
+        self.extend(children)
+        return children
+
     @classmethod
     def _from_string(cls, markup: str) -> Element:
         """Parse markup and return a new Element. Internal helper used
         by `add_from_string`; not part of the public API. Raises
         ValueError if the markup can't be parsed.
 
+        Goes through the markup cache when `markup_cache_size` is set.
+
+        """
+        maxsize = cls.markup_cache_size
+        if not maxsize:
+            return cls._parse(markup)
+        key = (cls, markup)
+        cached = _markup_cache.get(key)
+        if cached is None:
+            cached = cls._parse(markup)
+            _markup_cache.put(key, cached, maxsize)
+        return _clone(cached)
+
+    @classmethod
+    def markup_cache_info(cls) -> MarkupCacheInfo:
+        """Return `(hits, misses, currsize)` for the markup cache used
+        by `add_from_string` (see `markup_cache_size`). The cache and
+        its counters are shared by `Element` and all its subclasses.
+
         """
+        return _markup_cache.info()
+
+    @classmethod
+    def markup_cache_clear(cls) -> None:
+        """Empty the markup cache and reset its counters."""
+        _markup_cache.clear()
+
+    @classmethod
+    def _parse(cls, markup: str) -> Element:
+        """Parse markup without going through the markup cache."""
 
         def factory(tag, attrib_dict):
             # Bypass __init__ formatting for parsed attributes — the
@@ -195,14 +456,35 @@ class Element(ElementTree.Element):
             raise ValueError(f"couldn't parse {markup!r}: {exc}") from exc
 
     @classmethod
-    def _from_shape(cls, shape, /, *, precision=None, **attributes) -> Element:
+    def _from_shape(
+        cls,
+        shape,
+        /,
+        *,
+        precision=None,
+        compact=False,
+        simplify=False,
+        tolerance=None,
+        topology=False,
+        executor=None,
+        **attributes,
+    ) -> Element:
         """Build a `<g>` group with one `<path>` per sub-shape of a
         shapely geometry. Internal helper used by `add_shape`; not part
         of the public API.
 
         """
         group = cls("g", **attributes)
-        for path in make_paths_from_shape(shape, precision=precision):
+        paths = make_paths_from_shape(
+            shape,
+            precision=precision,
+            compact=compact,
+            simplify=simplify,
+            tolerance=tolerance,
+            topology=topology,
+            executor=executor,
+        )
+        for path in paths:
             group.add_element("path", d=path)
         return group
 
@@ -219,12 +501,29 @@ class Element(ElementTree.Element):
 
         Raises ValueError if the markup can't be parsed.
 
+        To avoid reparsing markup that is added many times, set
+        `Element.markup_cache_size` (or the same on a subclass). Each
+        call still returns a new, independent copy.
+
         """
         sub_element = type(self)._from_string(markup)
         self.append(sub_element)
         return sub_element
 
-    def add_shape(self, shape, /, *, precision=None, **attributes) -> Element:
+    def add_shape(
+        self,
+        shape,
+        /,
+        *,
+        precision=None,
+        compact=False,
+        simplify=False,
+        tolerance=None,
+        topology=False,
+        viewport=None,
+        executor=None,
+        **attributes,
+    ) -> Element | None:
         """Add an element as a child to this element. For example:
 
         ```python3
@@ -237,13 +536,164 @@ class Element(ElementTree.Element):
 
         Any type of shapely geometry is accepted.
 
+        `precision` rounds coordinates to that many decimal places, and
+        `compact=True` writes the shortest path data (see `make_path`).
+        `simplify=True` first drops vertices that make no visible
+        difference at that precision (see `simplify_shape`, which also
+        takes the `tolerance`). For a map of adjacent regions, add
+        `topology=True` so that shared borders are simplified and
+        rounded the same way on both sides.
+
+        With a `viewport` (a `Viewport`, or the `<svg>` whose `viewBox`
+        to use, or `(min_x, min_y, max_x, max_y)` bounds), the parts of
+        the geometry outside it are left out; if nothing is left, no
+        element is added and None is returned. Pass the same `Viewport`
+        to every call to clip the rest and to count what was culled and
+        clipped.
+
+        `executor` (e.g. a `ProcessPoolExecutor`) spreads the work for
+        a big multi-geometry over several processes; the output is the
+        same. See `make_paths_from_shape`.
+
         """
+        if viewport is not None:
+            shape = _as_viewport(viewport).cull(shape)
+            if shape is None:
+                return None
         sub_element = type(self)._from_shape(
-            shape, precision=precision, **attributes
+            shape,
+            precision=precision,
+            compact=compact,
+            simplify=simplify,
+            tolerance=tolerance,
+            topology=topology,
+            executor=executor,
+            **attributes,
         )
         self.append(sub_element)
         return sub_element
 
+    def add_shapes(
+        self,
+        features,
+        /,
+        *,
+        attributes=None,
+        group=False,
+        precision=None,
+        compact=False,
+        simplify=False,
+        tolerance=None,
+        viewport=None,
+    ) -> list[Element]:
+        """Add many shapes as children of this element, each with its
+        own attributes. For example:
+
+        ```python3
+        parent.add_shapes(
+            ((county.geometry, county) for county in counties),
+            attributes=lambda county: {"fill": COLORS[county.party]},
+            group=True,
+        )
+        ```
+
+        `features` is an iterable of `(shape, properties)` pairs (or
+        of bare shapes, which have no properties), read one at a time,
+        so it can be a generator. `attributes` turns the properties
+        into a dict of attributes; without it, the properties are used
+        as the attributes. `precision`, `compact`, `simplify`,
+        `tolerance` and `viewport` are as for `add_shape`.
+
+        Compared to calling `add_shape` for each feature, a feature
+        that draws as one path is added as a `<path>` with the
+        attributes on it, with no `<g>` around it. Empty features, and
+        those the viewport culls entirely, add nothing.
+
+        With `group=True`, the paths of all features with the same
+        attributes go in one shared `<g>` with those attributes, added
+        where the first of them would have been. That makes for fewer
+        and smaller elements, but draws the features of each group
+        together, so use it when features don't overlap (e.g. the
+        regions of a map) or their order doesn't matter.
+
+        Returns the children added to this element.
+
+        """
+        cls = type(self)
+        if viewport is not None:
+            viewport = _as_viewport(viewport)
+        groups = {}
+        added = []
+        for feature in features:
+            if hasattr(feature, "geom_type"):
+                shape, properties = feature, None
+            else:
+                shape, properties = feature
+            if viewport is not None:
+                shape = viewport.cull(shape)
+                if shape is None:
+                    continue
+            paths = make_paths_from_shape(
+                shape,
+                precision=precision,
+                compact=compact,
+                simplify=simplify,
+                tolerance=tolerance,
+            )
+            if attributes is not None:
+                properties = attributes(properties)
+            attrib = self._format_attributes(properties or {})
+
+            # The path data is formatted already; skip __init__.
+            nodes = []
+            for path in paths:
+                if path:
+                    node = cls.__new__(cls)
+                    ElementTree.Element.__init__(node, "path", {"d": path})
+                    nodes.append(node)
+            if not nodes:
+                continue
+
+            if group and attrib:
+                key = frozenset(attrib.items())
+                parent = groups.get(key)
+                if parent is None:
+                    parent = groups[key] = cls.__new__(cls)
+                    ElementTree.Element.__init__(parent, "g", attrib)
+                    self.append(parent)
+                    added.append(parent)
+                parent.extend(nodes)
+            elif len(nodes) == 1:
+                nodes[0].attrib.update(attrib)
+                self.append(nodes[0])
+                added.append(nodes[0])
+            else:
+                parent = cls.__new__(cls)
+                ElementTree.Element.__init__(parent, "g", attrib)
+                parent.extend(nodes)
+                self.append(parent)
+                added.append(parent)
+        return added
+
+    def add_stamp(self, stamp, /, **values) -> Element:
+        """Add a copy of a compiled fragment as a child, with its
+        placeholders filled in. For example:
+
+        ```python3
+        marker = svg_helpers.Stamp(
+            '<g transform="translate({x},{y})"><circle r="3" /></g>'
+        )
+        for x, y in points:
+            parent.add_stamp(marker, x=x, y=y)
+        ```
+
+        See `svg_helpers.Stamp` for the placeholder rules.
+
+        """
+        sub_element = stamp.make(**values)
+        self.append(sub_element)
+        return sub_element
+
     @property
     def recipes(self):
         """Opt-in higher-level helpers bound to this element as parent.
@@ -264,38 +714,68 @@ class Element(ElementTree.Element):
         """Generate string representation of the element. All
         subelements are included.
 
-        This is a convenient way of calling `xml.etree.ElementTree.tostring`.
+        The output is the same as `xml.etree.ElementTree.tostring`'s,
+        written by `svg_helpers.serialize.markup` in one pass over the
+        tree. With `pretty=True`, the indentation is added while writing,
+        so the tree isn't modified and several threads can pretty-print
+        the same tree at once.
 
         """
-        if pretty:
-            # The custom indenter mutates text/tail in place. Snapshot
-            # those two fields per node and restore in `finally` so
-            # that calling to_string doesn't change the tree. Saving
-            # like this is is faster than deepcopy, but not
-            # thread-safe for concurrent reads of the same tree.
-            saved = [(el, el.text, el.tail) for el in self.iter()]
-            try:
-                _indent_preserving_text(self)
-                return ElementTree.tostring(
-                    self,
-                    encoding="unicode",
-                    method="xml",
-                    xml_declaration=xml_declaration,
-                    short_empty_elements=short_empty_elements,
-                )
-            finally:
-                for el, text, tail in saved:
-                    el.text = text
-                    el.tail = tail
+        return serialize(
+            self,
+            pretty=pretty,
+            xml_declaration=xml_declaration,
+            short_empty_elements=short_empty_elements,
+        )
+
+    def iter_serialize(
+        self,
+        pretty=False,
+        xml_declaration=False,
+        short_empty_elements=True,
+        *,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+    ):
+        """Generate the string representation of the element in chunks
+        of roughly `chunk_size` characters. Takes the same options as
+        `to_string`, and `"".join(element.iter_serialize(...))` equals
+        `element.to_string(...)`. For example:
+
+        ```python3
+        for chunk in svg.iter_serialize(pretty=True):
+            response.write(chunk)
+        ```
+
+        The tree is not modified while serializing. Don't modify it
+        yourself before the generator is exhausted.
 
-        return ElementTree.tostring(
+        """
+        return iter_serialize(
             self,
-            encoding="unicode",
-            method="xml",
+            pretty=pretty,
             xml_declaration=xml_declaration,
             short_empty_elements=short_empty_elements,
+            chunk_size=chunk_size,
         )
 
+    def content_hash(self, algorithm: str = "sha256") -> str:
+        """Return a hex digest of the element's content, e.g. for an
+        HTTP ETag:
+
+        ```python3
+        etag = f'"{svg.content_hash()}"'
+        ```
+
+        The same as hashing `to_string()` encoded as UTF-8, with
+        `hashlib.new(algorithm)`, but the markup is hashed as it's
+        written, without making the string. In a tree of
+        `svg_helpers.cached.CachedElement`, the digest is kept until
+        something in the subtree changes, and the unchanged parts
+        aren't written again after that.
+
+        """
+        return content_hash(self, algorithm)
+
     def save(
         self,
         filename,
@@ -303,30 +783,54 @@ class Element(ElementTree.Element):
         pretty=True,
         xml_declaration=True,
         short_empty_elements=True,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        compress=None,
+        compresslevel=9,
     ) -> None:
         """Write the SVG to a file. `filename` may be a path-like
-        object or an open text-mode file object with a `.write` method.
-        For example:
+        object or an open file object with a `.write` method, in text
+        or binary mode. For example:
 
         ```python3
         svg.save("japan.svg")
         svg.save("compact.svg", pretty=False, xml_declaration=False)
+        svg.save("japan.svgz")
         ```
 
+        The document is written in chunks (see `iter_serialize`), so
+        the full string is never held in memory.
+
+        With `compress=True` the output is gzipped (an `.svgz` file),
+        compressed chunk by chunk as it is written; `compresslevel` is
+        the gzip level, 0 to 9. By default, paths ending in `.svgz` are
+        compressed and everything else isn't. Compressed output needs a
+        binary file object, e.g. an HTTP response body.
+
         """
-        content = self.to_string(
+        if not 0 <= compresslevel <= 9:
+            raise ValueError(
+                f"compresslevel must be between 0 and 9, got {compresslevel}"
+            )
+        chunks = self.iter_serialize(
             pretty=pretty,
             xml_declaration=xml_declaration,
             short_empty_elements=short_empty_elements,
+            chunk_size=chunk_size,
         )
         if hasattr(filename, "write"):
-            filename.write(content)
+            _write_chunks(filename, chunks, compress, compresslevel)
+            return
+        if compress is None:
+            compress = os.fsdecode(filename).lower().endswith(".svgz")
+        if compress:
+            with open(filename, "wb") as outfile:
+                _write_chunks(outfile, chunks, compress, compresslevel)
             return
         # newline="" disables platform newline translation so saved
         # files use \n everywhere — Windows otherwise rewrites \n to \r\n
         # on disk
         with open(filename, "w", encoding="utf-8", newline="") as outfile:
-            outfile.write(content)
+            _write_chunks(outfile, chunks, compress, compresslevel)
 
     def __copy__(self) -> Element:
         clone = type(self).__new__(type(self))
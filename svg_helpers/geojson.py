@@ -0,0 +1,144 @@
+"""Make svg paths straight from GeoJSON, without shapely.
+
+`make_paths_from_geojson` draws a decoded GeoJSON geometry (or feature)
+the same way `make_paths_from_shape` draws the shapely geometry built
+from it, without building one. For example:
+
+```python3
+import json
+
+from svg_helpers.geojson import make_paths_from_geojson
+
+for feature in json.load(open("counties.geojson"))["features"]:
+    group = svg.add_element("g", fill=feature["properties"]["color"])
+    for d in make_paths_from_geojson(feature, precision=2):
+        group.add_element("path", d=d)
+```
+
+"""
+
+from svg_helpers.shapely_helpers import _np, _validate_precision, make_path
+
+
+def make_paths_from_geojson(geometry, precision=None, compact=False) -> list:
+    """Make a list of svg path values that will draw a GeoJSON
+    geometry: a dict with `"type"` and `"coordinates"` (or
+    `"geometries"`), a `"Feature"` with one, or anything with a
+    `__geo_interface__`.
+
+    The result is the same as `make_paths_from_shape` for the
+    equivalent shapely geometry: one path per point, line or polygon
+    (holes included in their polygon's path), with empty parts skipped,
+    rings closed, and `precision` and `compact` passed on to
+    `make_path`. Like shapely, coordinates are read as floats and rings
+    that don't end where they start are closed. A feature without a
+    geometry, like an empty geometry, gives `[""]`.
+
+    """
+    _validate_precision(precision)
+    geometry = getattr(geometry, "__geo_interface__", geometry)
+    try:
+        geom_type = geometry["type"]
+    except (TypeError, KeyError) as exc:
+        raise TypeError(
+            f"expected a GeoJSON geometry, got {type(geometry)}"
+        ) from exc
+    if geom_type == "Feature":
+        if geometry.get("geometry") is None:
+            return [""]
+        return make_paths_from_geojson(
+            geometry["geometry"], precision=precision, compact=compact
+        )
+
+    paths = _make_paths(geometry, geom_type, precision, compact)
+    return paths or [""]
+
+
+def _make_paths(geometry, geom_type, precision, compact):
+    """The paths for a geometry, with no paths for empty parts."""
+    if geom_type == "GeometryCollection":
+        return [
+            path
+            for part in geometry["geometries"]
+            for path in _make_paths(part, part["type"], precision, compact)
+        ]
+
+    coordinates = geometry["coordinates"]
+    if geom_type == "Point":
+        lines = [[coordinates]] if coordinates else []
+        closed = True
+    elif geom_type == "MultiPoint":
+        lines = [[point] for point in coordinates if point]
+        closed = True
+    elif geom_type == "LineString":
+        lines = [coordinates] if coordinates else []
+        closed = False
+    elif geom_type == "MultiLineString":
+        lines = [line for line in coordinates if line]
+        closed = False
+    elif geom_type == "Polygon":
+        return [
+            _make_polygon_path(polygon, precision, compact)
+            for polygon in [coordinates]
+            if polygon and polygon[0]
+        ]
+    elif geom_type == "MultiPolygon":
+        return [
+            _make_polygon_path(polygon, precision, compact)
+            for polygon in coordinates
+            if polygon and polygon[0]
+        ]
+    else:
+        raise ValueError(f"unknown GeoJSON geometry type {geom_type!r}")
+
+    # A point is drawn like shapely's: a one-point closed path.
+    return [
+        make_path(
+            _as_points(line),
+            closed=closed,
+            precision=precision,
+            compact=compact,
+        )
+        for line in lines
+    ]
+
+
+def _make_polygon_path(rings, precision, compact):
+    """One path for the exterior and interior rings of a polygon, like
+    `make_path_from_shapely_polygon`.
+
+    """
+    return "".join(
+        make_path(
+            _as_points(ring, close=True),
+            closed=True,
+            precision=precision,
+            compact=compact,
+        )
+        for ring in rings
+        if ring
+    )
+
+
+def _as_points(positions, close=False):
+    """Return GeoJSON positions as float (x, y) points: an array when
+    NumPy is installed, otherwise a list of tuples. With `close`, the
+    first point is repeated at the end if it isn't there already.
+
+    """
+    if _np is not None:
+        try:
+            points = _np.asarray(positions, dtype=float)[:, :2]
+        except ValueError:  # mixed 2D and 3D positions
+            points = _np.array(
+                [position[:2] for position in positions], dtype=float
+            )
+        if close and (points[0] != points[-1]).any():
+            points = _np.concatenate([points, points[:1]])
+        return points
+    points = [
+        (float(position[0]), float(position[1])) for position in positions
+    ]
+    if close and points[0] != points[-1]:
+        points.append(points[0])
+    return points
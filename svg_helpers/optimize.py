@@ -0,0 +1,499 @@
+"""Passes that rewrite an `Element` tree into a smaller document that
+renders the same.
+
+```python3
+info = svg_helpers.optimize.deduplicate(svg)
+print(f"saved {info.bytes_saved} bytes")
+```
+
+Each pass changes the tree in place and reports what it did. Sizes are
+counted in characters of the compact `to_string()` output.
+
+"""
+
+import functools
+import re
+from collections import namedtuple
+from xml.etree import ElementTree
+
+from svg_helpers.serialize import (
+    _escape_attrib,
+    _escape_cdata,
+    _namespaces,
+    _preserve_inner_whitespace,
+)
+
+DeduplicateInfo = namedtuple("DeduplicateInfo", "groups replaced bytes_saved")
+ExtractClassesInfo = namedtuple(
+    "ExtractClassesInfo", "classes elements bytes_saved"
+)
+
+# Elements whose children are drawn in place, so a child can be swapped
+# for a <use> of it. Anything else (<defs>, <clipPath>, <mask>, <text>,
+# <switch>, ...) either isn't rendered directly or restricts its content.
+_CONTAINER_TAGS = frozenset({"svg", "g", "a"})
+
+# Elements that can be moved into <defs> and drawn with <use>.
+_REUSABLE_TAGS = frozenset(
+    {
+        "g",
+        "path",
+        "rect",
+        "circle",
+        "ellipse",
+        "line",
+        "polyline",
+        "polygon",
+        "text",
+        "image",
+        "use",
+    }
+)
+
+# Elements for which `x`/`y` only translate the whole element, the same
+# as `x`/`y` on a <use>. (On a <g> they do nothing; on <text> they
+# don't move absolutely positioned <tspan>s.)
+_TRANSLATED_BY_XY_TAGS = frozenset({"rect", "image", "use"})
+
+# Presentation attributes that mean the same as a CSS declaration with
+# the same name and value. Geometry (x, width, d, ...), `transform` and
+# lengths that need a unit in CSS (font-size, ...) aren't included.
+_CSS_PROPERTIES = frozenset(
+    {
+        "clip-path",
+        "clip-rule",
+        "color",
+        "display",
+        "fill",
+        "fill-opacity",
+        "fill-rule",
+        "filter",
+        "font-family",
+        "font-style",
+        "font-weight",
+        "marker-end",
+        "marker-mid",
+        "marker-start",
+        "mask",
+        "opacity",
+        "paint-order",
+        "shape-rendering",
+        "stroke",
+        "stroke-dasharray",
+        "stroke-dashoffset",
+        "stroke-linecap",
+        "stroke-linejoin",
+        "stroke-miterlimit",
+        "stroke-opacity",
+        "stroke-width",
+        "text-anchor",
+        "vector-effect",
+        "visibility",
+    }
+)
+
+# Values that could break out of a CSS declaration.
+_UNSAFE_CSS_VALUE = re.compile(r"[{};\\]|/\*|^\s*$")
+
+# Property names declared in a stylesheet.
+_CSS_DECLARATION = re.compile(r"([-a-zA-Z]+)\s*:")
+
+_ANIMATION_TAGS = frozenset(
+    {"animate", "animateTransform", "animateMotion", "set"}
+)
+
+
+@functools.lru_cache(maxsize=1024)
+def _split_tag(tag):
+    """Return ("{namespace}", local name) for a tag, with "" for no
+    namespace.
+
+    """
+    if tag.startswith("{"):
+        namespace, local = tag[1:].split("}", 1)
+        return "{" + namespace + "}", local
+    return "", tag
+
+
+def _start_tag_length(qtag, items, qnames):
+    """Length of `<qtag a="..." ...`, without the closing `>` or ` />`,
+    as the serializer writes it.
+
+    """
+    length = 1 + len(qtag)
+    for key, value in items:
+        if isinstance(key, ElementTree.QName):
+            key = key.text
+        if isinstance(value, ElementTree.QName):
+            value = qnames[value.text]
+        else:
+            value = _escape_attrib(value)
+        length += len(qnames.get(key, key)) + len(value) + 4
+    return length
+
+
+def _position_keys(node, local):
+    """The attributes of `node` that can move onto a <use> in its
+    place: `transform`, plus `x` and `y` where they only translate.
+
+    An animation child may target these attributes, in which case they
+    have to stay on the element itself.
+
+    """
+    attrib = node.attrib
+    if local in _TRANSLATED_BY_XY_TAGS:
+        keys = tuple(k for k in ("transform", "x", "y") if k in attrib)
+    else:
+        keys = ("transform",) if "transform" in attrib else ()
+    if keys and any(
+        isinstance(child.tag, str)
+        and _split_tag(child.tag)[1] in _ANIMATION_TAGS
+        for child in node
+    ):
+        return ()
+    return keys
+
+
+def deduplicate(element, *, min_size=64, id_prefix="u") -> DeduplicateInfo:
+    """Replace repeated subtrees of `element` by `<use>` references to
+    one copy in `<defs>`. For example, a thousand copies of the same
+    icon group, each with its own `transform`, become one `<g id="u0">`
+    in `<defs>` and a thousand `<use href="#u0" transform="..." />`.
+
+    Subtrees are compared structurally: same tags, attributes, text and
+    children. The positioning attributes of a subtree's top element
+    (`transform`, and `x`/`y` on elements where they just translate)
+    don't count — they move to the `<use>`, so copies placed at
+    different positions are shared too. Only subtrees of at least
+    `min_size` characters that are drawn directly (children of `<svg>`,
+    `<g>` or `<a>`), and that contain no `id`, are considered, and a
+    group is only replaced if that makes the document shorter. New ids
+    are `id_prefix` plus a number, skipping ids already in the
+    document. The definitions go into the root's first `<defs>` child,
+    which is created if needed.
+
+    The rendered result is the same, except for CSS selectors that
+    depend on document structure (`g > rect`, `:nth-child`, ...), which
+    may stop matching.
+
+    Returns `DeduplicateInfo(groups, replaced, bytes_saved)`: the
+    number of new definitions, the number of subtrees replaced by a
+    `<use>`, and how much shorter the compact serialization got.
+
+    Runs in time linear in the size of the tree.
+
+    """
+    qnames, _ = _namespaces(element)
+    nodes = list(element.iter())
+
+    # Top-down: which elements are drawn directly in a container.
+    drawn = {element: False}
+    ids = set()
+    for node in nodes:
+        tag = node.tag
+        is_container = (
+            (drawn[node] or node is element)
+            and isinstance(tag, str)
+            and _split_tag(tag)[1] in _CONTAINER_TAGS
+        )
+        for child in node:
+            drawn[child] = is_container
+        if "id" in node.attrib:
+            ids.add(node.attrib["id"])
+
+    # Bottom-up: a structural key (a small int) and the serialized
+    # size of every node, and for each candidate its "shape": the key
+    # of its structure without the positioning attributes.
+    keys = {}
+    node_keys = {}
+    sizes = {}
+    pinned = set()  # subtrees with an id, comment, ...: never moved
+    shapes = {}
+    shape_counts = {}
+    for node in reversed(nodes):
+        tag = node.tag
+        text = node.text
+        children = list(node)
+        structure = (
+            tuple(node_keys[child] for child in children),
+            tuple(child.tail for child in children),
+        )
+        node_keys[node] = keys.setdefault(
+            (tag, frozenset(node.attrib.items()), text, structure), len(keys)
+        )
+        sizes[node] = _size(node, text, children, sizes, qnames)
+
+        if (
+            not isinstance(tag, str)
+            or "id" in node.attrib
+            or any(child in pinned for child in children)
+        ):
+            pinned.add(node)
+            continue
+        local = _split_tag(tag)[1]
+        if not drawn[node] or local not in _REUSABLE_TAGS:
+            continue
+        position = _position_keys(node, local)
+        if position:
+            attributes = frozenset(
+                (k, v) for k, v in node.attrib.items() if k not in position
+            )
+            shape = keys.setdefault(
+                (tag, attributes, text, structure), len(keys)
+            )
+        else:
+            shape = node_keys[node]
+        shapes[node] = shape
+        shape_counts[shape] = shape_counts.get(shape, 0) + 1
+
+    # Top-down again, in document order: the outermost repeated
+    # subtrees, with the parent and index each one is replaced at.
+    occurrences = {}
+    stack = [(element, enumerate(element))]
+    while stack:
+        parent, children = stack[-1]
+        for index, child in children:
+            shape = shapes.get(child)
+            if (
+                shape is not None
+                and shape_counts[shape] > 1
+                and sizes[child] >= min_size
+            ):
+                occurrences.setdefault(shape, []).append(
+                    (parent, index, child)
+                )
+            elif len(child):
+                stack.append((child, enumerate(child)))
+                break
+        else:
+            stack.pop()
+
+    replaced = 0
+    saved = 0
+    definitions = []
+    counter = 0
+    for found in occurrences.values():
+        if len(found) < 2:
+            continue
+        while f"{id_prefix}{counter}" in ids:
+            counter += 1
+        new_id = f"{id_prefix}{counter}"
+
+        first = found[0][2]
+        qtag = qnames[first.tag]
+        namespace, local = _split_tag(first.tag)
+        position = _position_keys(first, local)
+        use_qtag = qtag[: -len(local)] + "use"
+
+        # Characters added: the definition (the first copy, minus its
+        # positioning attributes, plus an id), then a <use> instead of
+        # each copy. The copies only differ in positioning attributes.
+        definition_items = [("id", new_id)] + [
+            (k, v) for k, v in first.items() if k not in position
+        ]
+        cost = (
+            sizes[first]
+            - _start_tag_length(qtag, first.items(), qnames)
+            + _start_tag_length(qtag, definition_items, qnames)
+        )
+        uses = []
+        for parent, index, node in found:
+            attrib = {"href": "#" + new_id}
+            attrib.update(
+                (k, node.attrib[k]) for k in _position_keys(node, local)
+            )
+            use_size = _start_tag_length(use_qtag, attrib.items(), qnames) + 3
+            cost += use_size - sizes[node]
+            uses.append((parent, index, node, attrib))
+        if cost >= 0:
+            continue
+
+        counter += 1
+        cls = type(first)
+        for parent, index, node, attrib in uses:
+            use = cls.__new__(cls)
+            ElementTree.Element.__init__(use, namespace + "use", attrib)
+            use.tail = node.tail
+            parent[index] = use
+        for key in position:
+            del first.attrib[key]
+        first.attrib = {"id": new_id, **first.attrib}
+        first.tail = None
+        definitions.append(first)
+        replaced += len(uses)
+        saved -= cost
+
+    if definitions:
+        saved -= _add_definitions(element, definitions, qnames)
+    return DeduplicateInfo(len(definitions), replaced, saved)
+
+
+def _size(node, text, children, sizes, qnames):
+    """Serialized size of `node` (without its tail), given the sizes of
+    its children.
+
+    """
+    tag = node.tag
+    if tag is ElementTree.Comment:
+        return len(f"<!--{text}-->")
+    if tag is ElementTree.ProcessingInstruction:
+        return len(f"<?{text}?>")
+    content = len(_escape_cdata(text)) if text else 0
+    for child in children:
+        content += sizes[child]
+        if child.tail:
+            content += len(_escape_cdata(child.tail))
+    if tag is None:
+        return content
+    qtag = qnames[tag]
+    size = _start_tag_length(qtag, node.items(), qnames)
+    if text or children:
+        return size + 1 + content + len(qtag) + 3
+    return size + 3
+
+
+def _add_definitions(root, definitions, qnames):
+    """Append `definitions` to the first <defs> child of `root`,
+    creating it if needed. Returns how many characters the <defs>
+    element itself added to the serialization.
+
+    """
+    namespace, local = _split_tag(root.tag)
+    for child in root:
+        if isinstance(child.tag, str) and _split_tag(child.tag)[1] == "defs":
+            defs = child
+            # "<defs />" becomes "<defs>...</defs>".
+            added = 0 if len(defs) or defs.text else len(qnames[defs.tag]) + 1
+            break
+    else:
+        cls = type(root)
+        defs = cls.__new__(cls)
+        ElementTree.Element.__init__(defs, namespace + "defs", {})
+        root.insert(0, defs)
+        qtag = qnames[root.tag][: -len(local)] + "defs"
+        added = 2 * len(qtag) + 5  # "<defs></defs>"
+    defs.extend(definitions)
+    return added
+
+
+def extract_classes(
+    element, *, min_count=2, class_prefix="c"
+) -> ExtractClassesInfo:
+    """Move repeated sets of presentation attributes into CSS classes
+    in a new `<style>` element. For example, ten thousand
+    `<path fill="#ccc" stroke="white" stroke-width="0.5" d="..." />`
+    become `<path d="..." class="c0" />` plus one rule
+    `.c0{fill:#ccc;stroke:white;stroke-width:0.5}`.
+
+    Only presentation attributes that mean the same as a CSS
+    declaration are moved: paint and stroke properties, `opacity`,
+    `font-family`, `text-anchor` and the like, but not geometry,
+    `transform` or `font-size`. Elements with the same set of those, in any
+    order, share a class when at least `min_count` of them do and the
+    document gets shorter. A class is added to any existing `class`
+    attribute. New names are `class_prefix` plus a number, skipping
+    class names already in use. The `<style>` goes first in `element`.
+
+    Elements that keep their inner whitespace (see
+    `PRESERVE_INNER_WHITESPACE_TAGS`), and everything inside them, are
+    left alone. A property that a `<style>` in the document already
+    sets is left alone too: a class rule would outrank a
+    presentation attribute in that stylesheet's cascade, while
+    presentation attributes always lose to it.
+
+    Returns `ExtractClassesInfo(classes, elements, bytes_saved)`: the
+    number of new classes, the number of elements using them, and how
+    much shorter the compact serialization got.
+
+    """
+    qnames, _ = _namespaces(element)
+    taken_properties = set()
+    taken_classes = set()
+    candidates = []
+    stack = [element]
+    while stack:
+        node = stack.pop()
+        tag = node.tag
+        if isinstance(tag, str):
+            if _preserve_inner_whitespace(node):
+                continue
+            if _split_tag(tag)[1] == "style":
+                taken_properties.update(
+                    _CSS_DECLARATION.findall(node.text or "")
+                )
+                continue
+            if "class" in node.attrib:
+                taken_classes.update(node.attrib["class"].split())
+            candidates.append(node)
+        stack.extend(reversed(node))
+
+    # Group elements by their movable attributes, in document order.
+    groups = {}
+    for node in candidates:
+        declarations = tuple(
+            (key, value)
+            for key, value in node.attrib.items()
+            if key in _CSS_PROPERTIES
+            and key not in taken_properties
+            and isinstance(value, str)
+            and not _UNSAFE_CSS_VALUE.search(value)
+        )
+        if declarations:
+            group = groups.setdefault(frozenset(declarations), [])
+            group.append((node, declarations))
+
+    rules = []
+    classes = 0
+    elements = 0
+    saved = 0
+    counter = 0
+    for found in groups.values():
+        if len(found) < min_count:
+            continue
+        while f"{class_prefix}{counter}" in taken_classes:
+            counter += 1
+        name = f"{class_prefix}{counter}"
+
+        declarations = found[0][1]
+        rule = (
+            f".{name}{{"
+            + ";".join(f"{key}:{value}" for key, value in declarations)
+            + "}"
+        )
+        removed = sum(
+            len(key) + len(_escape_attrib(value)) + 4
+            for key, value in declarations
+        )
+        change = len(_escape_cdata(rule))
+        for node, _ in found:
+            if "class" in node.attrib:
+                change += len(name) + 1 - removed
+            else:
+                change += len(name) + 9 - removed  # ' class="..."'
+        if change >= 0:
+            continue
+
+        counter += 1
+        for node, _ in found:
+            attrib = node.attrib
+            for key, _ in declarations:
+                del attrib[key]
+            if "class" in attrib:
+                attrib["class"] += " " + name
+            else:
+                attrib["class"] = name
+        rules.append(rule)
+        classes += 1
+        elements += len(found)
+        saved -= change
+
+    if rules:
+        namespace, local = _split_tag(element.tag)
+        cls = type(element)
+        style = cls.__new__(cls)
+        ElementTree.Element.__init__(style, namespace + "style", {})
+        style.text = "".join(rules)
+        element.insert(0, style)
+        qtag = qnames[element.tag][: -len(local)] + "style"
+        saved -= 2 * len(qtag) + 5  # "<style></style>"
+    return ExtractClassesInfo(classes, elements, saved)
@@ -0,0 +1,651 @@
+"""Streaming serialization of `Element` trees.
+
+`iter_serialize` yields the same markup as `Element.to_string`, but in
+chunks of bounded size, so a large document can be written out
+without building the whole string first. Reach it via
+`element.iter_serialize(...)` or `element.save(...)`.
+
+`serialize` (behind `Element.to_string`) writes the whole document in
+one pass over the tree instead: names are qualified as they're met, so
+there's no separate walk to collect namespaces, and short attribute
+values are escaped once per document rather than once per use.
+
+Pretty-printing happens here too: indentation is decided while
+writing, never by changing `text`/`tail` on the tree, so serializing
+a shared tree from several threads is safe.
+
+"""
+
+import hashlib
+import itertools
+import threading
+from xml.etree import ElementTree
+
+# SVG elements whose inter-child whitespace is rendered as a literal
+# space character per the XML default whitespace rules. Indenting
+# inside one of these shifts visible layout (e.g. a half-space per
+# chunk under text-anchor="middle"), so pretty-printing must leave
+# their contents untouched. From SVG 1.1 §10.10 ("Text content
+# elements") plus `foreignObject` (whose contents are non-SVG markup
+# where whitespace also matters).
+PRESERVE_INNER_WHITESPACE_TAGS = frozenset(
+    {"text", "tspan", "textPath", "tref", "altGlyph", "foreignObject"}
+)
+
+# Number of characters collected before `iter_serialize` yields a chunk.
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# What `ElementTree.tostring(..., encoding="unicode")` writes for
+# `xml_declaration=True`.
+XML_DECLARATION = "<?xml version='1.0' encoding='utf-8'?>\n"
+
+_XML_SPACE_ATTR = "{http://www.w3.org/XML/1998/namespace}space"
+
+# ElementTree's own escaping and namespace helpers, so that output
+# stays byte-identical to `ElementTree.tostring`.
+_escape_cdata = ElementTree._escape_cdata
+_escape_attrib = ElementTree._escape_attrib
+_namespaces = ElementTree._namespaces
+
+# Attribute values up to this long are escaped once per document and
+# looked up after that; longer ones (path data, ...) are rarely
+# repeated.
+_ESCAPE_CACHE_MAX_LENGTH = 64
+
+# The list each thread's `markup` collects pieces in, reused from call
+# to call.
+_buffers = threading.local()
+
+# Pieces of markup joined, encoded and hashed at once by `content_hash`.
+_PIECES_PER_UPDATE = 256
+
+
+def _local_tag(tag):
+    """Strip a Clark-notation namespace prefix from a tag name."""
+    if isinstance(tag, str) and tag.startswith("{"):
+        return tag.split("}", 1)[1]
+    return tag
+
+
+def _preserve_inner_whitespace(elem):
+    if _local_tag(elem.tag) in PRESERVE_INNER_WHITESPACE_TAGS:
+        return True
+    # xml:space="preserve" is the spec-defined escape hatch — check
+    # both the Clark-notation form (used by the parser) and the bare
+    # form (used by direct kwargs).
+    return (
+        elem.get(_XML_SPACE_ATTR) == "preserve"
+        or elem.get("xml:space") == "preserve"
+    )
+
+
+def _is_blank(value):
+    return not value or not value.strip()
+
+
+def _start_tag(tag, elem, qnames, namespaces):
+    """Return the opening `<tag attr="...">` markup, without the
+    closing `>` or ` />`.
+
+    """
+    parts = ["<", tag]
+    if namespaces:
+        for uri, prefix in sorted(namespaces.items(), key=lambda x: x[1]):
+            prefix = ":" + prefix if prefix else prefix
+            parts.append(f' xmlns{prefix}="{_escape_attrib(uri)}"')
+    for key, value in elem.items():
+        if isinstance(key, ElementTree.QName):
+            key = key.text
+        if isinstance(value, ElementTree.QName):
+            value = qnames[value.text]
+        else:
+            value = _escape_attrib(value)
+        parts.append(f' {qnames[key]}="{value}"')
+    return "".join(parts)
+
+
+def iter_markup(element, *, short_empty_elements=True, indent=None):
+    """Yield the markup for `element` and its subtree in small pieces,
+    in document order. Output matches `ElementTree.tostring` (with
+    `encoding="unicode"`).
+
+    If `indent` is a string, whitespace-only text and tails are
+    replaced by a newline plus `indent` per nesting level — the same
+    layout `Element.to_string(pretty=True)` produces. The indentation
+    is computed while writing, so the tree itself is never modified.
+    Elements that need their whitespace kept (see
+    `PRESERVE_INNER_WHITESPACE_TAGS`) are written as-is.
+
+    The walk uses an explicit stack rather than recursion.
+
+    """
+    return _iter_markup(element, short_empty_elements, indent)
+
+
+def _iter_markup(element, short_empty_elements, indent, cache=False):
+    """`iter_markup`. With `cache`, the markup of elements with
+    `caches_markup` set (see `svg_helpers.cached`) is reused and kept
+    as by `_markup_writer`, except that of `element` itself, which is
+    the whole document: when the markup of all its children with
+    children is kept, it gets an empty dict of kept markup, for
+    `content_hash` to keep its digest in.
+
+    """
+    qnames, namespaces = _namespaces(element)
+    pretty = indent is not None
+    # With `cache`: the pieces yielded since the first element still
+    # open whose markup is being kept, and the number of elements met
+    # whose markup can't be kept (see `_markup_writer`).
+    recorded = []
+    record = recorded.append
+    recording = 0
+    uncacheable = 0
+
+    # One frame per open element: [children iterator, number of
+    # children not yet visited, nesting level of the children, whether
+    # the children are indented, end tag, the element's own tail], and
+    # with `cache`, [the element, its key in the kept markup, where its
+    # markup starts in `recorded` (None if it isn't recorded),
+    # `uncacheable` when it was opened].
+    stack = []
+    elem = element
+    tail = element.tail
+    level = 0
+    in_indented_context = pretty
+    while True:
+        tag = elem.tag
+        kept = None
+        if cache:
+            key = (
+                indent,
+                short_empty_elements,
+                level if in_indented_context else -1,
+            )
+            if not _keeps_markup(elem):
+                uncacheable += 1
+            else:
+                kept = elem.__dict__.get("_markup")
+                if kept is not None:
+                    kept = kept.get(key)
+        if kept is not None:
+            if recording:
+                record(kept)
+            yield kept
+        elif tag is ElementTree.Comment:
+            piece = f"<!--{elem.text}-->"
+            if recording:
+                record(piece)
+            yield piece
+        elif tag is ElementTree.ProcessingInstruction:
+            piece = f"<?{elem.text}?>"
+            if recording:
+                record(piece)
+            yield piece
+        else:
+            text = elem.text
+            n_children = len(elem)
+            indent_children = (
+                in_indented_context
+                and n_children > 0
+                and not _preserve_inner_whitespace(elem)
+            )
+            if indent_children and _is_blank(text):
+                text = "\n" + indent * (level + 1)
+
+            # Markup is kept for elements with children, but not for
+            # `element`, whose markup is the whole document.
+            first = None
+            if (
+                cache
+                and n_children
+                and elem is not element
+                and _keeps_markup(elem)
+            ):
+                if not recording:
+                    recorded.clear()
+                first = len(recorded)
+                recording += 1
+
+            qtag = qnames[tag]
+            if qtag is None:
+                end_tag = ""
+            else:
+                start = _start_tag(qtag, elem, qnames, namespaces)
+                if text or n_children or not short_empty_elements:
+                    start += ">"
+                    end_tag = f"</{qtag}>"
+                else:
+                    start += " />"
+                    end_tag = None
+                if recording:
+                    record(start)
+                yield start
+            namespaces = None  # declared on the first start tag only
+
+            if end_tag is not None:
+                if n_children:
+                    frame = [
+                        iter(elem),
+                        n_children,
+                        level + 1,
+                        indent_children,
+                        end_tag,
+                        tail,
+                    ]
+                    if cache:
+                        frame += (elem, key, first, uncacheable)
+                    stack.append(frame)
+                    elem = None
+                if text:
+                    text = _escape_cdata(text)
+                    if recording:
+                        record(text)
+                    yield text
+                if elem is not None and end_tag:
+                    if recording:
+                        record(end_tag)
+                    yield end_tag
+
+        if elem is not None and tail:
+            tail = _escape_cdata(tail)
+            if recording:
+                record(tail)
+            yield tail
+
+        # Move on to the next element: the next child of the innermost
+        # open element, closing finished elements along the way.
+        while stack:
+            frame = stack[-1]
+            if frame[1]:
+                break
+            stack.pop()
+            if frame[4]:
+                if recording:
+                    record(frame[4])
+                yield frame[4]
+            if cache:
+                if frame[8] is not None:
+                    _keep_markup(frame, recorded, uncacheable)
+                    recording -= 1
+                elif frame[6] is element and not uncacheable:
+                    element.__dict__.setdefault("_markup", {})
+            if frame[5]:
+                tail = _escape_cdata(frame[5])
+                if recording:
+                    record(tail)
+                yield tail
+        else:
+            return
+
+        frame[1] -= 1
+        elem = next(frame[0])
+        level = frame[2]
+        in_indented_context = frame[3]
+        tail = elem.tail
+        if in_indented_context and _is_blank(tail):
+            tail = "\n" + indent * (level if frame[1] else level - 1)
+
+
+def _keeps_markup(elem) -> bool:
+    """Whether the markup of `elem` can be kept: as in `_markup_writer`,
+    it must track its changes, and have no Clark-notation names.
+
+    """
+    if not getattr(elem, "caches_markup", False):
+        return False
+    tag = elem.tag
+    return (
+        type(tag) is str
+        and tag[:1] != "{"
+        and all(type(key) is str and key[:1] != "{" for key, _ in elem.items())
+    )
+
+
+def _keep_markup(frame, recorded, uncacheable):
+    """Keep the markup recorded for the element of a closed
+    `_iter_markup` frame, if nothing met in its subtree prevents it.
+
+    """
+    elem, key, first, before = frame[6:]
+    if first is not None and uncacheable == before:
+        elem.__dict__.setdefault("_markup", {})[key] = "".join(
+            recorded[first:]
+        )
+
+
+def _buffer() -> list:
+    """Return this thread's reusable list of pieces, empty."""
+    parts = getattr(_buffers, "parts", None)
+    if parts is None:
+        parts = _buffers.parts = []
+    return parts
+
+
+def markup(element, *, short_empty_elements=True, indent=None) -> str:
+    """Return the markup for `element` and its subtree as one string:
+    the same as `"".join(iter_markup(element, ...))`, and as
+    `ElementTree.tostring` (with `encoding="unicode"`) when `indent` is
+    None.
+
+    The tree is walked once. Tags and attribute names are qualified
+    when first met, and the `xmlns` declarations that Clark-notation
+    names need are put on the root start tag at the end, so no walk
+    to collect them comes first. Attribute names written as
+    `"xmlns:inkscape"` or `"inkscape:label"` are plain names here, as
+    they are to ElementTree. Trees this walk can't write (`QName`
+    names or values, untagged elements, values that aren't strings)
+    are handed to `iter_markup`, which writes them or raises
+    ElementTree's error.
+
+    """
+    parts = _buffer()
+    try:
+        _write_markup(element, parts, short_empty_elements, indent)
+        return "".join(parts)
+    except (TypeError, RecursionError):
+        return "".join(
+            iter_markup(
+                element,
+                short_empty_elements=short_empty_elements,
+                indent=indent,
+            )
+        )
+    finally:
+        parts.clear()
+
+
+def _write_markup(root, parts, short_empty_elements, indent):
+    """Append the markup for `root` to `parts` in pieces. Raises
+    TypeError for the trees `markup` leaves to `iter_markup`.
+
+    """
+    write = parts.append
+    write_element, qualify, _, namespaces = _markup_writer(
+        parts,
+        short_empty_elements,
+        indent,
+        cache=getattr(root, "caches_markup", False),
+    )
+    first = len(parts)
+    write_element(root, 0, indent is not None)
+    if root.tail:
+        write(_escape_cdata(root.tail))
+    if namespaces:
+        _declare_namespaces(parts, first, qualify(root.tag), namespaces)
+
+
+def _markup_writer(parts, short_empty_elements, indent, cache=False):
+    """Return the functions that write one document in pieces, appended
+    to the list `parts`, and the state they share:
+
+    - `write_element(elem, level, in_indented_context)` writes an
+      element and its subtree, but not its tail.
+    - `qualify(name)` returns the name to write for a tag or attribute
+      name, adding to `namespaces` for Clark-notation names.
+    - `escape(value)` escapes an attribute value.
+    - `namespaces` has the prefixes by namespace URI, to declare on
+      the root start tag with `_declare_namespaces` once the document
+      is written.
+
+    These raise TypeError for names and values that aren't strings.
+
+    With `cache`, the markup of elements with `caches_markup` set (see
+    `svg_helpers.cached`) is kept with them, and written again from
+    there as long as they don't change.
+
+    """
+    write = parts.append
+    # As in `ElementTree._namespaces`: qualified names by name, and
+    # prefixes by namespace URI.
+    qnames = {}
+    namespaces = {}
+    # Escaped attribute values by value.
+    escapes = {}
+    comment = ElementTree.Comment
+    processing_instruction = ElementTree.ProcessingInstruction
+
+    def qualify(name):
+        qname = qnames.get(name)
+        if qname is not None:
+            return qname
+        # A QName or None fails here with TypeError.
+        if name[:1] == "{":
+            uri, local = name[1:].rsplit("}", 1)
+            prefix = namespaces.get(uri)
+            if prefix is None:
+                prefix = ElementTree._namespace_map.get(uri)
+                if prefix is None:
+                    prefix = f"ns{len(namespaces)}"
+                if prefix != "xml":
+                    namespaces[uri] = prefix
+            qname = f"{prefix}:{local}" if prefix else local
+        else:
+            qname = name
+        qnames[name] = qname
+        return qname
+
+    def escape(value):
+        escaped = escapes.get(value)
+        if escaped is None:
+            escaped = _escape_attrib(value)
+            if len(value) <= _ESCAPE_CACHE_MAX_LENGTH:
+                escapes[value] = escaped
+        return escaped
+
+    def write_element(elem, level, in_indented_context):
+        tag = elem.tag
+        if tag is comment:
+            write(f"<!--{elem.text}-->")
+            return
+        if tag is processing_instruction:
+            write(f"<?{elem.text}?>")
+            return
+
+        # `escape` and `qualify` inlined, to save calls.
+        qtag = qnames.get(tag) or qualify(tag)
+        start = "<" + qtag
+        for key, value in elem.items():
+            qkey = qnames.get(key) or qualify(key)
+            escaped = escapes.get(value)
+            if escaped is None:
+                escaped = _escape_attrib(value)
+                if len(value) <= _ESCAPE_CACHE_MAX_LENGTH:
+                    escapes[value] = escaped
+            start = f'{start} {qkey}="{escaped}"'
+
+        text = elem.text
+        n_children = len(elem)
+        if not (text or n_children or not short_empty_elements):
+            write(start + " />")
+            return
+        indent_children = (
+            in_indented_context
+            and n_children > 0
+            and not _preserve_inner_whitespace(elem)
+        )
+        if indent_children and _is_blank(text):
+            text = "\n" + indent * (level + 1)
+        write(start + ">")
+        if text:
+            write(_escape_cdata(text))
+        if indent_children:
+            between = "\n" + indent * (level + 1)
+            after = "\n" + indent * level
+            last = n_children - 1
+            for i, child in enumerate(elem):
+                write_element(child, level + 1, True)
+                tail = child.tail
+                if not tail or tail.isspace():
+                    write(between if i < last else after)
+                else:
+                    write(_escape_cdata(tail))
+        else:
+            for child in elem:
+                write_element(child, level + 1, False)
+                if child.tail:
+                    write(_escape_cdata(child.tail))
+        write(f"</{qtag}>")
+
+    if not cache:
+        return write_element, qualify, escape, namespaces
+
+    write_markup = write_element
+    # Elements met whose markup can't be kept, which makes that of
+    # their ancestors uncacheable too: elements that don't track their
+    # changes, and names whose prefix depends on the whole document.
+    uncacheable = 0
+
+    def write_cached(elem, level, in_indented_context):
+        nonlocal uncacheable
+        if (
+            not getattr(elem, "caches_markup", False)
+            or elem.tag[:1] == "{"
+            or any(key[:1] == "{" for key, _ in elem.items())
+        ):
+            uncacheable += 1
+            write_markup(elem, level, in_indented_context)
+            return
+        if not len(elem):
+            # Quicker to write again than to look up.
+            write_markup(elem, level, in_indented_context)
+            return
+
+        # Without indentation, the markup is the same at any depth.
+        key = (
+            indent,
+            short_empty_elements,
+            level if in_indented_context else -1,
+        )
+        cache = elem.__dict__.get("_markup")
+        if cache is not None:
+            markup = cache.get(key)
+            if markup is not None:
+                write(markup)
+                return
+        before = uncacheable
+        first = len(parts)
+        write_markup(elem, level, in_indented_context)
+        if uncacheable == before:
+            markup = "".join(parts[first:])
+            del parts[first:]
+            write(markup)
+            if cache is None:
+                cache = elem.__dict__["_markup"] = {}
+            cache[key] = markup
+
+    # `write_markup` calls this for the children too.
+    write_element = write_cached
+    return write_element, qualify, escape, namespaces
+
+
+def _declare_namespaces(parts, first, qtag, namespaces):
+    """Add `xmlns` declarations for `namespaces` to the root start tag,
+    `parts[first]`, whose tag is `qtag`.
+
+    """
+    declarations = "".join(
+        f' xmlns{":" + prefix if prefix else ""}="{_escape_attrib(uri)}"'
+        for uri, prefix in sorted(namespaces.items(), key=lambda x: x[1])
+    )
+    start = parts[first]
+    parts[first] = (
+        start[: len(qtag) + 1] + declarations + start[len(qtag) + 1 :]
+    )
+
+
+def content_hash(element, algorithm="sha256") -> str:
+    """Return the hex digest of the UTF-8 compact markup for `element`:
+    the same as `hashlib.new(algorithm, markup(element).encode())`.
+    The pieces of markup are hashed as they're written, a few hundred
+    at a time, so memory use doesn't grow with the document.
+
+    For elements with `caches_markup` set (see `svg_helpers.cached`),
+    the kept markup of unchanged subtrees is hashed rather than written
+    again, and the digest is kept too, until something changes.
+
+    Raises ValueError for an `algorithm` hashlib doesn't have.
+
+    """
+    hasher = hashlib.new(algorithm)
+    caches_markup = getattr(element, "caches_markup", False)
+    if caches_markup:
+        # The digest covers the tail, which the kept markup doesn't, so
+        # a digest for another tail is left unused.
+        key = ("content_hash", algorithm, element.tail)
+        kept = element.__dict__.get("_markup")
+        if kept is not None and key in kept:
+            return kept[key]
+
+    pieces = _iter_markup(element, True, None, cache=caches_markup)
+    while batch := list(itertools.islice(pieces, _PIECES_PER_UPDATE)):
+        hasher.update("".join(batch).encode())
+    digest = hasher.hexdigest()
+
+    if caches_markup:
+        kept = element.__dict__.get("_markup")
+        # Kept only alongside the markup of the subtree, so that
+        # changes below drop it (see `CachedElement._changed`).
+        if kept is not None:
+            kept[key] = digest
+        elif not len(element):
+            element.__dict__.setdefault("_markup", {})[key] = digest
+    return digest
+
+
+def serialize(
+    element,
+    *,
+    pretty=False,
+    xml_declaration=False,
+    short_empty_elements=True,
+) -> str:
+    """Return the serialized document for `element` as one string."""
+    text = markup(
+        element,
+        short_empty_elements=short_empty_elements,
+        indent="  " if pretty else None,
+    )
+    return XML_DECLARATION + text if xml_declaration else text
+
+
+def iter_serialize(
+    element,
+    *,
+    pretty=False,
+    xml_declaration=False,
+    short_empty_elements=True,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+):
+    """Yield the serialized document for `element` as strings of
+    roughly `chunk_size` characters (a chunk may run over by one
+    start tag or text node). Joining the chunks gives the same string
+    as `element.to_string(...)` with the same options.
+
+    For elements with `caches_markup` set (see `svg_helpers.cached`),
+    the kept markup of unchanged subtrees is yielded rather than
+    written again (a chunk runs over by as much), and the markup of
+    the others is kept as it's written, for all but `element` itself.
+
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+
+    buffer = []
+    size = 0
+    if xml_declaration:
+        buffer.append(XML_DECLARATION)
+        size = len(XML_DECLARATION)
+    for piece in _iter_markup(
+        element,
+        short_empty_elements,
+        "  " if pretty else None,
+        cache=getattr(element, "caches_markup", False),
+    ):
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield "".join(buffer)
+            buffer.clear()
+            size = 0
+    if buffer:
+        yield "".join(buffer)
@@ -1,3 +1,36 @@
+import operator
+import re
+from collections import namedtuple
+
+try:
+    import numpy as _np
+except ImportError:  # pragma: no cover. numpy comes with shapely
+    _np = None
+
+# Matches the fractional part of a fixed-point number that is all
+# zeros (group 1 unset, so it's removed together with the ".") or that
+# ends in zeros (group 1 keeps the digits up to the last non-zero).
+# Same result as `s.rstrip("0").rstrip(".")` applied to each number.
+_TRAILING_ZEROS = re.compile(r"\.0+(?![0-9])|(\.[0-9]*?[1-9])0+(?![0-9])")
+
+# Matches the "0" in "0.5" or "-0.5", which path data doesn't need.
+_LEADING_ZERO = re.compile(r"(?<![0-9.])0(?=\.)")
+
+SimplifyResult = namedtuple("SimplifyResult", "shape vertices_removed")
+
+_MULTI_GEOM_TYPES = frozenset(
+    ("MultiPoint", "MultiLineString", "MultiPolygon", "GeometryCollection")
+)
+
+# About how many coordinates to send to an executor at a time: enough
+# that sending them costs little next to formatting them.
+_EXECUTOR_CHUNK_COORDINATES = 50_000
+
+# Below this, an integer number of 10**-precision units survives the
+# trip through a float division and `%f` formatting unchanged.
+_EXACT_GRID_LIMIT = 2**50
+
+
 def _validate_precision(precision):
     if precision is None:
         return
@@ -12,7 +45,7 @@ def _validate_precision(precision):
         )
 
 
-def make_path(points, closed=False, precision=None) -> str:
+def make_path(points, closed=False, precision=None, compact=False) -> str:
     """Make an svg path value from a list of (x, y) points.
 
     If `precision` is given, coordinates are rounded to that many decimal
@@ -22,9 +55,98 @@ def make_path(points, closed=False, precision=None) -> str:
     Extra coordinates per point (e.g. z in (x, y, z)) are ignored, so 3D
     shapely geometries can be rendered without preprocessing.
 
+    Float arrays (NumPy arrays, shapely coordinate sequences) are
+    formatted in bulk when NumPy is installed; the output is the same
+    as for the equivalent list of tuples.
+
+    With `compact=True`, the path data is written as short as possible:
+    each segment uses whichever of the absolute (`L`, `H`, `V`) or
+    relative (`l`, `h`, `v`) commands is shortest, repeated commands are
+    implied, and needless separators and leading zeros are dropped.
+    Relative offsets are taken between already-rounded coordinates, so
+    every point lands exactly where the absolute form puts it and
+    rounding errors don't add up along the path. Without a `precision`
+    only absolute commands are used, since float offsets aren't exact.
+
     """
     _validate_precision(precision)
+    if compact:
+        return _make_compact_path(points, closed, precision)
+
+    coordinates = _as_coordinate_array(points)
+    if coordinates is not None:
+        return _make_path_from_array(coordinates, closed, precision)
+    return _make_path_from_points(points, closed, precision)
+
+
+def _as_coordinate_array(points):
+    """Return `points` as an (n, 2+) float array if it can be formatted
+    in bulk, otherwise None. Only 64-bit float arrays qualify: they
+    print the same through `%` formatting as through `str`/`format`,
+    which isn't true for every number type a list of tuples might hold.
+    Narrower and wider floats (float32, longdouble) would change value
+    on the way to Python floats.
 
+    """
+    if _np is None or not hasattr(points, "__array__"):
+        return None
+    array = _np.asarray(points)
+    dtype = array.dtype
+    if (
+        dtype.kind != "f"
+        or dtype.itemsize != 8
+        or array.ndim != 2
+        or array.shape[1] < 2
+    ):
+        return None
+    return array
+
+
+def _format_template(n_points, precision):
+    """Build a `%`-format template for a path with `n_points` points."""
+    spec = "%s" if precision is None else f"%.{precision}f"
+    if not n_points:
+        return ""
+    return f"M{spec},{spec}" + f"L{spec},{spec}" * (n_points - 1)
+
+
+def _make_path_from_array(coordinates, closed, precision) -> str:
+    """Bulk version of `_make_path_from_points` for an (n, 2+) float
+    array: every number is formatted by one `%` operation over a
+    template, then trailing zeros are stripped a few passes over the
+    whole string.
+
+    """
+    flat = coordinates[:, :2].ravel().tolist()
+    result = _format_template(len(coordinates), precision) % tuple(flat)
+    if precision and result:
+        result = _strip_trailing_zeros(result + "L", precision, ",L")[:-1]
+    if closed and result:
+        result += "Z"
+    return result
+
+
+def _strip_trailing_zeros(text, precision, separators):
+    """Strip trailing zeros (and then a trailing ".") from the numbers
+    in `text`, all formatted with `precision` decimals and each followed
+    by one of the `separators` characters. Same result as
+    `_TRAILING_ZEROS`, but `str.replace` is several times faster than
+    a regex substitution here.
+
+    """
+    # Each pass takes at most one zero off the end of every number, and
+    # since every number has `precision` decimals, those are all zeros
+    # after the decimal point.
+    for _ in range(precision):
+        for separator in separators:
+            text = text.replace("0" + separator, separator)
+    for separator in separators:
+        text = text.replace("." + separator, separator)
+    return text
+
+
+def _make_path_from_points(points, closed, precision) -> str:
+    """Format an iterable of points one coordinate at a time."""
     if precision is None:
 
         def f(v):
@@ -52,7 +174,146 @@ def make_path(points, closed=False, precision=None) -> str:
     return "".join(result)
 
 
-def make_path_from_shapely_polygon(polygon, precision=None) -> str:
+def _flatten(points):
+    """Return [x0, y0, x1, y1, ...] for (x, y, ...) points."""
+    coordinates = _as_coordinate_array(points)
+    if coordinates is not None:
+        return coordinates[:, :2].ravel().tolist()
+    return [v for x, y, *_ in points for v in (x, y)]
+
+
+def _shorten_numbers(text):
+    """Strip trailing and leading zeros from the numbers in `text`."""
+    return _LEADING_ZERO.sub("", _TRAILING_ZEROS.sub(r"\1", text)).split()
+
+
+def _grid_keys(flat, precision):
+    """Snap coordinates to the grid that `precision` prints them on, as
+    whole numbers of 10**-precision units. Returns None if a coordinate
+    isn't finite.
+
+    """
+    text = (f"%.{precision}f " * len(flat)) % tuple(flat)
+    try:
+        return list(map(int, text.replace(".", "").split()))
+    except ValueError:
+        return None
+
+
+def _format_grid(values, precision):
+    """Format integer multiples of 10**-precision as short decimals."""
+    if not precision:
+        return list(map(str, values))
+    if not values or max(map(abs, values)) < _EXACT_GRID_LIMIT:
+        scale = 10**precision
+        text = (f"%.{precision}f " * len(values)) % tuple(
+            v / scale for v in values
+        )
+    else:
+        digits = [str(abs(v)).rjust(precision + 1, "0") for v in values]
+        text = " ".join(
+            f"{'-' if v < 0 else ''}{d[:-precision]}.{d[-precision:]}"
+            for v, d in zip(values, digits, strict=True)
+        )
+    return _shorten_numbers(text)
+
+
+def _pairs(numbers):
+    """Join [x0, y0, x1, y1, ...] into ["x0,y0", "x1,y1", ...] with the
+    comma only where it's needed.
+
+    """
+    return [
+        x + y if _joins(x, y) else f"{x},{y}"
+        for x, y in zip(numbers[0::2], numbers[1::2], strict=True)
+    ]
+
+
+def _joins(before, after):
+    """Whether two numbers can be written with no separator between."""
+    return after[0] == "-" or (
+        after[0] == "." and "." in before and "e" not in before
+    )
+
+
+def _make_compact_path(points, closed, precision) -> str:
+    """Shortest-form path data; see `make_path`."""
+    flat = _flatten(points)
+    if not flat:
+        return ""
+
+    if precision is None:
+        keys = flat
+        absolute = _shorten_numbers(("%s " * len(flat)) % tuple(flat))
+        relative = [None] * (len(flat) - 2)
+        relative_pairs = relative[::2]
+    else:
+        # Offsets between grid points are exact.
+        keys = _grid_keys(flat, precision)
+        if keys is None:  # nan or inf: write it as usual
+            return make_path(points, closed=closed, precision=precision)
+        absolute = _format_grid(keys, precision)
+        relative = _format_grid(
+            [b - a for a, b in zip(keys, keys[2:], strict=False)], precision
+        )
+        relative_pairs = _pairs(relative)
+
+    absolute_pairs = _pairs(absolute)
+    rows = zip(
+        absolute_pairs[1:],
+        absolute[2::2],
+        absolute[3::2],
+        map(operator.eq, keys[2::2], keys[0:-2:2]),
+        map(operator.eq, keys[3::2], keys[1:-2:2]),
+        relative_pairs,
+        relative[0::2],
+        relative[1::2],
+        strict=True,
+    )
+    parts = ["M", absolute_pairs[0]]
+    command = "L"  # what more coordinates right after a moveto mean
+    last = absolute[1]
+    for pair, x, y, same_x, same_y, relative_pair, dx, dy in rows:
+        # Each option is (command, its arguments, the last number).
+        options = [("L", pair, y)]
+        if relative_pair is not None:
+            options.append(("l", relative_pair, dy))
+        if same_y:
+            options.append(("H", x, x))
+            if dx is not None:
+                options.append(("h", dx, dx))
+        if same_x:
+            options.append(("V", y, y))
+            if dy is not None:
+                options.append(("v", dy, dy))
+
+        best_cost = None
+        for option in options:
+            arguments = option[1]
+            if option[0] != command:
+                lead = option[0]
+            elif arguments[0] == "-" or (
+                arguments[0] == "." and "." in last and "e" not in last
+            ):
+                lead = ""
+            else:
+                lead = " "
+            cost = len(lead) + len(arguments)
+            if best_cost is None or cost < best_cost:
+                best, best_lead, best_cost = option, lead, cost
+
+        command, arguments, last = best
+        parts.append(best_lead)
+        parts.append(arguments)
+
+    if closed:
+        parts.append("Z")
+    return "".join(parts)
+
+
+def make_path_from_shapely_polygon(
+    polygon, precision=None, compact=False
+) -> str:
     """Make an svg path value for both the exterior and interior rings
     of a polygon.
 
@@ -65,19 +326,193 @@ def make_path_from_shapely_polygon(polygon, precision=None) -> str:
 
     """
     result = make_path(
-        polygon.exterior.coords, closed=True, precision=precision
+        polygon.exterior.coords,
+        closed=True,
+        precision=precision,
+        compact=compact,
     )
     for interior in polygon.interiors:
-        result += make_path(interior.coords, closed=True, precision=precision)
+        result += make_path(
+            interior.coords, closed=True, precision=precision, compact=compact
+        )
     return result
 
 
-def make_paths_from_shape(shape, precision=None) -> list:
+def simplify_shape(shape, precision=None, tolerance=None) -> SimplifyResult:
+    """Remove vertices that don't change how a shapely geometry draws at
+    the given precision. Returns `SimplifyResult(shape, vertices_removed)`
+    with a new geometry of the same type. For example:
+
+    ```python3
+    result = simplify_shape(coastline, precision=1)
+    print(f"{result.vertices_removed} vertices removed")
+    svg.add_shape(result.shape, precision=1)
+    ```
+
+    In order:
+
+    1. If `tolerance` is positive, each line or polygon is simplified
+       with Douglas–Peucker (shapely's `simplify`, keeping its topology
+       valid). By default the tolerance is half a unit of the last
+       printed digit (0.005 for precision=2), so the simplified outline
+       stays within the rounding error; without a precision there's no
+       default tolerance.
+    2. With a precision, coordinates are rounded to the values
+       `make_path` would print.
+    3. Consecutive duplicate points are dropped.
+    4. Points in the middle of a straight run are dropped.
+
+    A line keeps at least 2 points and a ring at least 4 (3 distinct
+    plus the closing one): a part that would end up with fewer is only
+    rounded. Lines and rings keep the z values of the points kept, not
+    rounded. Points are left as they are.
+
+    `make_paths_from_shape(..., simplify=True)` and
+    `add_shape(..., simplify=True)` apply this first.
+
+    """
+    _validate_precision(precision)
+    tolerance = _tolerance(precision, tolerance)
+    before = _count_coordinates(shape)
+    shape = _simplify_geometry(shape, precision, tolerance)
+    return SimplifyResult(shape, before - _count_coordinates(shape))
+
+
+def _tolerance(precision, tolerance):
+    """The simplification tolerance to use: by default, half a unit of
+    the last printed digit.
+
+    """
+    if tolerance is None:
+        return 0 if precision is None else 0.5 * 10**-precision
+    if tolerance < 0:
+        raise ValueError(f"tolerance must not be negative, got {tolerance}")
+    return tolerance
+
+
+def _count_coordinates(shape):
+    if shape.is_empty:
+        return 0
+    if hasattr(shape, "geoms"):
+        return sum(_count_coordinates(part) for part in shape.geoms)
+    if shape.geom_type == "Polygon":
+        return len(shape.exterior.coords) + sum(
+            len(interior.coords) for interior in shape.interiors
+        )
+    return len(shape.coords)
+
+
+def _simplify_geometry(shape, precision, tolerance):
+    """Rebuild `shape` with each line and ring simplified. Parts of
+    multi-geometries are simplified one at a time: GEOS's
+    topology-preserving simplifier gets much slower with many parts.
+
+    """
+    if shape.is_empty:
+        return shape
+    geom_type = shape.geom_type
+    if geom_type in ("Point", "MultiPoint"):
+        return shape
+    if hasattr(shape, "geoms"):
+        return type(shape)(
+            [
+                _simplify_geometry(part, precision, tolerance)
+                for part in shape.geoms
+                if not part.is_empty
+            ]
+        )
+
+    if tolerance:
+        shape = shape.simplify(tolerance, preserve_topology=True)
+    if geom_type == "Polygon":
+        return type(shape)(
+            _simplify_coordinates(shape.exterior.coords, True, precision),
+            [
+                _simplify_coordinates(interior.coords, True, precision)
+                for interior in shape.interiors
+            ],
+        )
+    closed = geom_type == "LinearRing"
+    return type(shape)(_simplify_coordinates(shape.coords, closed, precision))
+
+
+def _simplify_coordinates(points, closed, precision):
+    """Steps 2 to 4 of `simplify_shape` for one line or ring, as an
+    (n, 2) array, or (n, 3) with the z values of the points kept.
+
+    """
+    points = _np.asarray(points, dtype=float)
+    coordinates = points[:, :2]
+    if precision is None:
+        grid = coordinates
+    else:
+        keys = _grid_keys(coordinates.ravel().tolist(), precision)
+        if keys is None:
+            return points
+        # Exact integer arithmetic below; int64 as long as the cross
+        # products can't overflow it.
+        big = max(map(abs, keys), default=0) >= 2**31
+        grid = _np.array(keys, dtype=object if big else _np.int64)
+        grid = grid.reshape(-1, 2)
+
+    # The positions in `points` of the points kept.
+    kept = _np.flatnonzero(
+        _np.concatenate([[True], (grid[1:] != grid[:-1]).any(axis=1)])
+    )
+    simplified = grid[kept]
+    if len(simplified) >= 3:
+        # A middle point is redundant if it's on the line between its
+        # neighbours and the line goes on in the same direction (so
+        # not the tip of a spike).
+        before = simplified[1:-1] - simplified[:-2]
+        after = simplified[2:] - simplified[1:-1]
+        cross = before[:, 0] * after[:, 1] - before[:, 1] * after[:, 0]
+        dot = before[:, 0] * after[:, 0] + before[:, 1] * after[:, 1]
+        keep = _np.ones(len(simplified), dtype=bool)
+        keep[1:-1] = ~((cross == 0) & (dot > 0))
+        simplified = simplified[keep]
+        kept = kept[keep]
+
+    if len(simplified) < (4 if closed else 2):
+        simplified = grid
+        kept = _np.arange(len(grid))
+    if precision is not None:
+        simplified = (simplified / 10**precision).astype(float)
+    if points.shape[1] > 2:
+        simplified = _np.column_stack([simplified, points[kept, 2:]])
+    return simplified
+
+
+def make_paths_from_shape(
+    shape,
+    precision=None,
+    compact=False,
+    simplify=False,
+    tolerance=None,
+    topology=False,
+    executor=None,
+) -> list:
     """Make a list of svg path values that will draw a geometry.
 
     Empty subgeometries inside multi-geometries and geometry collections
     are skipped (they would otherwise produce useless `<path d=""/>` nodes).
 
+    `precision` and `compact` are passed on to `make_path`. With
+    `simplify=True`, the geometry first goes through `simplify_shape`
+    with the same `precision` and the given `tolerance`.
+
+    With `topology=True`, borders shared by the polygons in the shape
+    (adjacent districts in a MultiPolygon, say) are found first and
+    each is rounded, simplified and formatted only once, so both sides
+    come out identical and no slivers open up between neighbours. See
+    `_make_paths_with_shared_arcs`.
+
+    To use more cores on a big multi-geometry or collection, pass a
+    `concurrent.futures` executor, e.g. a `ProcessPoolExecutor`. The
+    parts are sent to it in chunks, as WKB, and the paths come back in
+    the same order and the same as without it. This doesn't combine
+    with `topology=True`, which needs all the parts at once.
+
     """
     _validate_precision(precision)
 
@@ -91,31 +526,70 @@ def make_paths_from_shape(shape, precision=None) -> list:
     if shape.is_empty:
         return [""]
 
+    if executor is not None and geom_type in _MULTI_GEOM_TYPES:
+        if topology:
+            raise ValueError("topology=True can't be used with an executor")
+        return _make_paths_in_executor(
+            shape, executor, precision, compact, simplify, tolerance
+        )
+    if topology:
+        return _make_paths_with_shared_arcs(
+            shape, precision, compact, simplify, tolerance
+        )
+    if simplify:
+        shape = simplify_shape(shape, precision, tolerance).shape
+
     if geom_type == "Point":
         return [
-            make_path([(shape.x, shape.y)], closed=True, precision=precision)
+            make_path(
+                [(shape.x, shape.y)],
+                closed=True,
+                precision=precision,
+                compact=compact,
+            )
         ]
     elif geom_type == "MultiPoint":
         return [
-            make_path([(p.x, p.y)], closed=True, precision=precision)
+            make_path(
+                [(p.x, p.y)], closed=True, precision=precision, compact=compact
+            )
             for p in shape.geoms
             if not p.is_empty
         ]
     elif geom_type == "LineString":
-        return [make_path(shape.coords, closed=False, precision=precision)]
+        return [
+            make_path(
+                shape.coords,
+                closed=False,
+                precision=precision,
+                compact=compact,
+            )
+        ]
     elif geom_type == "LinearRing":
-        return [make_path(shape.coords, closed=True, precision=precision)]
+        return [
+            make_path(
+                shape.coords, closed=True, precision=precision, compact=compact
+            )
+        ]
     elif geom_type == "MultiLineString":
         return [
-            make_path(line.coords, closed=False, precision=precision)
+            make_path(
+                line.coords, closed=False, precision=precision, compact=compact
+            )
             for line in shape.geoms
             if not line.is_empty
         ]
     elif geom_type == "Polygon":
-        return [make_path_from_shapely_polygon(shape, precision=precision)]
+        return [
+            make_path_from_shapely_polygon(
+                shape, precision=precision, compact=compact
+            )
+        ]
     elif geom_type == "MultiPolygon":
         return [
-            make_path_from_shapely_polygon(p, precision=precision)
+            make_path_from_shapely_polygon(
+                p, precision=precision, compact=compact
+            )
             for p in shape.geoms
             if not p.is_empty
         ]
@@ -125,8 +599,487 @@ def make_paths_from_shape(shape, precision=None) -> list:
             if sub_shape.is_empty:
                 continue
             result.extend(
-                make_paths_from_shape(sub_shape, precision=precision)
+                make_paths_from_shape(
+                    sub_shape, precision=precision, compact=compact
+                )
             )
         return result
     else:  # pragma: no cover. Here any case any new geometries get invented?
         raise ValueError(f"{shape} has unknown geom_type {geom_type!r}")
+
+
+def _make_paths_in_executor(
+    shape, executor, precision, compact, simplify, tolerance
+):
+    """`make_paths_from_shape(..., executor=executor)` for a
+    multi-geometry or collection.
+
+    Each part of the shape draws as the paths `make_paths_from_shape`
+    makes for it on its own, so the parts are split into chunks of
+    about `_EXECUTOR_CHUNK_COORDINATES` coordinates, each chunk is
+    converted in the executor, and the results are joined in order.
+
+    """
+    import shapely
+
+    parts = _leaf_parts(shape)
+    # Cut after the part that takes the running total past each multiple
+    # of the chunk size.
+    totals = _np.cumsum(shapely.get_num_coordinates(parts))
+    cuts = _np.unique(
+        _np.searchsorted(
+            totals,
+            _np.arange(1, totals[-1] // _EXECUTOR_CHUNK_COORDINATES + 1)
+            * _EXECUTOR_CHUNK_COORDINATES,
+        )
+        + 1
+    )
+    cuts = cuts[cuts < len(parts)].tolist()
+    # WKB has no linear rings; they arrive as line strings.
+    rings = (shapely.get_type_id(parts) == 2).tolist()
+    wkb = shapely.to_wkb(parts).tolist()
+    futures = [
+        executor.submit(
+            _make_paths_from_wkb,
+            wkb[start:end],
+            rings[start:end],
+            precision,
+            compact,
+            simplify,
+            tolerance,
+        )
+        for start, end in zip([0, *cuts], [*cuts, len(parts)], strict=True)
+    ]
+    return [path for future in futures for path in future.result()]
+
+
+def _make_paths_from_wkb(
+    chunk, rings, precision, compact, simplify, tolerance
+):
+    """Make the paths for a list of WKB geometries, in a worker."""
+    import shapely
+
+    parts = [
+        shapely.LinearRing(part.coords) if ring else part
+        for part, ring in zip(shapely.from_wkb(chunk), rings, strict=True)
+    ]
+    return [
+        path
+        for part in parts
+        for path in make_paths_from_shape(
+            part,
+            precision=precision,
+            compact=compact,
+            simplify=simplify,
+            tolerance=tolerance,
+        )
+    ]
+
+
+def _leaf_parts(shape):
+    """Return the non-empty points, lines, rings and polygons that make
+    up a geometry, as an array in drawing order.
+
+    """
+    import shapely
+
+    parts = _np.array([shape])
+    # Type ids from 4 up: MultiPoint, MultiLineString, MultiPolygon and
+    # GeometryCollection.
+    while (shapely.get_type_id(parts) >= 4).any():
+        parts = shapely.get_parts(parts)
+    return parts[~shapely.is_empty(parts)]
+
+
+def _make_paths_with_shared_arcs(
+    shape, precision, compact, simplify, tolerance
+):
+    """`make_paths_from_shape(..., topology=True)`.
+
+    The rings of all polygons are cut into arcs at junctions: points
+    where the rings passing through have different neighbours, i.e.
+    where a shared border starts or ends. An arc that several rings
+    share (in either direction) is simplified, rounded and formatted
+    once, and each ring is put back together from its arcs. Finding
+    the arcs is a few vectorized passes over all the coordinates; the
+    rest of the work is per unique arc.
+
+    Simplification here is Douglas–Peucker on each arc with its ends
+    fixed, followed by the same rounding and clean-up as
+    `simplify_shape`. A ring that would end up with fewer than 4
+    points is put together from unsimplified arcs instead.
+
+    Lines and points in the shape are converted as usual.
+
+    """
+    tolerance = _tolerance(precision, tolerance) if simplify else 0
+    leaves = list(_leaf_geometries(shape))
+    polygons = [leaf for leaf in leaves if leaf.geom_type == "Polygon"]
+    rings = [
+        _np.asarray(ring.coords, dtype=float)[:-1, :2]
+        for polygon in polygons
+        for ring in (polygon.exterior, *polygon.interiors)
+    ]
+    arcs, ring_arcs = _shared_arcs(rings)
+
+    simplified = []
+    for arc, closed in arcs:
+        if simplify:
+            arc = arc[_douglas_peucker(arc, tolerance)]
+            arc = _simplify_coordinates(arc, closed, precision)
+        simplified.append(arc)
+
+    formatted = {}
+    ring_paths = []
+    for pieces in ring_arcs:
+        coordinates = _join_arcs(simplified, pieces)
+        if len(coordinates) < 4:
+            coordinates = _join_arcs([arc for arc, _ in arcs], pieces)
+            ring_paths.append(
+                make_path(
+                    coordinates,
+                    closed=True,
+                    precision=precision,
+                    compact=compact,
+                )
+            )
+        elif compact:
+            ring_paths.append(
+                make_path(
+                    coordinates, closed=True, precision=precision, compact=True
+                )
+            )
+        else:
+            points = []
+            for index, reverse in pieces:
+                if index not in formatted:
+                    formatted[index] = _format_points(
+                        simplified[index], precision
+                    )
+                arc_points = formatted[index]
+                if reverse:
+                    arc_points = arc_points[::-1]
+                points.extend(arc_points[1:] if points else arc_points)
+            ring_paths.append("M" + "L".join(points) + "Z")
+
+    result = []
+    rings_left = iter(ring_paths)
+    for leaf in leaves:
+        if leaf.geom_type == "Polygon":
+            result.append(
+                "".join(
+                    next(rings_left) for _ in range(1 + len(leaf.interiors))
+                )
+            )
+        else:
+            result.extend(
+                make_paths_from_shape(
+                    leaf,
+                    precision=precision,
+                    compact=compact,
+                    simplify=simplify,
+                    tolerance=tolerance,
+                )
+            )
+    return result
+
+
+def _leaf_geometries(shape):
+    """Yield the non-empty parts of a shape that `make_paths_from_shape`
+    makes paths for, in order, with multi-polygons split up.
+
+    """
+    if shape.geom_type in ("MultiPolygon", "GeometryCollection"):
+        for part in shape.geoms:
+            if not part.is_empty:
+                yield from _leaf_geometries(part)
+    else:
+        yield shape
+
+
+def _shared_arcs(rings):
+    """Cut rings (each an (n, 2) array without the closing point) into
+    arcs at junctions.
+
+    Returns `(arcs, ring_arcs)`: the unique arcs, each as
+    `(coordinates, closed)`, and for each ring the list of
+    `(arc index, reversed)` that make it up, in order. A ring with no
+    junctions is one closed arc.
+
+    """
+    lengths = _np.array([len(ring) for ring in rings], dtype=_np.intp)
+    if not lengths.sum():
+        return [], [[] for _ in rings]
+    # Number the distinct points. Viewing each (x, y) row as one
+    # complex number sorts much faster than `unique(axis=0)`; adding
+    # 0.0 turns -0.0 into 0.0, which `unique` would otherwise keep
+    # apart.
+    coordinates = _np.ascontiguousarray(_np.concatenate(rings) + 0.0)
+    points, ids = _np.unique(
+        coordinates.view(complex).ravel(), return_inverse=True
+    )
+    points = _np.stack([points.real, points.imag], axis=1)
+    ids = ids.reshape(-1)
+
+    # Neighbours of every vertex along its ring.
+    starts = _np.repeat(_np.cumsum(lengths) - lengths, lengths)
+    sizes = _np.repeat(lengths, lengths)
+    offsets = _np.arange(len(ids)) - starts
+    before = ids[starts + (offsets - 1) % sizes]
+    after = ids[starts + (offsets + 1) % sizes]
+
+    # A point is a junction if it has more than one distinct pair of
+    # neighbours over all the places it occurs.
+    neighbours = _np.minimum(before, after) * len(points) + _np.maximum(
+        before, after
+    )
+    order = _np.lexsort((neighbours, ids))
+    sorted_ids, neighbours = ids[order], neighbours[order]
+    new_pair = _np.ones(len(ids), dtype=bool)
+    new_pair[1:] = (sorted_ids[1:] != sorted_ids[:-1]) | (
+        neighbours[1:] != neighbours[:-1]
+    )
+    junction = _np.bincount(sorted_ids[new_pair], minlength=len(points)) > 1
+
+    arc_index = {}
+    arcs = []
+    ring_arcs = []
+    position = 0
+    for length in lengths.tolist():
+        ring = ids[position : position + length]
+        position += length
+        cuts = _np.flatnonzero(junction[ring]).tolist()
+        if cuts:
+            segments = [
+                _np.concatenate([ring[a:], ring[: b + 1]])
+                if b <= a
+                else ring[a : b + 1]
+                for a, b in zip(cuts, cuts[1:] + cuts[:1], strict=True)
+            ]
+            closed = False
+        else:
+            segments = [_np.append(ring, ring[:1])]
+            closed = True
+
+        pieces = []
+        for segment in segments:
+            key, reverse = _arc_key(segment.tolist(), closed)
+            index = arc_index.get(key)
+            if index is None:
+                index = arc_index[key] = len(arcs)
+                canonical = segment[::-1] if reverse else segment
+                arcs.append((points[canonical], closed))
+            pieces.append((index, reverse))
+        ring_arcs.append(pieces)
+    return arcs, ring_arcs
+
+
+def _arc_key(ids, closed):
+    """Return a key that is the same for an arc and its reverse (and,
+    for a closed ring, any rotation of it), and whether `ids` runs
+    against the stored direction.
+
+    """
+    if closed:
+        # Rotate to start at the smallest point id; compare both
+        # directions from there.
+        ids = ids[:-1]
+        start = ids.index(min(ids))
+        forward = ids[start:] + ids[:start]
+        backward = forward[:1] + forward[:0:-1]
+        if backward < forward:
+            return (True, *backward), True
+        return (True, *forward), False
+    backward = ids[::-1]
+    if backward < ids:
+        return (False, *backward), True
+    return (False, *ids), False
+
+
+def _douglas_peucker(points, tolerance):
+    """Return a mask of the points of an (n, 2) array that
+    Douglas–Peucker simplification keeps. The first and last points are
+    always kept; if they're the same point, distances are measured from
+    it.
+
+    """
+    keep = _np.ones(len(points), dtype=bool)
+    if tolerance <= 0 or len(points) < 3:
+        return keep
+    keep[1:-1] = False
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start = points[first]
+        direction = points[last] - start
+        offsets = points[first + 1 : last] - start
+        length = _np.hypot(*direction)
+        if length:
+            distances = (
+                abs(
+                    direction[0] * offsets[:, 1] - direction[1] * offsets[:, 0]
+                )
+                / length
+            )
+        else:
+            distances = _np.hypot(offsets[:, 0], offsets[:, 1])
+        farthest = int(distances.argmax())
+        if distances[farthest] > tolerance:
+            middle = first + 1 + farthest
+            keep[middle] = True
+            stack.append((first, middle))
+            stack.append((middle, last))
+    return keep
+
+
+def _join_arcs(arcs, pieces):
+    """Put a ring back together from `(arc index, reversed)` pieces,
+    without repeating the point where one arc ends and the next starts.
+
+    """
+    parts = []
+    for index, reverse in pieces:
+        arc = arcs[index][::-1] if reverse else arcs[index]
+        parts.append(arc[1:] if parts else arc)
+    return _np.concatenate(parts)
+
+
+def _format_points(coordinates, precision):
+    """Format an (n, 2) array as a list of "x,y" strings, the way
+    `make_path` writes them.
+
+    """
+    spec = "%s" if precision is None else f"%.{precision}f"
+    text = (
+        f"{spec},{spec} "
+        * len(coordinates)
+        % tuple(coordinates.ravel().tolist())
+    )
+    if precision:
+        text = _strip_trailing_zeros(text, precision, ", ")
+    return text.split()
+
+
+class Viewport:
+    """A window for `add_shape` to cull and clip geometries against, so
+    that parts that can't be seen aren't written. For example:
+
+    ```python3
+    svg = make_svg(width=800, height=600, viewBox="1200 3400 80 60")
+    viewport = Viewport.from_svg(svg, clip=True, padding=1)
+    for county in counties:
+        svg.add_shape(county, viewport=viewport)
+    print(f"{viewport.culled} culled, {viewport.clipped} clipped")
+    ```
+
+    `bounds` is `(min_x, min_y, max_x, max_y)` in user units. Each part
+    of a geometry (a polygon of a MultiPolygon, a point of a
+    MultiPoint, ...) whose bounding box doesn't touch the window is
+    dropped and counted in `culled`. With `clip=True`, parts that stick
+    out of the window grown by `padding` on every side are cut down to
+    it with shapely's `clip_by_rect` and counted in `clipped`. Pad by
+    at least half the stroke width so no stroke shows along the cut.
+
+    Needs shapely (which any geometry passed in comes from anyway).
+
+    """
+
+    def __init__(self, bounds, /, *, clip=False, padding=0):
+        try:
+            min_x, min_y, max_x, max_y = map(float, bounds)
+        except (TypeError, ValueError) as exc:
+            raise ValueError(
+                f"bounds must be (min_x, min_y, max_x, max_y), got {bounds!r}"
+            ) from exc
+        if not min_x <= max_x or not min_y <= max_y:
+            raise ValueError(f"bounds are empty: {bounds!r}")
+        if not padding >= 0:
+            raise ValueError(f"padding must not be negative, got {padding}")
+        self.bounds = (min_x, min_y, max_x, max_y)
+        self.clip = clip
+        self.padding = padding
+        self.culled = 0
+        self.clipped = 0
+
+    @classmethod
+    def from_svg(cls, svg, /, **options) -> "Viewport":
+        """Make a viewport from the `viewBox` of an `<svg>` element
+        (usually the root). Takes the same options as `Viewport`.
+
+        Raises ValueError if there's no usable `viewBox`.
+
+        """
+        view_box = svg.get("viewBox")
+        if view_box is None:
+            raise ValueError(f"<{svg.tag}> has no viewBox")
+        try:
+            min_x, min_y, width, height = map(
+                float, view_box.replace(",", " ").split()
+            )
+        except ValueError as exc:
+            raise ValueError(f"can't parse viewBox {view_box!r}") from exc
+        return cls((min_x, min_y, min_x + width, min_y + height), **options)
+
+    def __repr__(self):
+        return (
+            f"Viewport({self.bounds!r}, clip={self.clip!r}, "
+            f"padding={self.padding!r})"
+        )
+
+    def cull(self, shape):
+        """Return the visible part of a geometry, or None if none of it
+        is, and add to the `culled` and `clipped` counts.
+
+        The result is the geometry itself if it's entirely inside, and
+        otherwise the one visible part or a GeometryCollection of the
+        visible parts, which draws the same way.
+
+        """
+        import shapely
+
+        parts = _leaf_parts(shape)
+
+        min_x, min_y, max_x, max_y = self.bounds
+        part_bounds = shapely.bounds(parts)
+        visible = (
+            (part_bounds[:, 0] <= max_x)
+            & (part_bounds[:, 2] >= min_x)
+            & (part_bounds[:, 1] <= max_y)
+            & (part_bounds[:, 3] >= min_y)
+        )
+        culled = len(parts) - int(visible.sum())
+        clipped = 0
+        if culled:
+            parts = parts[visible]
+            part_bounds = part_bounds[visible]
+
+        if self.clip and len(parts):
+            pad = self.padding
+            window = (min_x - pad, min_y - pad, max_x + pad, max_y + pad)
+            outside = (
+                (part_bounds[:, 0] < window[0])
+                | (part_bounds[:, 1] < window[1])
+                | (part_bounds[:, 2] > window[2])
+                | (part_bounds[:, 3] > window[3])
+            )
+            if outside.any():
+                parts = parts.copy()
+                parts[outside] = shapely.clip_by_rect(parts[outside], *window)
+                # A part can stick out of its bounding box's overlap
+                # with the window without reaching into the window.
+                empty = shapely.is_empty(parts)
+                clipped = int((outside & ~empty).sum())
+                culled += int(empty.sum())
+                parts = parts[~empty]
+
+        self.culled += culled
+        self.clipped += clipped
+        if not len(parts):
+            return None
+        if not culled and not clipped:
+            return shape
+        if len(parts) == 1:
+            return parts[0]
+        return shapely.GeometryCollection(list(parts))
@@ -0,0 +1,186 @@
+"""Fragments compiled once and added many times.
+
+A `Stamp` holds a template subtree with `{name}` placeholders in
+attribute values and text. Each `stamp.make(...)` (or
+`parent.add_stamp(stamp, ...)`) copies the template and fills in the
+placeholders, without parsing markup and without re-formatting the
+attributes that don't change.
+
+"""
+
+import re
+from xml.etree import ElementTree
+
+from svg_helpers.element import Element, _clone
+
+# A placeholder is an identifier in braces. Other braces (CSS blocks in
+# a <style>, ...) are left alone.
+_PLACEHOLDER = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+_ATTRIBUTE, _TEXT, _TAIL = range(3)
+
+
+def _compile_template(value):
+    """Split a string into alternating literal text and placeholder
+    names, or return None if it has no placeholders.
+
+    """
+    if not value or "{" not in value:
+        return None
+    parts = _PLACEHOLDER.split(value)
+    return tuple(parts) if len(parts) > 1 else None
+
+
+def _slot(kind, key, parts):
+    """(kind, attribute name or None, placeholder name if the value is
+    exactly one placeholder, else None, template parts).
+
+    """
+    whole = (
+        parts[1] if len(parts) == 3 and parts == ("", parts[1], "") else None
+    )
+    return (kind, key, whole, parts)
+
+
+class Stamp:
+    """A fragment compiled once, with named placeholders, to add many
+    times. For example:
+
+    ```python3
+    marker = svg_helpers.Stamp(
+        '<g transform="translate({x},{y})">'
+        '<circle r="3" fill="{color}" /><text>{label}</text>'
+        "</g>"
+    )
+    for x, y, name in cities:
+        svg.add_stamp(marker, x=x, y=y, color="red", label=name)
+    ```
+
+    `source` is markup (parsed once, as by `add_from_string`) or an
+    `Element` (copied, so later changes to it don't affect the stamp).
+    A placeholder is `{name}`, with `name` a Python identifier, inside
+    an attribute value, `text` or `tail`; other braces are kept as
+    they are.
+
+    Values are formatted with `format_attribute_value` of the
+    template's element class. A value that formats to `None` drops the
+    attribute (or leaves the text empty) in that copy. Every
+    placeholder needs a value, and unknown names raise `TypeError`.
+
+    """
+
+    __slots__ = ("_class", "_format_value", "_names", "_plan")
+
+    def __init__(self, source, /, *, element_class=Element):
+        if isinstance(source, str):
+            template = element_class._parse(source)
+        else:
+            template = _clone(source)
+        self._class = type(template)
+        self._format_value = self._class.format_attribute_value
+
+        # One step per node, in document order: (tag, attributes, text,
+        # tail, index of the parent node or -1, placeholder slots). See
+        # `_slot` for what a slot holds.
+        plan = []
+        parents = {}
+        for index, node in enumerate(template.iter()):
+            for child in node:
+                parents[child] = index
+            slots = []
+            for key, value in node.items():
+                parts = _compile_template(value)
+                if parts:
+                    slots.append(_slot(_ATTRIBUTE, key, parts))
+            for kind, value in ((_TEXT, node.text), (_TAIL, node.tail)):
+                parts = _compile_template(value)
+                if parts:
+                    slots.append(_slot(kind, None, parts))
+            plan.append(
+                (
+                    node.tag,
+                    dict(node.attrib),
+                    node.text,
+                    node.tail,
+                    parents.get(node, -1),
+                    tuple(slots),
+                )
+            )
+        self._plan = tuple(plan)
+        self._names = frozenset(
+            name
+            for *_, slots in plan
+            for *_, parts in slots
+            for name in parts[1::2]
+        )
+
+    @property
+    def placeholders(self) -> frozenset:
+        """The names of all placeholders in the template."""
+        return self._names
+
+    def make(self, /, **values) -> Element:
+        """Return a new copy of the template with placeholders filled
+        in. The copy isn't attached to any parent — for the common
+        build-and-attach case, use `parent.add_stamp(stamp, ...)`.
+
+        """
+        if values.keys() != self._names:
+            missing = sorted(self._names - values.keys())
+            unexpected = sorted(values.keys() - self._names)
+            problems = []
+            if missing:
+                problems.append(f"missing values for {missing}")
+            if unexpected:
+                problems.append(f"unknown placeholders {unexpected}")
+            raise TypeError("; ".join(problems))
+
+        format_value = self._format_value
+        formatted = {name: format_value(v) for name, v in values.items()}
+
+        # Nodes are built the way `Element.__copy__` builds them,
+        # skipping `__init__` and its attribute formatting.
+        cls = self._class
+        new = cls.__new__
+        init = ElementTree.Element.__init__
+        nodes = []
+        for tag, attrib, text, tail, parent, slots in self._plan:
+            if slots:
+                attrib = dict(attrib)
+                for kind, key, whole, parts in slots:
+                    if whole is not None:
+                        value = formatted[whole]
+                    else:
+                        value = _fill(parts, formatted)
+                    if kind == _ATTRIBUTE:
+                        if value is None:
+                            del attrib[key]
+                        else:
+                            attrib[key] = value
+                    elif kind == _TEXT:
+                        text = value
+                    else:
+                        tail = value
+            node = new(cls)
+            init(node, tag, attrib)
+            if text is not None:
+                node.text = text
+            if tail is not None:
+                node.tail = tail
+            if parent >= 0:
+                nodes[parent].append(node)
+            nodes.append(node)
+        return nodes[0]
+
+
+def _fill(parts, formatted):
+    """Fill compiled template parts with formatted values. Returns None
+    if any value is None.
+
+    """
+    fills = [formatted[name] for name in parts[1::2]]
+    if None in fills:
+        return None
+    filled = list(parts)
+    filled[1::2] = fills
+    return "".join(filled)
@@ -0,0 +1,244 @@
+"""Export a map as a pyramid of SVG tiles.
+
+`export_tiles` takes shapely geometries with their attributes and
+writes one SVG document per tile of a z/x/y grid, each with only the
+parts of the shapes that show in it. For example:
+
+```python3
+from svg_helpers.tiles import export_tiles
+
+features = [(county.geometry, {"fill": county.color}) for county in counties]
+export_tiles(
+    features,
+    "tiles",
+    bounds=(0, 0, 4096, 4096),
+    zooms=range(6),
+    precision={0: 0, 1: 0, 2: 1, 3: 1, 4: 2, 5: 2},
+)
+```
+
+writes `tiles/0/0/0.svg`, `tiles/1/0/0.svg`, ..., `tiles/5/31/31.svg`.
+
+"""
+
+import concurrent.futures
+import os
+from collections import namedtuple
+
+from svg_helpers.element import Element
+from svg_helpers.shapely_helpers import Viewport, _validate_precision
+
+TilesInfo = namedtuple("TilesInfo", "tiles empty culled clipped")
+
+# What each process writing tiles needs, set once per process by
+# `_start_worker` so the features aren't sent again with every tile.
+_worker = {}
+
+
+def export_tiles(
+    features,
+    directory,
+    /,
+    *,
+    bounds,
+    zooms,
+    tile_size=256,
+    precision=None,
+    tolerance=None,
+    simplify=True,
+    padding=1,
+    suffix=".svg",
+    processes=None,
+    **save_options,
+) -> TilesInfo:
+    """Write the tiles of `zooms` for `features`, an iterable of
+    `(shape, attributes)` pairs, to `directory/z/x/y.svg`. Returns
+    `TilesInfo(tiles, empty, culled, clipped)`: the number of tiles
+    written and of tiles skipped because nothing shows in them, and the
+    totals of shape parts culled and clipped (see `Viewport`).
+
+    `bounds` is `(min_x, min_y, max_x, max_y)`, the area zoom 0 covers
+    with one tile. At zoom z it's cut into 2**z by 2**z tiles, with
+    tile y=0 at `min_y` (the top, in SVG coordinates). Each tile is a
+    `tile_size` square `<svg>` whose `viewBox` is its part of `bounds`,
+    so shapes are written in their own coordinates.
+
+    Each shape is added with `add_shape`, its attributes going on its
+    `<g>`, and clipped to the tile grown by `padding` pixels. `precision`
+    and `tolerance` are an int (or None) for every zoom or a dict from
+    zoom to value, so that low zooms can be written coarser; with
+    `simplify=True` they're used as in `add_shape(simplify=True)`.
+    Other keyword arguments go to `Element.save`; with
+    `suffix=".svgz"` the tiles are gzipped.
+
+    The features are indexed once (with shapely's STRtree) to find the
+    shapes in every tile. Tiles are written by a pool of `processes`
+    processes (by default, one per CPU), each sent the features once;
+    `processes=0` writes them all in this process.
+
+    """
+    import numpy
+    import shapely
+
+    min_x, min_y, max_x, max_y = Viewport(bounds).bounds
+    zooms = sorted(set(zooms))
+    for zoom in zooms:
+        if isinstance(zoom, bool) or not isinstance(zoom, int) or zoom < 0:
+            raise ValueError(f"zooms must be non-negative ints, got {zoom!r}")
+    for zoom in zooms:
+        _validate_precision(_for_zoom(precision, zoom))
+    if processes is not None and processes < 0:
+        raise ValueError(f"processes must not be negative, got {processes}")
+
+    shapes = []
+    attributes = []
+    for shape, shape_attributes in features:
+        shapes.append(shape)
+        attributes.append(shape_attributes or {})
+    tree = shapely.STRtree(shapes)
+    # nan if there's nothing to draw
+    data_bounds = shapely.total_bounds(shapes or [shapely.Point()])
+
+    tasks = []
+    tile_count = 0
+    for zoom in zooms:
+        n = 2**zoom
+        tile_count += n * n
+        width = (max_x - min_x) / n
+        height = (max_y - min_y) / n
+        # Only look at the tiles the data reaches into.
+        first_x, last_x = _tile_range(data_bounds[0::2], min_x, width, n)
+        first_y, last_y = _tile_range(data_bounds[1::2], min_y, height, n)
+        xs, ys = (
+            a.ravel()
+            for a in numpy.meshgrid(
+                numpy.arange(first_x, last_x),
+                numpy.arange(first_y, last_y),
+                indexing="ij",
+            )
+        )
+        boxes = shapely.box(
+            min_x + xs * width,
+            min_y + ys * height,
+            min_x + (xs + 1) * width,
+            min_y + (ys + 1) * height,
+        )
+        # All (tile, shape) pairs whose bounding boxes meet, sorted by
+        # tile and then by shape, so shapes keep their order.
+        tile_indices, shape_indices = tree.query(boxes)
+        order = numpy.lexsort((shape_indices, tile_indices))
+        shape_indices = shape_indices[order]
+        starts = numpy.searchsorted(
+            tile_indices[order], numpy.arange(len(boxes) + 1)
+        ).tolist()
+        for tile in range(len(boxes)):
+            if starts[tile] < starts[tile + 1]:
+                indices = shape_indices[starts[tile] : starts[tile + 1]]
+                tasks.append((zoom, int(xs[tile]), int(ys[tile]), indices))
+
+    options = {
+        "directory": os.fspath(directory),
+        "bounds": (min_x, min_y, max_x, max_y),
+        "tile_size": tile_size,
+        "precision": precision,
+        "tolerance": tolerance,
+        "simplify": simplify,
+        "padding": padding,
+        "suffix": suffix,
+        "save_options": save_options,
+    }
+    if processes == 0:
+        _start_worker(shapes, attributes, options)
+        try:
+            results = list(map(_write_tile, tasks))
+        finally:
+            _worker.clear()
+    else:
+        workers = processes or os.cpu_count() or 1
+        with concurrent.futures.ProcessPoolExecutor(
+            workers,
+            initializer=_start_worker,
+            initargs=(shapes, attributes, options),
+        ) as executor:
+            results = list(
+                executor.map(
+                    _write_tile,
+                    tasks,
+                    chunksize=max(1, len(tasks) // (4 * workers)),
+                )
+            )
+
+    culled = sum(result[0] for result in results)
+    clipped = sum(result[1] for result in results)
+    return TilesInfo(len(tasks), tile_count - len(tasks), culled, clipped)
+
+
+def _for_zoom(value, zoom):
+    """The value of a per-zoom option at `zoom`."""
+    if isinstance(value, dict):
+        return value.get(zoom)
+    return value
+
+
+def _tile_range(data_range, start, size, n):
+    """The range of tile numbers, along one axis, that the data from
+    `data_range[0]` to `data_range[1]` reaches into.
+
+    """
+    low, high = data_range.tolist()
+    if not low <= high:
+        return 0, 0
+    first = min(max(int((low - start) // size), 0), n)
+    last = min(max(int((high - start) // size) + 1, 0), n)
+    return first, last
+
+
+def _start_worker(shapes, attributes, options):
+    _worker.update(shapes=shapes, attributes=attributes, **options)
+
+
+def _write_tile(task):
+    """Write one tile, returning the `(culled, clipped)` counts."""
+    zoom, x, y, indices = task
+    min_x, min_y, max_x, max_y = _worker["bounds"]
+    tile_size = _worker["tile_size"]
+    n = 2**zoom
+    width = (max_x - min_x) / n
+    height = (max_y - min_y) / n
+    left = min_x + x * width
+    top = min_y + y * height
+    viewport = Viewport(
+        (left, top, left + width, top + height),
+        clip=True,
+        padding=_worker["padding"] * max(width, height) / tile_size,
+    )
+    precision = _for_zoom(_worker["precision"], zoom)
+    tolerance = _for_zoom(_worker["tolerance"], zoom)
+    simplify = _worker["simplify"]
+
+    svg = Element(
+        "svg",
+        xmlns="http://www.w3.org/2000/svg",
+        width=tile_size,
+        height=tile_size,
+        viewBox=f"{left!r} {top!r} {width!r} {height!r}",
+    )
+    shapes = _worker["shapes"]
+    attributes = _worker["attributes"]
+    for index in indices.tolist():
+        svg.add_shape(
+            shapes[index],
+            precision=precision,
+            simplify=simplify,
+            tolerance=tolerance,
+            viewport=viewport,
+            **attributes[index],
+        )
+
+    folder = os.path.join(_worker["directory"], str(zoom), str(x))
+    os.makedirs(folder, exist_ok=True)
+    svg.save(
+        os.path.join(folder, f"{y}{_worker['suffix']}"),
+        **_worker["save_options"],
+    )
+    return viewport.culled, viewport.clipped
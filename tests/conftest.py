@@ -0,0 +1,37 @@
+from xml.etree import ElementTree
+
+import pytest
+
+import svg_helpers.element
+from svg_helpers import serialize
+
+
+@pytest.fixture(autouse=True)
+def check_serialize(monkeypatch):
+    """Check everything the tests serialize with `serialize.markup`
+    against what ElementTree (or, pretty-printed, `iter_markup`) writes.
+
+    """
+
+    def checked_serialize(element, **options):
+        result = serialize.serialize(element, **options)
+        if options.get("pretty"):
+            markup = "".join(
+                serialize.iter_markup(
+                    element,
+                    short_empty_elements=options["short_empty_elements"],
+                    indent="  ",
+                )
+            )
+        else:
+            markup = ElementTree.tostring(
+                element,
+                encoding="unicode",
+                short_empty_elements=options["short_empty_elements"],
+            )
+        if options.get("xml_declaration"):
+            markup = serialize.XML_DECLARATION + markup
+        assert result == markup
+        return result
+
+    monkeypatch.setattr(svg_helpers.element, "serialize", checked_serialize)
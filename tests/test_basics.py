@@ -1,5 +1,6 @@
 import copy
 import io
+import threading
 
 import pytest
 
@@ -415,3 +416,236 @@ def test_pretty_handles_namespaced_text_content_elements():
     )
     out = svg.to_string(pretty=True)
     assert "A</ns0:tspan><ns0:tspan>B" in out
+
+
+def test_pretty_is_safe_across_threads():
+    # Pretty-printing used to mutate text/tail and restore them after,
+    # so two threads serializing one tree could see each other's
+    # whitespace.
+    svg = svg_helpers.make_svg(width=10, height=10)
+    for i in range(50):
+        g = svg.add_element("g", id=f"g{i}")
+        g.add_element("rect", x=i)
+        g.recipes.add_text("a\nb")
+    expected_pretty = svg.to_string(pretty=True)
+    expected_compact = svg.to_string()
+    results = []
+
+    def render():
+        for _ in range(20):
+            results.append(svg.to_string(pretty=True))
+            results.append(svg.to_string())
+
+    threads = [threading.Thread(target=render) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(expected_pretty) == 8 * 20
+    assert results.count(expected_compact) == 8 * 20
+
+
+def test_add_elements_matches_looped_add_element():
+    import numpy
+
+    xs = numpy.array([0.5, 1.0, 1 / 3])
+    columns = {
+        "cx": xs,
+        "cy": [1, 2, 3],
+        "r": numpy.array([1, 2, 3], dtype=numpy.int32),
+        "fill": "red",
+        "stroke": [None, "black", None],
+        "visible": (True, False, True),
+        "opacity": numpy.array([0.1, 0.2, 0.3], dtype=numpy.float32),
+        "stroke_width": None,
+        "class_": "dot",
+    }
+    bulk = svg_helpers.make_svg(width=10, height=10)
+    children = bulk.add_elements("circle", **columns)
+
+    looped = svg_helpers.make_svg(width=10, height=10)
+    for i in range(3):
+        looped.add_element(
+            "circle",
+            **{
+                k: v if isinstance(v, str) or v is None else v[i]
+                for k, v in columns.items()
+            },
+        )
+    assert bulk.to_string() == looped.to_string()
+    assert children == list(bulk)
+    assert "stroke" not in children[0].attrib
+
+
+def test_add_elements_with_count_and_only_scalars():
+    svg = svg_helpers.make_svg(width=10, height=10)
+    children = svg.add_elements("rect", 2, width=1)
+    assert [child.get("width") for child in children] == ["1", "1"]
+
+
+def test_add_elements_count_required_without_columns():
+    svg = svg_helpers.make_svg(width=10, height=10)
+    with pytest.raises(ValueError, match="count"):
+        svg.add_elements("rect", width=1)
+    with pytest.raises(ValueError, match="count"):
+        svg.add_elements("rect", -1, width=1)
+
+
+def test_add_elements_rejects_mismatched_columns():
+    svg = svg_helpers.make_svg(width=10, height=10)
+    with pytest.raises(ValueError, match="'cy' has 1 values, expected 2"):
+        svg.add_elements("circle", cx=[1, 2], cy=[3])
+    assert len(svg) == 0
+
+
+def test_add_elements_uses_subclass_formatting():
+    class CamelCaseElement(svg_helpers.Element):
+        @staticmethod
+        def format_attribute_name(key):
+            return key.rstrip("_")
+
+    svg = CamelCaseElement("svg")
+    children = svg.add_elements("rect", stroke_width=[1, 2])
+    assert all(isinstance(child, CamelCaseElement) for child in children)
+    assert children[1].get("stroke_width") == "2"
+
+
+def test_attribute_name_cache_is_per_formatter():
+    class UpperElement(svg_helpers.Element):
+        @staticmethod
+        def format_attribute_name(key):
+            return key.upper()
+
+    plain = svg_helpers.Element("rect", stroke_width=1)
+    upper = UpperElement("rect", stroke_width=1)
+    again = svg_helpers.Element("rect", stroke_width=1)
+    assert plain.get("stroke-width") == again.get("stroke-width") == "1"
+    assert upper.get("STROKE_WIDTH") == "1"
+
+
+def test_attribute_name_cache_with_method_override(monkeypatch):
+    import gc
+    import weakref
+
+    from svg_helpers import element
+
+    class MethodElement(svg_helpers.Element):
+        def format_attribute_name(self, key):
+            return key.upper()
+
+    monkeypatch.setattr(element, "_name_caches", {})
+    refs = [
+        weakref.ref(MethodElement("rect", stroke_width=i)) for i in range(100)
+    ]
+    gc.collect()
+    assert not any(ref() for ref in refs)
+    assert list(element._name_caches.values()) == [
+        {"stroke_width": "STROKE_WIDTH"}
+    ]
+
+
+def test_attribute_name_cache_is_bounded(monkeypatch):
+    from svg_helpers import element
+
+    monkeypatch.setattr(element, "_NAME_CACHE_SIZE", 2)
+    monkeypatch.setattr(element, "_name_caches", {})
+    rect = svg_helpers.Element("rect", a_1=1, a_2=2, a_3=3)
+    rect.add_elements("rect", a_4=[4])
+    assert list(rect.attrib) == ["a-1", "a-2", "a-3"]
+    assert list(element._name_caches.values()) == [
+        {"a_1": "a-1", "a_2": "a-2"}
+    ]
+
+
+def test_intern_attribute_values():
+    class InterningElement(svg_helpers.Element):
+        intern_attribute_values = True
+
+    svg = InterningElement("svg")
+    a = svg.add_element("circle", r=2, fill=f"#{255:02x}0000")
+    b = svg.add_element("circle", r=2, fill=f"#{255:02x}0000")
+    c, d = svg.add_elements("circle", r=[2, 2])
+    assert a.get("fill") is b.get("fill")
+    assert a.get("r") is b.get("r") is c.get("r") is d.get("r")
+    assert svg.to_string() == (
+        '<svg><circle r="2" fill="#ff0000" /><circle r="2" fill="#ff0000" />'
+        '<circle r="2" /><circle r="2" /></svg>'
+    )
+
+    plain = svg_helpers.make_svg()
+    assert plain.add_element("circle", r=2).get("r") is not plain.add_element(
+        "circle", r=2
+    ).get("r")
+
+
+def test_intern_skips_long_values_and_stops_when_full(monkeypatch):
+    from svg_helpers import element
+
+    monkeypatch.setattr(element, "_interned_values", {})
+    monkeypatch.setattr(element, "_INTERN_TABLE_SIZE", 1)
+    long_value = "x" * (element._INTERN_MAX_LENGTH + 1)
+    assert element._intern_value(long_value) is long_value
+    assert element._intern_value(None) is None
+    element._intern_value("kept")
+    element._intern_value("dropped")
+    assert element._interned_values == {"kept": "kept"}
+
+
+@pytest.fixture
+def markup_cache(monkeypatch):
+    monkeypatch.setattr(svg_helpers.Element, "markup_cache_size", 2)
+    svg_helpers.Element.markup_cache_clear()
+    yield
+    svg_helpers.Element.markup_cache_clear()
+
+
+def test_markup_cache_is_off_by_default():
+    svg_helpers.Element.markup_cache_clear()
+    svg = svg_helpers.make_svg(width=10, height=10)
+    svg.add_from_string("<g><rect /></g>")
+    assert svg_helpers.Element.markup_cache_info() == (0, 0, 0)
+
+
+def test_markup_cache_counts_hits_and_misses(markup_cache):
+    svg = svg_helpers.make_svg(width=10, height=10)
+    for _ in range(3):
+        svg.add_from_string('<text x="1">A <tspan>B</tspan></text>')
+    info = svg_helpers.Element.markup_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (2, 1, 1)
+    assert svg.to_string().count('<text x="1">A <tspan>B</tspan></text>') == 3
+
+
+def test_markup_cache_returns_independent_copies(markup_cache):
+    svg = svg_helpers.make_svg(width=10, height=10)
+    first = svg.add_from_string('<g id="a"><rect /></g>')
+    first.set("id", "changed")
+    first.find("rect").text = "changed"
+    first.append(svg_helpers.Element("circle"))
+    second = svg.add_from_string('<g id="a"><rect /></g>')
+    assert second.to_string() == '<g id="a"><rect /></g>'
+    assert isinstance(second.find("rect"), svg_helpers.Element)
+
+
+def test_markup_cache_evicts_least_recently_used(markup_cache):
+    svg = svg_helpers.make_svg(width=10, height=10)
+    for markup in ["<a />", "<b />", "<a />", "<c />", "<a />", "<b />"]:
+        svg.add_from_string(markup)
+    # <b /> was evicted by <c />, then parsed again.
+    assert svg_helpers.Element.markup_cache_info() == (2, 4, 2)
+
+
+def test_markup_cache_is_per_class(markup_cache):
+    class MyElement(svg_helpers.Element):
+        pass
+
+    svg_helpers.make_svg().add_from_string("<g />")
+    child = MyElement("svg").add_from_string("<g />")
+    assert type(child) is MyElement
+    assert svg_helpers.Element.markup_cache_info().misses == 2
+
+
+def test_markup_cache_does_not_cache_errors(markup_cache):
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            svg_helpers.Element._from_string("<g>")
+    assert svg_helpers.Element.markup_cache_info().currsize == 0
@@ -0,0 +1,134 @@
+import struct
+
+import numpy
+import pytest
+import shapely
+
+from svg_helpers import buffers, shapely_helpers
+from svg_helpers.buffers import (
+    make_paths_from_ragged_array,
+    make_paths_from_wkb,
+)
+from svg_helpers.shapely_helpers import make_paths_from_shape
+
+SHAPES = [
+    shapely.Point(1, 2),
+    shapely.Point(1, 2, 3),
+    shapely.Point(),
+    shapely.MultiPoint([(1, 2), (3.25, 4)]),
+    shapely.LineString([(0, 0), (1, 1.33333), (2, 0)]),
+    shapely.LineString(),
+    shapely.MultiLineString([[(0, 0), (1, 1)], [(2, 2, 1), (3, 3, 1)]]),
+    shapely.Point(0, 0).buffer(10, quad_segs=4),
+    shapely.box(0, 0, 10, 10).difference(shapely.box(2, 2, 4, 4)),
+    shapely.Polygon(),
+    shapely.MultiPolygon(
+        [shapely.box(0, 0, 1, 1), shapely.box(5, 5, 6, 6, ccw=False)]
+    ),
+    shapely.GeometryCollection(
+        [
+            shapely.Point(1, 2),
+            shapely.GeometryCollection(
+                [shapely.LineString([(0, 0), (1, 1)]), shapely.Polygon()]
+            ),
+            shapely.MultiPoint(),
+            shapely.box(0, 0, 1, 1),
+        ]
+    ),
+    shapely.GeometryCollection(),
+]
+
+OPTIONS = [{}, {"precision": 1}, {"precision": 2, "compact": True}]
+
+
+@pytest.mark.parametrize("shape", SHAPES, ids=lambda shape: shape.wkt[:30])
+@pytest.mark.parametrize("options", OPTIONS)
+def test_wkb_same_paths_as_shapely(shape, options):
+    expected = make_paths_from_shape(shape, **options)
+    for wkb in [
+        shapely.to_wkb(shape),
+        shapely.to_wkb(shape, byte_order=0, flavor="iso"),
+        shapely.to_wkb(shapely.set_srid(shape, 4326), include_srid=True),
+        shapely.to_wkb(shape, output_dimension=2),
+    ]:
+        assert make_paths_from_wkb(wkb, **options) == expected
+
+
+def test_wkb_from_views_and_with_m_values():
+    shape = shapely.box(0, 0, 10, 10)
+    wkb = shapely.to_wkb(shape)
+    buffer = bytearray(b"xx" + wkb + b"yy")
+    view = memoryview(buffer)[2:-2]
+    assert make_paths_from_wkb(view) == make_paths_from_shape(shape)
+    # LINESTRING M (0 0 5, 1 1 5)
+    line_m = struct.pack("<BII6d", 1, 2002, 2, 0, 0, 5, 1, 1, 5)
+    assert make_paths_from_wkb(line_m) == ["M0.0,0.0L1.0,1.0"]
+
+
+def test_wkb_without_numpy(monkeypatch):
+    blobs = [shapely.to_wkb(shape, output_dimension=3) for shape in SHAPES]
+    expected = [make_paths_from_wkb(blob, precision=3) for blob in blobs]
+    compact = [make_paths_from_wkb(blob, 2, compact=True) for blob in blobs]
+    monkeypatch.setattr(buffers, "_np", None)
+    monkeypatch.setattr(shapely_helpers, "_np", None)
+    assert [make_paths_from_wkb(blob, precision=3) for blob in blobs] == (
+        expected
+    )
+    assert [make_paths_from_wkb(b, 2, compact=True) for b in blobs] == compact
+
+
+def test_wkb_errors():
+    wkb = shapely.to_wkb(shapely.box(0, 0, 1, 1))
+    with pytest.raises(ValueError, match="invalid WKB: .*ends"):
+        make_paths_from_wkb(wkb[:-4])
+    with pytest.raises(ValueError, match="invalid WKB"):
+        make_paths_from_wkb(wkb[:7])
+    with pytest.raises(ValueError, match="1 bytes left over"):
+        make_paths_from_wkb(wkb + b"\0")
+    with pytest.raises(ValueError, match="byte order"):
+        make_paths_from_wkb(b"\2" + wkb[1:])
+    with pytest.raises(ValueError, match="unknown geometry type 8"):
+        make_paths_from_wkb(b"\1\10\0\0\0")
+    with pytest.raises(ValueError, match="precision"):
+        make_paths_from_wkb(wkb, precision=-1)
+
+
+RAGGED = [
+    [shapely.Point(1, 2), shapely.Point(), shapely.Point(3, 4.5)],
+    [shapely.LineString([(0, 0), (1, 1.5)]), shapely.LineString()],
+    [SHAPES[7], SHAPES[8], shapely.Polygon()],
+    [shapely.MultiPoint([(1, 2), (3, 4)]), shapely.MultiPoint()],
+    [SHAPES[6], shapely.MultiLineString()],
+    [SHAPES[10], shapely.MultiPolygon([SHAPES[8]]), shapely.MultiPolygon()],
+]
+
+
+@pytest.mark.parametrize("shapes", RAGGED, ids=lambda s: s[0].geom_type)
+@pytest.mark.parametrize("options", OPTIONS)
+def test_ragged_array_same_paths_as_shapely(shapes, options):
+    expected = [make_paths_from_shape(shape, **options) for shape in shapes]
+    geometry_type, coordinates, offsets = shapely.to_ragged_array(shapes)
+    assert (
+        make_paths_from_ragged_array(
+            geometry_type, coordinates, offsets, **options
+        )
+        == expected
+    )
+    separated = (coordinates[:, 0].copy(), coordinates[:, 1].copy())
+    assert (
+        make_paths_from_ragged_array(
+            geometry_type.name, separated, offsets, **options
+        )
+        == expected
+    )
+
+
+def test_ragged_array_errors(monkeypatch):
+    coordinates = numpy.zeros((2, 2))
+    with pytest.raises(ValueError, match="unsupported geometry type 'curve'"):
+        make_paths_from_ragged_array("curve", coordinates)
+    with pytest.raises(ValueError, match="2 offset arrays expected"):
+        make_paths_from_ragged_array("polygon", coordinates, [[0, 2]])
+    monkeypatch.setattr(buffers, "_np", None)
+    with pytest.raises(ImportError, match="needs NumPy"):
+        make_paths_from_ragged_array("point", coordinates)
@@ -0,0 +1,282 @@
+import copy
+from xml.etree import ElementTree
+
+import pytest
+import shapely
+
+import svg_helpers
+from svg_helpers import cached
+
+OPTIONS = [
+    {},
+    {"pretty": True},
+    {"short_empty_elements": False},
+    {"pretty": True, "xml_declaration": True},
+]
+
+
+def build(module):
+    """The same document, built as an `Element` tree or a cached one."""
+    svg = module.make_svg(width=10, height=10)
+    base = svg.add_element("g", id="base")
+    base.text = " keep & <escape> "
+    base.add_element("rect", width=1).tail = "tail"
+    base.add_element("g").add_element("g").add_element("circle", r=1)
+    base.add_shape(shapely.Point(0, 0).buffer(1, quad_segs=2), fill="red")
+    base.add_from_string('<text x="1">You are <tspan>not</tspan>!</text>')
+    custom = svg.add_element("custom", **{"xml:space": "preserve"})
+    custom.add_element("a").add_element("b")
+    overlay = svg.add_element("g", id="overlay")
+    overlay.add_element("circle", r=2)
+    return svg
+
+
+def kept(element):
+    """The markup kept for an element, by options."""
+    return element.__dict__.get("_markup", {})
+
+
+@pytest.mark.parametrize("options", OPTIONS)
+def test_same_output_as_element(options):
+    expected = build(svg_helpers).to_string(**options)
+    svg = build(cached)
+    assert svg.to_string(**options) == expected
+    assert kept(svg)
+    assert svg.to_string(**options) == expected
+
+
+def test_options_kept_apart():
+    svg = build(cached)
+    for options in OPTIONS * 2:
+        assert svg.to_string(**options) == build(svg_helpers).to_string(
+            **options
+        )
+    assert len(kept(svg)) == 3
+
+
+def test_untouched_subtrees_are_reused():
+    svg = build(cached)
+    base, custom, overlay = svg
+    svg.to_string(pretty=True)
+    markup = kept(base)
+    (written,) = markup.values()
+    overlay[0].set("r", "3")
+    assert not kept(svg)
+    assert not kept(overlay)
+    assert kept(base) is markup
+    assert kept(custom)
+    assert written in svg.to_string(pretty=True)
+    # The kept markup was written, rather than the subtree again.
+    assert kept(base) == {next(iter(markup)): written}
+    assert next(iter(kept(base).values())) is written
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        lambda g: g.set("fill", "red"),
+        lambda g: g.attrib.__setitem__("fill", "red"),
+        lambda g: g.attrib.update(fill="red"),
+        lambda g: g.attrib.setdefault("fill", "red"),
+        lambda g: g.attrib.__ior__({"fill": "red"}),
+        lambda g: g.attrib.pop("id"),
+        lambda g: g.attrib.popitem(),
+        lambda g: g.attrib.__delitem__("id"),
+        lambda g: g.attrib.clear(),
+        lambda g: setattr(g, "attrib", {"fill": "red"}),
+        lambda g: setattr(g, "tag", "a"),
+        lambda g: setattr(g, "text", "new"),
+        lambda g: setattr(g[0], "tail", "new"),
+        lambda g: setattr(g[1][0], "text", "new"),
+        lambda g: g.append(cached.CachedElement("rect")),
+        lambda g: g.extend(iter([cached.CachedElement("rect")])),
+        lambda g: g.insert(0, cached.CachedElement("rect")),
+        lambda g: g.remove(g[0]),
+        lambda g: g.clear(),
+        lambda g: g.__setitem__(0, cached.CachedElement("rect")),
+        lambda g: g.__setitem__(slice(0, 2), [cached.CachedElement("rect")]),
+        lambda g: g.__delitem__(0),
+        lambda g: g.__delitem__(slice(1, None)),
+        lambda g: g.add_element("rect"),
+        lambda g: g.add_elements("rect", x=[1, 2]),
+        lambda g: g.add_from_string("<rect />"),
+        lambda g: g.add_stamp(svg_helpers.Stamp('<rect x="{x}" />'), x=1),
+        lambda g: g.add_shape(shapely.Point(1, 1)),
+        lambda g: g.add_shapes([shapely.Point(1, 1)], group=True),
+        lambda g: g.recipes.add_text("hi"),
+    ],
+)
+def test_changes_are_written(change):
+    expected = build(svg_helpers)
+    svg = build(cached)
+    for options in OPTIONS:
+        svg.to_string(**options)
+    change(expected[0])
+    change(svg[0])
+    for options in OPTIONS:
+        assert svg.to_string(**options) == expected.to_string(**options)
+
+
+def test_save_keeps_and_reuses_markup(tmp_path):
+    svg = build(cached)
+    expected = build(svg_helpers)
+    svg.save(tmp_path / "first.svg")
+    assert (tmp_path / "first.svg").read_text() == expected.to_string(
+        pretty=True, xml_declaration=True
+    )
+    # Kept for the subtrees, but not for the whole document.
+    assert not kept(svg)
+    (written,) = kept(svg[0]).values()
+    assert kept(svg[0][1])
+    for tree in (svg, expected):
+        tree[2][0].set("r", "3")
+    chunks = list(svg.iter_serialize(pretty=True, chunk_size=10))
+    assert any(written in chunk for chunk in chunks)
+    assert next(iter(kept(svg[0]).values())) is written
+    assert "".join(chunks) == expected.to_string(pretty=True)
+    # Kept markup in a subtree written again
+    for tree in (svg, expected):
+        tree[0][0].set("width", "2")
+    nested = next(iter(kept(svg[0][1]).values()))
+    assert "".join(svg.iter_serialize(pretty=True)) == (
+        expected.to_string(pretty=True)
+    )
+    assert next(iter(kept(svg[0][1]).values())) is nested
+    assert nested in next(iter(kept(svg[0]).values()))
+    for options in OPTIONS:
+        assert "".join(svg.iter_serialize(**options)) == (
+            expected.to_string(**options)
+        )
+        assert svg.to_string(**options) == expected.to_string(**options)
+
+
+def test_moved_subtree():
+    svg = build(cached)
+    expected = build(svg_helpers)
+    svg.to_string(pretty=True)
+    for tree in (svg, expected):
+        g = tree[0][1]
+        tree[0].remove(g)
+        tree[2].add_element("g").append(g)
+    assert svg.to_string(pretty=True) == expected.to_string(pretty=True)
+    # The moved subtree reports its changes to its new parent.
+    for tree in (svg, expected):
+        tree[2][1][0][0].set("r", "5")
+    assert svg.to_string(pretty=True) == expected.to_string(pretty=True)
+
+
+def test_moved_before_removed():
+    svg = build(cached)
+    expected = build(svg_helpers)
+    svg.to_string()
+    for tree in (svg, expected):
+        g = tree[0][1]
+        tree[2].append(g)
+        tree[0].remove(g)
+    assert svg.to_string() == expected.to_string()
+    for tree in (svg, expected):
+        tree[2][1][0][0].set("r", "5")
+    assert svg.to_string() == expected.to_string()
+
+
+def test_subtree_at_other_depths():
+    svg = cached.make_svg()
+    g = svg.add_element("g").add_element("g")
+    g.add_element("g").add_element("circle", r=1)
+    assert g.to_string(pretty=True) == (
+        '<g>\n  <g>\n    <circle r="1" />\n  </g>\n</g>'
+    )
+    assert (
+        '\n    <g>\n      <g>\n        <circle r="1" />\n      </g>\n    </g>'
+    ) in svg.to_string(pretty=True)
+    assert g.to_string(pretty=True).startswith("<g>\n  <g>")
+    assert len(kept(g)) == 2
+
+
+@pytest.mark.parametrize("write", ["to_string", "iter_serialize"])
+def test_not_kept(write):
+    svg = cached.make_svg()
+    comments = svg.add_element("g")
+    comments.add_element("g").append(ElementTree.Comment("hi"))
+    comments[0].append(ElementTree.PI("target", "data"))
+    clark = svg.add_element("g")
+    clark.add_element("{http://example.com/ns}a").add_element("b")
+    other = svg.add_element("g").add_element("g")
+    other.set("{http://example.com/ns}b", "1")
+    other.add_element("c")
+    fine = svg.add_element("g")
+    fine.add_element("g").add_element("rect")
+    "".join(getattr(svg, write)())
+    assert not kept(svg)
+    assert not kept(comments)
+    assert not kept(clark)
+    assert not kept(other)
+    assert kept(fine)
+    assert kept(fine[0])
+
+
+def test_plain_root():
+    svg = svg_helpers.make_svg()
+    g = cached.CachedElement("g")
+    g.add_element("g").add_element("rect")
+    svg.append(g)
+    svg.to_string()
+    assert not kept(g)
+
+
+def test_copies():
+    svg = build(cached)
+    svg.to_string()
+    clone = copy.deepcopy(svg)
+    assert not kept(clone)
+    clone[0][0].set("width", "2")
+    assert clone.to_string() != svg.to_string()
+    assert svg.to_string() == build(svg_helpers).to_string()
+    shallow = copy.copy(svg[0])
+    assert shallow.attrib == svg[0].attrib
+    assert shallow.attrib is not svg[0].attrib
+
+
+def test_attrib_copies_are_plain():
+    g = cached.CachedElement("g", id="a")
+    assert type(copy.copy(g.attrib)) is dict
+    assert type(copy.deepcopy(g.attrib)) is dict
+    assert type(g.attrib.__reduce__()[0]()) is dict
+
+
+def test_content_hash():
+    svg = build(cached)
+    assert svg.content_hash() == build(svg_helpers).content_hash()
+    # The digest is kept, and reused.
+    digest = svg.content_hash()
+    key = ("content_hash", "sha256", None)
+    assert kept(svg)[key] == digest
+    assert svg.content_hash("md5") == build(svg_helpers).content_hash("md5")
+    # The digests, but not the markup of the whole document.
+    assert len(kept(svg)) == 2
+    # Changes, and only they, drop it.
+    svg[2][0].set("r", "3")
+    assert key not in kept(svg)
+    assert kept(svg[0])
+    expected = build(svg_helpers)
+    expected[2][0].set("r", "3")
+    assert svg.content_hash() == expected.content_hash()
+    for tree in (svg, expected):
+        tree.tail = "\n"
+    assert svg.content_hash() == expected.content_hash()
+
+
+def test_content_hash_kept_for_leaves_only_with_markup():
+    svg = cached.make_svg()
+    leaf = svg.add_element("rect")
+    svg.append(ElementTree.Comment("not kept"))
+    svg.content_hash()
+    assert not kept(svg)
+    leaf.content_hash()
+    assert kept(leaf)
+    leaf.set("width", "1")
+    assert not kept(leaf)
+    assert (
+        leaf.content_hash()
+        == svg_helpers.Element("rect", width=1).content_hash()
+    )
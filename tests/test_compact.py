@@ -0,0 +1,287 @@
+import io
+from xml.etree import ElementTree
+
+import pytest
+import shapely
+
+import svg_helpers
+from svg_helpers import compact
+
+OPTIONS = [
+    {},
+    {"pretty": True},
+    {"short_empty_elements": False},
+    {"pretty": True, "xml_declaration": True},
+]
+
+
+def build(module, namespaced=False):
+    """The same document, built as an `Element` tree or a compact one."""
+    svg = module.make_svg(
+        width=10,
+        height=10,
+        **{"xmlns:inkscape": "http://www.inkscape.org/namespaces/inkscape"},
+    )
+    g = svg.add_element("g", id="a&b", title='say "<hi>"\n', class_="x")
+    g.text = " keep & <escape> "
+    g.add_element("rect", width=1, hidden=None).tail = "tail"
+    g.add_element("g").add_element("g").add_element("circle", r=1)
+    svg.recipes.add_text("one\ntwo", x=1, y=2)
+    svg.append(ElementTree.Comment(" comment "))
+    svg.append(ElementTree.ProcessingInstruction("target", "data"))
+    svg.add_element("custom", **{"xml:space": "preserve"}).add_element("a")
+    svg.add_stamp(svg_helpers.Stamp('<circle r="{r}" />'), r=2)
+    svg.add_shape(shapely.Point(0, 0).buffer(1, quad_segs=2), fill="red")
+    svg.add_shapes(
+        [
+            (shapely.Point(0, 0), "blue"),
+            (shapely.MultiPoint([(1, 1), (2, 2)]), "blue"),
+            (shapely.Point(), "blue"),
+        ],
+        attributes=lambda color: {"fill": color},
+    )
+    svg.add_shapes(
+        [
+            (shapely.Point(0, 0), {"fill": "x"}),
+            (shapely.Point(3, 3), {"fill": "x"}),
+            (shapely.MultiPoint([(1, 1), (2, 2)]), None),
+        ],
+        group=True,
+    )
+    if namespaced:
+        svg.add_from_string(
+            '<svg xmlns="http://www.w3.org/2000/svg">'
+            "<text><tspan>A</tspan> <tspan>B</tspan></text><g><g/></g>"
+            "</svg>"
+        )
+    else:
+        svg.add_from_string('<text x="1">You are <tspan>not</tspan>!</text>')
+    return svg
+
+
+@pytest.mark.parametrize("namespaced", [False, True])
+@pytest.mark.parametrize("options", OPTIONS)
+def test_same_output_as_element(namespaced, options):
+    expected = build(svg_helpers, namespaced).to_string(**options)
+    svg = build(compact, namespaced)
+    assert svg.to_string(**options) == expected
+    for chunk_size in (1, 100, 1 << 16):
+        chunks = svg.iter_serialize(**options, chunk_size=chunk_size)
+        assert "".join(chunks) == expected
+
+
+def test_subtree_output():
+    expected = build(svg_helpers).find("g")
+    svg = build(compact)
+    assert svg[0].to_string(pretty=True) == expected.to_string(pretty=True)
+    # With its tail
+    assert svg[0][0].to_string() == expected[0].to_string()
+
+
+def test_content_hash():
+    expected = build(svg_helpers).content_hash()
+    assert build(compact).content_hash() == expected
+    assert build(compact).content_hash("md5") == build(
+        svg_helpers
+    ).content_hash("md5")
+
+
+def test_chunks_are_bounded():
+    svg = compact.make_svg(width=10, height=10)
+    for i in range(5000):
+        svg.add_element("circle", cx=i, cy=i, r=1)
+    chunks = list(svg.iter_serialize(chunk_size=5000))
+    assert len(chunks) > 20
+    # A chunk runs over by at most a few dozen elements.
+    assert max(len(chunk) for chunk in chunks) < 10_000
+    assert "".join(chunks) == svg.to_string()
+
+
+def test_deep_tree():
+    svg = compact.make_svg(width=10, height=10)
+    expected = svg_helpers.make_svg(width=10, height=10)
+    g, e = svg, expected
+    for _ in range(5000):
+        g, e = g.add_element("g"), e.add_element("g")
+    assert svg.to_string(pretty=True) == expected.to_string(pretty=True)
+
+
+def test_iter_serialize_rejects_bad_chunk_size():
+    with pytest.raises(ValueError, match="chunk_size"):
+        compact.make_svg().iter_serialize(chunk_size=0)
+
+
+def test_save(tmp_path):
+    svg = build(compact)
+    svg.save(tmp_path / "out.svg")
+    assert (tmp_path / "out.svg").read_text() == build(svg_helpers).to_string(
+        pretty=True, xml_declaration=True
+    )
+    out = io.StringIO()
+    svg.save(out, pretty=False, xml_declaration=False)
+    assert out.getvalue() == str(svg)
+
+
+def test_node_access():
+    svg = compact.make_svg(width=10)
+    g = svg.add_element("g", fill="red", stroke_width=0.5)
+    first = g.add_element("rect")
+    g.add_element("circle")
+    assert svg.tag == "svg"
+    assert g.get("fill") == "red"
+    assert g.get("stroke") is None
+    assert g.get("stroke", "none") == "none"
+    assert g.keys() == ["fill", "stroke-width"]
+    assert g.items() == [("fill", "red"), ("stroke-width", "0.5")]
+    assert len(svg) == 1
+    assert len(g) == 2
+    assert [child.tag for child in g] == ["rect", "circle"]
+    assert g[0] == first
+    assert g[-1] != first
+    assert first != "rect"
+    assert len({first, g[0], g[1]}) == 2
+    assert repr(g).startswith("<CompactElement 'g' at ")
+    assert first.text is None
+    first.text = "hi"
+    first.tail = "there"
+    assert (first.text, first.tail) == ("hi", "there")
+    first.text = None
+    assert first.text is None
+
+
+def test_set():
+    svg = compact.make_svg()
+    rects = [svg.add_element("rect", x=i, y=i) for i in range(3)]
+    rects[1].set("y", "9")
+    rects[1].set("fill", "red")
+    rects[2].set("fill", "blue")
+    assert [rect.keys() for rect in rects] == [
+        ["x", "y"],
+        ["x", "y", "fill"],
+        ["x", "y", "fill"],
+    ]
+    assert svg.to_string() == (
+        '<svg xmlns="http://www.w3.org/2000/svg"><rect x="0" y="0" />'
+        '<rect x="1" y="9" fill="red" /><rect x="2" y="2" fill="blue" />'
+        "</svg>"
+    )
+
+
+def test_values_element_tree_refuses():
+    svg = compact.make_svg()
+    svg.add_element("rect").set("width", 1)
+    with pytest.raises(TypeError, match="cannot serialize 1"):
+        svg.to_string()
+    rect = ElementTree.Element("rect")
+    rect.set("width", 2)
+    svg = compact.make_svg()
+    svg.append(rect)
+    with pytest.raises(TypeError, match="cannot serialize 2"):
+        svg.to_string()
+
+
+def test_qname_values():
+    use = ElementTree.Element("use")
+    use.set(ElementTree.QName("href"), ElementTree.QName("symbol"))
+    expected = svg_helpers.make_svg()
+    expected.append(use)
+    svg = compact.make_svg()
+    svg.append(use)
+    assert svg.to_string() == expected.to_string()
+
+
+def test_text_element_tree_refuses():
+    svg = compact.make_svg()
+    svg.add_element("text").text = 1
+    with pytest.raises(TypeError, match="cannot serialize 1"):
+        svg.to_string()
+
+
+def test_shape_culled_by_viewport():
+    svg = compact.make_svg(viewBox="0 0 10 10")
+    viewport = svg_helpers.shapely_helpers.Viewport.from_svg(svg)
+    assert svg.add_shape(shapely.Point(20, 20), viewport=viewport) is None
+    added = svg.add_shapes(
+        [shapely.Point(20, 20), shapely.Point(5, 5)], viewport=viewport
+    )
+    assert [node.tag for node in added] == ["path"]
+    assert len(svg) == 1
+
+
+def test_conversion():
+    svg = build(compact)
+    expected = build(svg_helpers)
+    g = svg[0]
+    circle = g[1][0][0]
+    element = g.element
+    assert isinstance(element, svg_helpers.Element)
+    assert g.element is element
+    # Changes to the converted elements show in the output...
+    element.set("opacity", "0.5")
+    expected[0].set("opacity", "0.5")
+    # ...as do changes through handles on converted nodes.
+    assert circle.get("r") == "1"
+    circle.set("r", "2")
+    expected[0][1][0][0].set("r", "2")
+    g.text = "new"
+    expected[0].text = "new"
+    g.tail = "tail"
+    expected[0].tail = "tail"
+    assert (g.tag, g.text, g.tail) == ("g", "new", "tail")
+    assert g.keys() == ["id", "title", "class", "opacity"]
+    assert len(g) == 2
+    assert next(iter(g)) is g[0]
+    circle.add_element("title").text = "circle"
+    expected[0][1][0][0].add_element("title").text = "circle"
+    for parent in (g, expected[0]):
+        parent.add_from_string("<desc>d</desc>")
+        parent.add_stamp(svg_helpers.Stamp('<circle r="{r}" />'), r=3)
+        parent.add_shape(shapely.Point(1, 1), fill="red")
+        parent.add_shapes([shapely.Point(2, 2)])
+        parent.append(ElementTree.Element("rect"))
+    for options in OPTIONS:
+        assert svg.to_string(**options) == expected.to_string(**options)
+        assert g.to_string(**options) == expected[0].to_string(**options)
+        assert "".join(g.iter_serialize(**options)) == expected[0].to_string(
+            **options
+        )
+
+
+def test_element_methods_convert():
+    svg = build(compact)
+    assert svg.find("g").get("id") == "a&b"
+    assert svg.attrib["width"] == "10"
+    assert svg.element.find("g") is svg[0]
+    with pytest.raises(AttributeError):
+        svg.__missing__  # noqa: B018
+    assert svg.to_string() == build(svg_helpers).to_string()
+
+
+def test_deep_converted_subtree():
+    svg = compact.make_svg()
+    g = svg.add_element("g")
+    for _ in range(5000):
+        g = g.add_element("g")
+    g.element.set("id", "deep")
+    assert 'id="deep"' in svg.to_string()
+
+
+def test_element_class():
+    class Rounded(svg_helpers.Element):
+        @staticmethod
+        def format_attribute_value(value):
+            if isinstance(value, float):
+                return f"{value:.1f}"
+            return svg_helpers.Element.format_attribute_value(value)
+
+    class CompactRounded(compact.CompactElement):
+        element_class = Rounded
+
+    svg = CompactRounded("svg", width=1 / 3)
+    svg.add_element("circle", r=2 / 3)
+    svg.add_shape(shapely.Point(0, 0), precision=2, fill="red")
+    assert svg.to_string() == (
+        '<svg width="0.3"><circle r="0.7" />'
+        '<g fill="red"><path d="M0,0Z" /></g></svg>'
+    )
+    assert isinstance(svg[0].element, Rounded)
@@ -0,0 +1,255 @@
+import copy
+import random
+from collections import namedtuple
+from xml.etree import ElementTree
+
+import pytest
+
+import svg_helpers
+from svg_helpers import cached
+from svg_helpers.diff import (
+    InsertChild,
+    MoveChild,
+    RemoveAttribute,
+    RemoveChild,
+    SetAttribute,
+    SetTail,
+    SetText,
+    diff,
+    patch,
+)
+
+
+def snapshot(element):
+    """The tree as nested tuples, with attributes in any order."""
+    attrib = dict(element.attrib) if isinstance(element.tag, str) else {}
+    return (
+        element.tag,
+        attrib,
+        element.text,
+        element.tail,
+        [snapshot(child) for child in element],
+    )
+
+
+def check(old, new):
+    """Diff, patch a copy of `old`, and check it's now `new`."""
+    operations = diff(old, new)
+    patched = copy.deepcopy(old)
+    patch(patched, operations)
+    assert snapshot(patched) == snapshot(new)
+    return operations
+
+
+def make_tree():
+    svg = svg_helpers.make_svg(width=10)
+    for i in range(5):
+        g = svg.add_element("g", id=f"g{i}")
+        g.add_element("circle", r=i)
+        g.add_element("rect", width=i).tail = "tail"
+    svg.add_element("path", d="M0,0")
+    svg.add_element("path", d="M1,1")
+    return svg
+
+
+def test_no_change():
+    svg = make_tree()
+    assert check(svg, copy.deepcopy(svg)) == []
+    assert check(svg, svg) == []
+
+
+def test_attributes_and_text():
+    old = make_tree()
+    new = copy.deepcopy(old)
+    new.set("height", "5")
+    new[1][0].set("r", "9")
+    del new[1][1].attrib["width"]
+    new[2].text = "text"
+    new[2][1].tail = None
+    new.tail = "\n"
+    assert check(old, new) == [
+        SetTail((), "\n"),
+        SetAttribute((), "height", "5"),
+        SetAttribute((1, 0), "r", "9"),
+        RemoveAttribute((1, 1), "width"),
+        SetText((2,), "text"),
+        SetTail((2, 1), None),
+    ]
+
+
+def test_insert_and_remove():
+    old = make_tree()
+    new = copy.deepcopy(old)
+    new.remove(new[1])
+    new.insert(3, svg_helpers.Element("g", id="new"))
+    new[3].add_element("circle")
+    new[3].tail = "after"
+    assert check(old, new) == [
+        RemoveChild((), 1),
+        InsertChild((), 3, '<g id="new"><circle /></g>after'),
+    ]
+
+
+def test_fewest_moves():
+    old = make_tree()
+    new = copy.deepcopy(old)
+    new.insert(0, new[4])
+    del new[5]
+    assert check(old, new) == [MoveChild((), 4, 0)]
+    new.append(new[1])
+    del new[1]
+    assert check(old, new) == [MoveChild((), 4, 0), MoveChild((), 1, 6)]
+
+
+def test_shuffle():
+    rng = random.Random(0)
+    old = svg_helpers.make_svg()
+    for i in range(200):
+        g = old.add_element("g", id=f"g{i}")
+        g.add_element("circle", r=i)
+    new = copy.deepcopy(old)
+    children = list(new)
+    rng.shuffle(children)
+    new[:] = children[:150]
+    for i in range(20):
+        new.insert(
+            rng.randrange(len(new)), svg_helpers.Element("g", id=f"n{i}")
+        )
+    operations = check(old, new)
+    assert sum(isinstance(op, RemoveChild) for op in operations) == 50
+    assert sum(isinstance(op, InsertChild) for op in operations) == 20
+    assert sum(isinstance(op, MoveChild) for op in operations) < 150
+
+
+def test_matching():
+    old = svg_helpers.make_svg()
+    old.add_element("g", id="a").add_element("circle")
+    old.add_element("rect", x=1)
+    old.add_element("rect", x=2)
+    old.add_element("g", id="b")
+    new = svg_helpers.make_svg()
+    # By id, and only with the same tag
+    new.add_element("g", id="b")
+    new.add_element("text", id="a")
+    # Without, by tag in order
+    new.add_element("rect", x=2)
+    new.add_element("rect", x=3)
+    assert check(old, new) == [
+        RemoveChild((), 0),
+        MoveChild((), 2, 0),
+        InsertChild((), 1, '<text id="a" />'),
+        SetAttribute((2,), "x", "2"),
+        SetAttribute((3,), "x", "3"),
+    ]
+
+
+def test_duplicate_and_changed_ids():
+    old = svg_helpers.make_svg()
+    old.add_element("g", id="a", x=1)
+    old.add_element("g", id="a", x=2)
+    old.add_element("g", id="b")
+    new = copy.deepcopy(old)
+    new[1].set("x", "3")
+    new[2].set("id", "c")
+    new.append(ElementTree.Comment("comment"))
+    assert check(old, new) == [
+        RemoveChild((), 2),
+        InsertChild((), 2, '<g id="c" />'),
+        InsertChild((), 3, "<!--comment-->"),
+        SetAttribute((1,), "x", "3"),
+    ]
+
+
+def test_random_changes():
+    rng = random.Random(1)
+    for _ in range(300):
+        old = svg_helpers.make_svg()
+        for i in range(rng.randint(0, 8)):
+            attributes = {"id": f"i{i}"} if rng.random() < 0.5 else {}
+            g = old.add_element(rng.choice("gc"), **attributes)
+            for _ in range(rng.randint(0, 3)):
+                g.add_element(rng.choice("rc"), x=rng.randint(0, 3))
+            if rng.random() < 0.3:
+                g.tail = "t"
+        new = copy.deepcopy(old)
+        for _ in range(rng.randint(0, 6)):
+            children = list(new)
+            r = rng.random()
+            if r < 0.2 and children:
+                new.remove(rng.choice(children))
+            elif r < 0.4:
+                tag = rng.choice("gcp")
+                element = svg_helpers.Element(tag, id=rng.choice("xy"))
+                new.insert(rng.randint(0, len(children)), element)
+            elif r < 0.6 and children:
+                child = rng.choice(children)
+                new.remove(child)
+                new.insert(rng.randint(0, len(children) - 1), child)
+            elif r < 0.7 and children:
+                rng.choice(children).set("fill", "red")
+            elif r < 0.8 and children:
+                rng.choice(children).text = "text"
+            elif r < 0.9 and children:
+                rng.choice(children).tail = None
+            elif children:
+                rng.choice(children).append(ElementTree.Comment("hi"))
+        check(old, new)
+
+
+def test_deep_tree():
+    trees = [svg_helpers.make_svg(), svg_helpers.make_svg()]
+    for tree in trees:
+        g = tree
+        for _ in range(5000):
+            g = g.add_element("g")
+    g.set("fill", "red")
+    assert diff(*trees) == [SetAttribute((0,) * 5000, "fill", "red")]
+
+
+def test_patch_element_classes():
+    old = ElementTree.Element("svg")
+    new = ElementTree.Element("svg")
+    ElementTree.SubElement(new, "g").append(ElementTree.PI("target", "data"))
+    patch(old, diff(old, new))
+    assert type(old[0]) is ElementTree.Element
+    assert ElementTree.tostring(old) == ElementTree.tostring(new)
+
+    svg = cached.make_svg()
+    svg.add_element("g").add_element("rect")
+    svg.to_string()
+    new = copy.deepcopy(svg)
+    new[0].add_element("circle", r=1)
+    patch(svg, diff(svg, new))
+    assert isinstance(svg[0][1], cached.CachedElement)
+    assert svg.to_string() == new.to_string()
+
+
+def test_namespace_prefixes():
+    # As in examples/make_for_inkscape.py
+    old = svg_helpers.make_svg(
+        **{"xmlns:inkscape": "http://www.inkscape.org/namespaces/inkscape"}
+    )
+    old.add_element("g", id="a", **{"xml:space": "preserve"})
+    new = copy.deepcopy(old)
+    layer = new.add_element(
+        "g", attrib={"inkscape:label": "Layer", "inkscape:groupmode": "layer"}
+    )
+    layer.add_element("inkscape:custom", **{"xml:space": "preserve"})
+    new[0].set("xmlns:other", "http://example.com/other")
+    new[0].add_element("g", **{"other:a": "1", "inkscape:label": "2"})
+    new[0].append(ElementTree.fromstring('<a xmlns="http://example.com/a" />'))
+    operations = check(old, new)
+    assert (
+        InsertChild((), 1, svg_helpers.serialize.markup(layer)) in operations
+    )
+
+
+def test_different_roots():
+    with pytest.raises(ValueError, match="different roots"):
+        diff(svg_helpers.make_svg(), svg_helpers.Element("g"))
+
+
+def test_not_an_operation():
+    with pytest.raises(TypeError, match="not a diff operation"):
+        other = namedtuple("Other", "path")(())
+        patch(svg_helpers.make_svg(), [SetText((), "text"), other])
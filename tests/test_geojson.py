@@ -0,0 +1,95 @@
+import json
+
+import pytest
+import shapely
+
+from svg_helpers import geojson, shapely_helpers
+from svg_helpers.geojson import make_paths_from_geojson
+from svg_helpers.shapely_helpers import make_paths_from_shape
+
+SHAPES = [
+    shapely.Point(1, 2),
+    shapely.Point(1, 2, 3),
+    shapely.MultiPoint([(1, 2), (3.25, 4)]),
+    shapely.LineString([(0, 0), (1, 1.33333), (2, 0)]),
+    shapely.MultiLineString([[(0, 0), (1, 1)], [(2, 2, 1), (3, 3, 1)]]),
+    shapely.Point(0, 0).buffer(10, quad_segs=4),
+    shapely.box(0, 0, 10, 10).difference(shapely.box(2, 2, 4, 4)),
+    shapely.MultiPolygon(
+        [shapely.box(0, 0, 1, 1), shapely.box(5, 5, 6, 6, ccw=False)]
+    ),
+    shapely.GeometryCollection(
+        [
+            shapely.Point(1, 2),
+            shapely.GeometryCollection(
+                [shapely.LineString([(0, 0), (1, 1)]), shapely.Polygon()]
+            ),
+            shapely.MultiPoint(),
+            shapely.box(0, 0, 1, 1),
+        ]
+    ),
+    shapely.Point(),
+    shapely.LineString(),
+    shapely.Polygon(),
+    shapely.MultiPolygon(),
+    shapely.GeometryCollection(),
+]
+
+
+@pytest.mark.parametrize("shape", SHAPES, ids=lambda shape: shape.wkt[:30])
+@pytest.mark.parametrize(
+    "options", [{}, {"precision": 1}, {"precision": 2, "compact": True}]
+)
+def test_same_paths_as_shapely(shape, options):
+    expected = make_paths_from_shape(shape, **options)
+    decoded = json.loads(shapely.to_geojson(shape))
+    assert make_paths_from_geojson(decoded, **options) == expected
+    assert make_paths_from_geojson(shape, **options) == expected
+
+
+def test_without_numpy(monkeypatch):
+    decoded = [json.loads(shapely.to_geojson(shape)) for shape in SHAPES]
+    expected = [make_paths_from_geojson(d, precision=3) for d in decoded]
+    monkeypatch.setattr(geojson, "_np", None)
+    monkeypatch.setattr(shapely_helpers, "_np", None)
+    assert [make_paths_from_geojson(d, precision=3) for d in decoded] == (
+        expected
+    )
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_integers_mixed_dimensions_and_unclosed_rings(monkeypatch, use_numpy):
+    if not use_numpy:
+        monkeypatch.setattr(geojson, "_np", None)
+    polygon = {
+        "type": "Polygon",
+        "coordinates": [[[0, 0], [10, 0, 1], [10, 10]], []],
+    }
+    assert make_paths_from_geojson(polygon) == [
+        "M0.0,0.0L10.0,0.0L10.0,10.0L0.0,0.0Z"
+    ]
+    assert make_paths_from_geojson(polygon) == make_paths_from_shape(
+        shapely.Polygon([(0, 0), (10, 0), (10, 10)])
+    )
+
+
+def test_features():
+    feature = {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [1, 2]},
+        "properties": {},
+    }
+    assert make_paths_from_geojson(feature) == ["M1.0,2.0Z"]
+    feature["geometry"] = None
+    assert make_paths_from_geojson(feature) == [""]
+
+
+def test_errors():
+    with pytest.raises(TypeError, match="expected a GeoJSON geometry"):
+        make_paths_from_geojson([(0, 0)])
+    with pytest.raises(TypeError, match="expected a GeoJSON geometry"):
+        make_paths_from_geojson({"coordinates": []})
+    with pytest.raises(ValueError, match="unknown GeoJSON geometry type"):
+        make_paths_from_geojson({"type": "Circle", "coordinates": [0, 0]})
+    with pytest.raises(ValueError, match="precision"):
+        make_paths_from_geojson({"type": "Point", "coordinates": []}, -1)
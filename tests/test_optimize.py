@@ -0,0 +1,274 @@
+import copy
+from xml.etree import ElementTree
+
+import svg_helpers
+from svg_helpers.optimize import (
+    DeduplicateInfo,
+    ExtractClassesInfo,
+    deduplicate,
+    extract_classes,
+)
+
+SVG_NS = "{http://www.w3.org/2000/svg}"
+
+
+def make_icons(n=5):
+    svg = svg_helpers.make_svg(width=100, height=100)
+    for i in range(n):
+        g = svg.add_element("g", transform=f"translate({i},0)", class_="icon")
+        g.add_element("circle", r=3, fill="red", stroke="black")
+        g.add_element("rect", width=4, height=4, fill="blue")
+        svg.add_element(
+            "rect", x=i, y=2 * i, width=10, height=10, fill="green"
+        ).tail = "\n"
+    return svg
+
+
+def expand_uses(svg):
+    """Undo `deduplicate`: put a copy of each definition back in place
+    of its <use>, and drop the generated definitions.
+
+    """
+    svg = copy.deepcopy(svg)
+    defs = svg.find("defs")
+    definitions = {node.get("id"): node for node in defs}
+    for parent in list(svg.iter()):
+        for index, child in enumerate(parent):
+            if child.tag != "use":
+                continue
+            node = copy.deepcopy(definitions[child.get("href")[1:]])
+            del node.attrib["id"]
+            node.attrib.update(
+                (k, v) for k, v in child.attrib.items() if k != "href"
+            )
+            node.tail = child.tail
+            parent[index] = node
+    svg.remove(defs)
+    return svg
+
+
+def canonical(element):
+    """Serialization with sorted attributes."""
+    element = copy.deepcopy(element)
+    for node in element.iter():
+        items = sorted(node.attrib.items())
+        node.attrib.clear()
+        node.attrib.update(items)
+    return ElementTree.tostring(element, encoding="unicode")
+
+
+def test_deduplicate_moves_copies_into_defs():
+    svg = make_icons()
+    original = copy.deepcopy(svg)
+    info = deduplicate(svg, min_size=20)
+    assert info == DeduplicateInfo(groups=2, replaced=10, bytes_saved=info[2])
+    assert info.bytes_saved == len(original.to_string()) - len(svg.to_string())
+    assert [node.get("id") for node in svg.find("defs")] == ["u0", "u1"]
+    uses = svg.findall("use")
+    assert uses[0].attrib == {"href": "#u0", "transform": "translate(0,0)"}
+    assert uses[3].attrib == {"href": "#u1", "x": "1", "y": "2"}
+    assert uses[3].tail == "\n"
+    assert canonical(expand_uses(svg)) == canonical(original)
+
+
+def test_deduplicate_respects_min_size():
+    svg = make_icons()
+    before = svg.to_string()
+    assert deduplicate(svg, min_size=1000) == DeduplicateInfo(0, 0, 0)
+    assert svg.to_string() == before
+
+
+def test_deduplicate_skips_groups_that_would_grow():
+    svg = svg_helpers.make_svg(width=10, height=10)
+    svg.add_element("rect", width=1)
+    svg.add_element("rect", width=1)
+    before = svg.to_string()
+    assert deduplicate(svg, min_size=0) == DeduplicateInfo(0, 0, 0)
+    assert svg.to_string() == before
+
+
+def test_deduplicate_avoids_existing_ids_and_keeps_referenced_elements():
+    svg = make_icons()
+    svg.add_element("circle", id="u0", r=3, fill="red", stroke="black")
+    svg.add_element("circle", id="c", r=3, fill="red", stroke="black")
+    deduplicate(svg, min_size=20)
+    assert [node.get("id") for node in svg.find("defs")] == ["u1", "u2"]
+    assert svg.find("circle[@id='c']") is not None
+
+
+def test_deduplicate_uses_existing_empty_defs():
+    svg = make_icons()
+    svg.insert(0, svg_helpers.Element("defs"))
+    before = len(svg.to_string())
+    info = deduplicate(svg, min_size=20)
+    assert len(svg.findall("defs")) == 1
+    assert len(svg.find("defs")) == 2
+    assert info.bytes_saved == before - len(svg.to_string())
+
+
+def test_deduplicate_only_touches_drawn_elements():
+    svg = svg_helpers.make_svg(width=10, height=10)
+    clip = svg.add_element("defs").add_element("clipPath", id="clip")
+    text = svg.add_element("text")
+    for parent in (clip, text):
+        for _ in range(3):
+            parent.add_element("path", d="M0,0L10,10L20,0Z" * 5)
+    before = svg.to_string()
+    assert deduplicate(svg, min_size=0).groups == 0
+    assert svg.to_string() == before
+
+
+def test_deduplicate_replaces_outermost_copies():
+    svg = svg_helpers.make_svg(width=10, height=10)
+    for i in range(3):
+        g = svg.add_element("g", transform=f"translate({i})")
+        for _ in range(3):
+            g.add_element("path", d="M0,0L10,10L20,0Z", stroke="black")
+    # Copies of the inner path remain outside the groups, but only one.
+    svg.add_element("path", d="M0,0L10,10L20,0Z", stroke="black")
+    info = deduplicate(svg, min_size=0)
+    assert (info.groups, info.replaced) == (1, 3)
+    assert len(svg.find("defs/g")) == 3
+    assert svg[-1].tag == "path"
+
+
+def test_deduplicate_keeps_animated_positions_on_the_definition():
+    svg = svg_helpers.make_svg(width=10, height=10)
+    for _ in range(3):
+        g = svg.add_element("g", transform="rotate(0)")
+        g.add_element("path", d="M0,0L10,10L20,0Z" * 3)
+        g.add_element(
+            "animateTransform",
+            attributeName="transform",
+            type="rotate",
+            to=360,
+            dur="6s",
+        )
+    deduplicate(svg, min_size=0)
+    assert svg.find("defs/g").get("transform") == "rotate(0)"
+    assert svg.find("use").attrib == {"href": "#u0"}
+
+
+def test_deduplicate_does_not_move_x_from_groups():
+    # x on a <g> does nothing, while x on a <use> translates.
+    svg = svg_helpers.make_svg(width=10, height=10)
+    for i in range(3):
+        svg.add_element("g", x=i).add_element("path", d="M0,0L10,10Z" * 9)
+    deduplicate(svg, min_size=0)
+    # The groups stay; only their (identical) paths are shared.
+    assert [g.get("x") for g in svg.findall("g")] == ["0", "1", "2"]
+    assert [use.attrib for use in svg.iter("use")] == [{"href": "#u0"}] * 3
+
+
+def test_deduplicate_parsed_namespaced_document():
+    svg = make_icons()
+    parsed = svg_helpers.Element._from_string(svg.to_string())
+    before = len(parsed.to_string())
+    info = deduplicate(parsed, min_size=20)
+    assert info.groups == 2
+    assert parsed[0].tag == SVG_NS + "defs"
+    assert parsed[1].tag == SVG_NS + "use"
+    assert info.bytes_saved == before - len(parsed.to_string())
+
+
+def test_deduplicate_counts_bytes_of_unusual_nodes():
+    svg = make_icons()
+    svg.append(ElementTree.Comment(" a comment & more "))
+    svg.append(ElementTree.ProcessingInstruction("target", "data"))
+    wrapper = svg_helpers.Element(None)
+    wrapper.text = "bare text & "
+    wrapper.add_element("rect", width=1)
+    svg.append(wrapper)
+    for _ in range(2):
+        use = svg.add_element("use", fill="red" * 10)
+        use.set(ElementTree.QName("href"), ElementTree.QName("symbol"))
+    before = len(svg.to_string())
+    info = deduplicate(svg, min_size=20)
+    assert info.groups == 3
+    assert info.bytes_saved == before - len(svg.to_string())
+
+
+def make_choropleth(n=6):
+    svg = svg_helpers.make_svg(width=100, height=100)
+    for i in range(n):
+        svg.add_element(
+            "path",
+            d=f"M{i},0L{i},10Z",
+            fill="#ccc" if i % 2 else "#c00",
+            stroke="white",
+            stroke_width=0.5,
+        )
+    return svg
+
+
+def test_extract_classes():
+    svg = make_choropleth()
+    before = len(svg.to_string())
+    info = extract_classes(svg)
+    assert info == ExtractClassesInfo(2, 6, before - len(svg.to_string()))
+    assert info.bytes_saved > 0
+    assert svg[0].tag == "style"
+    assert svg[0].text == (
+        ".c0{fill:#c00;stroke:white;stroke-width:0.5}"
+        ".c1{fill:#ccc;stroke:white;stroke-width:0.5}"
+    )
+    assert svg[1].attrib == {"d": "M0,0L0,10Z", "class": "c0"}
+    assert svg[2].attrib == {"d": "M1,0L1,10Z", "class": "c1"}
+
+
+def test_extract_classes_merges_with_existing_classes():
+    svg = make_choropleth()
+    svg[0].set("class", "c0 highlight")
+    svg[1].set("fill", "#c00")  # same set, different attribute order
+    before = len(svg.to_string())
+    info = extract_classes(svg)
+    assert info.bytes_saved == before - len(svg.to_string())
+    assert svg[1].get("class") == "c0 highlight c1"
+    assert svg[2].get("class") == "c1"
+    assert svg[2].get("fill") is None
+
+
+def test_extract_classes_min_count_and_size():
+    svg = make_choropleth(n=3)
+    before = svg.to_string()
+    assert extract_classes(svg, min_count=4) == ExtractClassesInfo(0, 0, 0)
+    assert svg.to_string() == before
+    svg = svg_helpers.make_svg(width=10, height=10)
+    svg.add_element("rect", fill="red")
+    svg.add_element("rect", fill="red")
+    before = svg.to_string()
+    assert extract_classes(svg) == ExtractClassesInfo(0, 0, 0)
+    assert svg.to_string() == before
+
+
+def test_extract_classes_leaves_text_and_existing_styles_alone():
+    svg = make_choropleth()
+    svg.add_element("style").text = "path { stroke: black }"
+    for _ in range(3):
+        text = svg.add_element("text", fill="#c00", stroke="white")
+        text.add_element("tspan", fill="#c00", stroke="white").text = "x"
+    svg.add_element("g", **{"xml:space": "preserve", "fill": "#c00"})
+    svg.add_element("g", fill="url(#a;b)", stroke="white")
+    extract_classes(svg)
+    # stroke is set by the existing stylesheet, so it stays an attribute
+    assert svg[0].text == (
+        ".c0{fill:#c00;stroke-width:0.5}.c1{fill:#ccc;stroke-width:0.5}"
+    )
+    assert svg[1].attrib == {
+        "d": "M0,0L0,10Z",
+        "stroke": "white",
+        "class": "c0",
+    }
+    for node in [*svg.iter("text"), *svg.iter("tspan")]:
+        assert node.get("class") is None
+    assert svg[-2].get("fill") == "#c00"
+    assert svg[-1].get("fill") == "url(#a;b)"
+
+
+def test_extract_classes_parsed_namespaced_document():
+    parsed = svg_helpers.Element._from_string(make_choropleth().to_string())
+    parsed.insert(0, ElementTree.Comment("made by hand"))
+    before = len(parsed.to_string())
+    info = extract_classes(parsed)
+    assert parsed[0].tag == SVG_NS + "style"
+    assert info.bytes_saved == before - len(parsed.to_string())
@@ -0,0 +1,349 @@
+import gzip
+import hashlib
+import io
+import pathlib
+import runpy
+import tracemalloc
+from xml.etree import ElementTree
+
+import pytest
+
+import svg_helpers
+from svg_helpers.serialize import iter_markup, markup
+
+EXAMPLES = sorted(
+    (pathlib.Path(__file__).parent.parent / "examples").glob("*.py")
+)
+
+
+def make_busy_svg():
+    svg = svg_helpers.make_svg(
+        width=10,
+        height=10,
+        **{"xmlns:inkscape": "http://www.inkscape.org/namespaces/inkscape"},
+    )
+    g = svg.add_element("g", id="a&b", title='say "<hi>"\n')
+    g.text = " keep & <escape> "
+    g.add_element("rect", width=1).tail = "tail"
+    g.add_element("g").add_element("g").add_element("circle", r=1)
+    svg.recipes.add_text("one\ntwo", x=1, y=2)
+    svg.append(ElementTree.Comment(" comment "))
+    svg.append(ElementTree.ProcessingInstruction("target", "data"))
+    # ElementTree writes a None tag as its contents only.
+    untagged = ElementTree.Element(None)
+    untagged.text = "loose text"
+    ElementTree.SubElement(untagged, "rect")
+    svg.append(untagged)
+    use = svg.add_element("use")
+    use.set(ElementTree.QName("href"), ElementTree.QName("symbol"))
+    custom = svg.add_element("custom", **{"xml:space": "preserve"})
+    custom.add_element("child").add_element("grandchild")
+    svg.add_from_string(
+        '<svg xmlns="http://www.w3.org/2000/svg">'
+        "<text><tspan>A</tspan> <tspan>B</tspan></text><g><g/></g>"
+        "</svg>"
+    )
+    return svg
+
+
+@pytest.mark.parametrize("pretty", [False, True])
+@pytest.mark.parametrize("xml_declaration", [False, True])
+@pytest.mark.parametrize("short_empty_elements", [False, True])
+def test_iter_serialize_matches_to_string(
+    pretty, xml_declaration, short_empty_elements
+):
+    svg = make_busy_svg()
+    options = {
+        "pretty": pretty,
+        "xml_declaration": xml_declaration,
+        "short_empty_elements": short_empty_elements,
+    }
+    expected = svg.to_string(**options)
+    for chunk_size in (1, 10, 1 << 16):
+        chunks = svg.iter_serialize(**options, chunk_size=chunk_size)
+        assert "".join(chunks) == expected
+
+
+def test_iter_serialize_from_subelement_includes_tail():
+    svg = make_busy_svg()
+    g = svg.find("g")
+    assert "".join(g.iter_serialize(pretty=True)) == g.to_string(pretty=True)
+
+
+def test_iter_serialize_chunks_are_bounded():
+    svg = svg_helpers.make_svg(width=10, height=10)
+    for i in range(1000):
+        svg.add_element("circle", cx=i, cy=i, r=1)
+    chunks = list(svg.iter_serialize(chunk_size=100))
+    assert len(chunks) > 100
+    # A chunk only runs over by the last piece added to it.
+    assert max(len(chunk) for chunk in chunks) < 200
+
+
+def test_iter_serialize_does_not_mutate_tree():
+    svg = make_busy_svg()
+    before = [(el.text, el.tail) for el in svg.iter()]
+    for _ in svg.iter_serialize(pretty=True, chunk_size=1):
+        assert [(el.text, el.tail) for el in svg.iter()] == before
+
+
+def test_iter_serialize_rejects_bad_chunk_size():
+    svg = svg_helpers.make_svg(width=10, height=10)
+    with pytest.raises(ValueError, match="chunk_size"):
+        list(svg.iter_serialize(chunk_size=0))
+
+
+def test_save_writes_in_chunks():
+    class RecordingFile(io.StringIO):
+        def __init__(self):
+            super().__init__()
+            self.writes = 0
+
+        def write(self, s):
+            self.writes += 1
+            return super().write(s)
+
+    svg = make_busy_svg()
+    out = RecordingFile()
+    svg.save(out, chunk_size=50)
+    assert out.writes > 1
+    assert out.getvalue() == svg.to_string(pretty=True, xml_declaration=True)
+
+
+def test_save_path_matches_to_string(tmp_path):
+    svg = make_busy_svg()
+    target = tmp_path / "out.svg"
+    svg.save(target, chunk_size=16)
+    assert target.read_text(encoding="utf-8") == svg.to_string(
+        pretty=True, xml_declaration=True
+    )
+
+
+def test_save_svgz_path_is_compressed(tmp_path):
+    svg = make_busy_svg()
+    target = tmp_path / "out.SVGZ"
+    svg.save(target, chunk_size=16)
+    assert gzip.decompress(target.read_bytes()).decode("utf-8") == (
+        svg.to_string(pretty=True, xml_declaration=True)
+    )
+
+
+def test_save_compress_flag_overrides_extension(tmp_path):
+    svg = make_busy_svg()
+    plain = tmp_path / "out.svgz"
+    svg.save(plain, compress=False)
+    assert plain.read_text(encoding="utf-8") == svg.to_string(
+        pretty=True, xml_declaration=True
+    )
+    compressed = tmp_path / "out.svg"
+    svg.save(compressed, compress=True, pretty=False)
+    assert gzip.decompress(compressed.read_bytes()).decode("utf-8") == (
+        svg.to_string(xml_declaration=True)
+    )
+
+
+def test_save_compressed_to_binary_file_object():
+    svg = make_busy_svg()
+    fast = io.BytesIO()
+    svg.save(fast, compress=True, compresslevel=1)
+    best = io.BytesIO()
+    svg.save(best, compress=True, compresslevel=9)
+    for out in (fast, best):
+        assert gzip.decompress(out.getvalue()).decode("utf-8") == (
+            svg.to_string(pretty=True, xml_declaration=True)
+        )
+    # Same document, same bytes: no timestamp in the gzip header.
+    again = io.BytesIO()
+    svg.save(again, compress=True, compresslevel=9)
+    assert again.getvalue() == best.getvalue()
+
+
+def test_save_uncompressed_to_binary_file_object():
+    svg = make_busy_svg()
+    out = io.BytesIO()
+    svg.save(out)
+    assert out.getvalue() == svg.to_string(
+        pretty=True, xml_declaration=True
+    ).encode("utf-8")
+
+
+class BytesWriter:
+    """A binary file object with only a `write` method."""
+
+    def __init__(self, mode=None):
+        self.written = []
+        if mode is not None:
+            self.mode = mode
+
+    def write(self, data):
+        if not isinstance(data, bytes):
+            raise TypeError("a bytes-like object is required")
+        self.written.append(data)
+
+
+@pytest.mark.parametrize("mode", [None, "wb"])
+def test_save_uncompressed_to_duck_typed_binary_file_object(mode):
+    svg = make_busy_svg()
+    out = BytesWriter(mode)
+    svg.save(out, chunk_size=100)
+    assert len(out.written) > 1
+    assert b"".join(out.written) == svg.to_string(
+        pretty=True, xml_declaration=True
+    ).encode("utf-8")
+
+
+def test_save_bad_compresslevel():
+    with pytest.raises(ValueError, match="compresslevel"):
+        make_busy_svg().save(io.BytesIO(), compress=True, compresslevel=10)
+
+
+def make_namespaced_svg():
+    """Like `make_busy_svg`, but with nothing that `markup` hands to
+    `iter_markup`.
+
+    """
+    svg = svg_helpers.make_svg(
+        width=10,
+        height=10,
+        **{"xmlns:inkscape": "http://www.inkscape.org/namespaces/inkscape"},
+    )
+    g = svg.add_element(
+        "g", id="a&b", title='say "<hi>"\n\r\t', attrib={"inkscape:label": "x"}
+    )
+    g.text = " keep & <escape> "
+    g.add_element("rect", width=1, fill="red").tail = "tail"
+    g.add_element("rect", width=1, fill="red").tail = " "
+    g.add_element("g").add_element("g").add_element("circle", r=1)
+    svg.recipes.add_text("one\ntwo", x=1, y=2)
+    svg.append(ElementTree.Comment(" comment "))
+    svg.append(ElementTree.ProcessingInstruction("target", "data"))
+    svg.add_element("custom", **{"xml:space": "preserve"}).add_element("a")
+    # Clark-notation names, declared on the root start tag.
+    svg.add_from_string(
+        '<svg xmlns="http://www.w3.org/2000/svg" '
+        'xmlns:x="http://example.com/x" xml:space="preserve">'
+        '<x:thing x:size="2"/><text><tspan>A</tspan> <tspan>B</tspan></text>'
+        "</svg>"
+    )
+    svg.add_element("{http://example.com/y}other")
+    svg.tail = "\n"
+    return svg
+
+
+@pytest.mark.parametrize("make", [make_busy_svg, make_namespaced_svg])
+@pytest.mark.parametrize("short_empty_elements", [False, True])
+def test_markup_matches_element_tree(make, short_empty_elements):
+    svg = make()
+    assert markup(
+        svg, short_empty_elements=short_empty_elements
+    ) == ElementTree.tostring(
+        svg, encoding="unicode", short_empty_elements=short_empty_elements
+    )
+    for element in (svg, svg.find("g")):
+        assert markup(
+            element, short_empty_elements=short_empty_elements, indent="  "
+        ) == "".join(
+            iter_markup(
+                element,
+                short_empty_elements=short_empty_elements,
+                indent="  ",
+            )
+        )
+
+
+def test_markup_uses_registered_prefixes():
+    ElementTree.register_namespace("ex", "http://example.com/registered")
+    svg = svg_helpers.make_svg(width=10, height=10)
+    svg.add_element("{http://example.com/registered}thing")
+    svg.add_element("{http://example.com/other}thing")
+    expected = ElementTree.tostring(svg, encoding="unicode")
+    assert 'xmlns:ex="http://example.com/registered"' in expected
+    assert markup(svg) == expected
+
+
+def test_markup_deep_tree():
+    svg = svg_helpers.make_svg(width=10, height=10)
+    g = svg
+    for _ in range(5000):
+        g = g.add_element("g")
+    assert markup(svg) == "".join(iter_markup(svg))
+
+
+def test_markup_comment_root():
+    comment = ElementTree.Comment("just this")
+    comment.tail = "tail"
+    assert markup(comment) == ElementTree.tostring(comment, encoding="unicode")
+
+
+def test_markup_rejects_what_element_tree_rejects():
+    svg = svg_helpers.make_svg(width=10, height=10)
+    svg.add_element("rect").set("width", 1)
+    with pytest.raises(TypeError, match="cannot serialize 1"):
+        markup(svg)
+
+
+def test_markup_reuses_its_buffer():
+    svg = make_namespaced_svg()
+    first = markup(svg)
+    assert markup(svg.find("g")) == ElementTree.tostring(
+        svg.find("g"), encoding="unicode"
+    )
+    assert markup(svg) == first
+
+
+@pytest.mark.parametrize("make", [make_busy_svg, make_namespaced_svg])
+def test_content_hash(make):
+    svg = make()
+    for element in (svg, svg.find("g")):
+        markup = element.to_string().encode()
+        assert element.content_hash() == hashlib.sha256(markup).hexdigest()
+        assert element.content_hash("md5") == hashlib.md5(markup).hexdigest()
+    # Hashed a few hundred pieces at a time
+    for i in range(1000):
+        svg.add_element("circle", r=i)
+    markup = svg.to_string().encode()
+    assert svg.content_hash() == hashlib.sha256(markup).hexdigest()
+
+
+def test_content_hash_deep_tree():
+    svg = svg_helpers.make_svg(width=10, height=10)
+    g = svg
+    for _ in range(5000):
+        g = g.add_element("g")
+    expected = hashlib.sha256(markup(svg).encode()).hexdigest()
+    assert svg.content_hash() == expected
+
+
+def test_content_hash_memory():
+    svg = svg_helpers.make_svg(width=10, height=10)
+    for i in range(20000):
+        svg.add_element("g", id=f"g{i}").add_element("circle", r=i)
+    size = len(svg.to_string())
+    tracemalloc.start()
+    try:
+        svg.content_hash()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    # Pieces are hashed as they're written, not collected first.
+    assert peak < size / 10
+
+
+def test_content_hash_unknown_algorithm():
+    with pytest.raises(ValueError, match="unsupported hash type"):
+        svg_helpers.make_svg().content_hash("nope")
+
+
+@pytest.mark.parametrize("example", EXAMPLES, ids=lambda path: path.stem)
+def test_examples_serialize_like_element_tree(example, tmp_path, monkeypatch):
+    saved = []
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(
+        svg_helpers.Element,
+        "save",
+        lambda svg, *args, **kwargs: saved.append(svg),
+    )
+    runpy.run_path(str(example))
+    (svg,) = saved
+    assert svg.to_string() == ElementTree.tostring(svg, encoding="unicode")
+    assert svg.to_string(pretty=True) == "".join(iter_markup(svg, indent="  "))
@@ -1,8 +1,14 @@
+import concurrent.futures
+import re
+from decimal import Decimal
+
+import numpy
 import pytest
 import shapely
 
 import svg_helpers
-from svg_helpers.shapely_helpers import make_path
+from svg_helpers import shapely_helpers
+from svg_helpers.shapely_helpers import make_path, make_paths_from_shape
 
 
 def test_add_element_from_point():
@@ -266,3 +272,629 @@ def test_add_shape_shape_as_attribute():
 def test_from_shape_shape_as_attribute():
     g = svg_helpers.Element._from_shape(shapely.Point(1, 2), shape="circle")
     assert g.get("shape") == "circle"
+
+
+AWKWARD_COORDINATES = [
+    (0.0, -0.0),
+    (1.005, 0.125),
+    (10.0, 100.1),
+    (-123.456789, 1e-7),
+    (1e300, -1e-300),
+    (float("nan"), float("inf")),
+    (0.1 + 0.2, 2 / 3),
+]
+
+
+@pytest.mark.parametrize("precision", [None, 0, 1, 2, 3, 6, 17])
+@pytest.mark.parametrize("closed", [True, False])
+def test_make_path_array_matches_point_by_point(precision, closed):
+    # The bulk formatter must be byte-identical to formatting each
+    # coordinate on its own.
+    coordinates = numpy.array(AWKWARD_COORDINATES)
+    assert make_path(coordinates, closed=closed, precision=precision) == (
+        make_path(AWKWARD_COORDINATES, closed=closed, precision=precision)
+    )
+
+
+@pytest.mark.parametrize("dtype", ["float16", "float32", "longdouble"])
+@pytest.mark.parametrize("precision", [None, 2])
+def test_make_path_other_float_arrays_match_point_by_point(dtype, precision):
+    coordinates = numpy.array([[0.1, 0.2], [1 / 3, 2.5]], dtype=dtype)
+    expected = make_path(
+        [tuple(point) for point in coordinates], precision=precision
+    )
+    assert make_path(coordinates, precision=precision) == expected
+    if dtype == "float32" and precision is None:
+        assert expected.startswith("M0.1,0.2L")
+
+
+def test_make_path_array_ignores_extra_dimensions():
+    line = shapely.LineString([(1, 2, 3), (4, 5, 6)])
+    assert make_path(line.coords, precision=1) == "M1,2L4,5"
+
+
+def test_make_path_int_points_keep_python_formatting():
+    assert make_path([(1, 2), (3, 4)]) == "M1,2L3,4"
+    assert make_path(numpy.array([(1, 2), (3, 4)])) == "M1,2L3,4"
+
+
+def test_make_path_empty_array():
+    assert make_path(numpy.empty((0, 2)), closed=True) == ""
+
+
+def test_make_path_without_numpy(monkeypatch):
+    polygon = shapely.Point(0, 0).buffer(10)
+    expected = shapely_helpers.make_paths_from_shape(polygon, precision=3)
+    monkeypatch.setattr(shapely_helpers, "_np", None)
+    assert shapely_helpers.make_paths_from_shape(polygon, precision=3) == (
+        expected
+    )
+
+
+PATH_TOKEN = re.compile(
+    r"[MLHVZmlhvz]|[-+]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][-+]?[0-9]+)?"
+)
+
+
+def decode_path(d):
+    """Return the points a path with M/L/H/V/Z commands (absolute or
+    relative) visits, with exact decimal coordinates.
+
+    """
+    points = []
+    x = y = Decimal(0)
+    command = None
+    numbers = []
+    for token in PATH_TOKEN.findall(d):
+        if token.isalpha():
+            command = token
+            continue
+        numbers.append(Decimal(token))
+        lower = command.lower()
+        if lower in "ml" and len(numbers) == 2:
+            dx, dy = numbers
+            x, y = (x + dx, y + dy) if command == lower else (dx, dy)
+        elif lower == "h":
+            x = x + numbers[0] if command == "h" else numbers[0]
+        elif lower == "v":
+            y = y + numbers[0] if command == "v" else numbers[0]
+        else:
+            continue
+        numbers = []
+        points.append((x, y))
+        if command == "M":
+            command = "L"
+    return points
+
+
+def random_walk(n, start, seed=0):
+    rng = numpy.random.default_rng(seed)
+    steps = rng.normal(0, 0.3, (n, 2))
+    steps[::7, 0] = 0  # some vertical and horizontal segments
+    steps[::11, 1] = 0
+    return numpy.cumsum(steps, axis=0) + start
+
+
+@pytest.mark.parametrize("precision", [0, 1, 2, 3, 6])
+@pytest.mark.parametrize("start", [(0, 0), (512345.0, -4123456.0)])
+def test_compact_path_visits_the_rounded_points(precision, start):
+    coordinates = random_walk(2000, start)
+    absolute = make_path(coordinates, precision=precision)
+    compact = make_path(coordinates, precision=precision, compact=True)
+    assert len(compact) < len(absolute)
+    # Exactly the same points, so no error builds up along the path.
+    assert decode_path(compact) == decode_path(absolute)
+
+
+def test_compact_path_without_precision_is_absolute_and_exact():
+    coordinates = random_walk(500, (10.0, 10.0))
+    compact = make_path(coordinates, closed=True, compact=True)
+    assert not re.search("[lhv]", compact)
+    assert decode_path(compact) == decode_path(make_path(coordinates))
+
+
+def test_compact_path_shortest_form():
+    points = [(0, 0), (10.5, 0), (10.5, -3.25), (0.4, -0.1), (100.123, 0.5)]
+    assert make_path(points, closed=True, precision=2, compact=True) == (
+        "M0,0H10.5V-3.25L.4-.1l99.72.6Z"
+    )
+    assert make_path(points, closed=True, compact=True) == (
+        "M0,0H10.5V-3.25L.4-.1 100.123.5Z"
+    )
+
+
+def test_compact_path_beyond_float_exact_grid():
+    points = [(1e10 + 0.25, 0.5), (2e10 - 0.5, -0.75)]
+    compact = make_path(points, precision=6, compact=True)
+    assert decode_path(compact) == decode_path(make_path(points, precision=6))
+
+
+def test_compact_path_edge_cases():
+    assert make_path([], closed=True, compact=True) == ""
+    assert make_path([(1.25, 2)], closed=True, compact=True) == "M1.25,2Z"
+    nan_point = [(0, float("nan")), (1, 1)]
+    assert make_path(nan_point, precision=1, compact=True) == (
+        make_path(nan_point, precision=1)
+    )
+
+
+def test_add_shape_compact():
+    polygon = shapely.Polygon(
+        [(0, 0), (100, 0), (100, 100), (0, 100)],
+        holes=[[(10, 10), (10, 20), (20, 20), (20, 10)]],
+    )
+    svg = svg_helpers.make_svg(width=100, height=100)
+    svg.add_shape(polygon, precision=1, compact=True)
+    assert svg.find("g/path").get("d") == (
+        "M0,0H100V100H0V0ZM10,10V20H20V10H10Z"
+    )
+
+
+def test_simplify_drops_duplicates_and_straight_runs():
+    line = shapely.LineString(
+        [(0, 0), (1, 0), (2, 0.001), (2, 0), (3, 0), (3, 5), (3, 2)]
+    )
+    result = shapely_helpers.simplify_shape(line, precision=2)
+    # (2, 0.001) rounds onto (2, 0); the spike tip (3, 5) stays.
+    assert list(result.shape.coords) == [(0, 0), (3, 0), (3, 5), (3, 2)]
+    assert result.vertices_removed == 3
+
+
+def test_simplify_stays_within_tolerance_of_the_rounded_shape():
+    line = shapely.LineString(random_walk(5000, (0, 0)) / 10 + 100)
+    rounded = shapely.set_precision(line, 0.1)
+    result = shapely_helpers.simplify_shape(line, precision=1)
+    assert result.vertices_removed > len(line.coords) // 2
+    assert result.vertices_removed == (
+        len(line.coords) - len(result.shape.coords)
+    )
+    # Douglas-Peucker moves it by at most the tolerance (0.05), and
+    # rounding both lines by at most half a diagonal grid step each.
+    assert result.shape.hausdorff_distance(rounded) <= 0.05 + 0.075 * 2
+
+
+def test_simplify_tolerance():
+    circle = shapely.Point(0, 0).buffer(10, quad_segs=64)
+    no_tolerance = shapely_helpers.simplify_shape(
+        circle, precision=2, tolerance=0
+    )
+    default = shapely_helpers.simplify_shape(circle, precision=2)
+    coarse = shapely_helpers.simplify_shape(circle, precision=2, tolerance=1)
+    assert no_tolerance.vertices_removed < default.vertices_removed
+    assert default.vertices_removed < coarse.vertices_removed
+    assert coarse.shape.is_valid
+    with pytest.raises(ValueError, match="tolerance"):
+        shapely_helpers.simplify_shape(circle, tolerance=-1)
+
+
+def test_simplify_without_precision_keeps_coordinates():
+    line = shapely.LineString([(0.1, 0.1), (0.1, 0.1), (0.2, 0.2), (1, 3)])
+    result = shapely_helpers.simplify_shape(line)
+    assert list(result.shape.coords) == [(0.1, 0.1), (0.2, 0.2), (1, 3)]
+
+
+def test_simplify_keeps_z():
+    line = shapely.LineString(
+        [(0, 0, 5), (1.01, 1, 6), (2, 2, 7.25), (2, 2, 8)]
+    )
+    result = shapely_helpers.simplify_shape(line, precision=1, tolerance=0)
+    assert list(result.shape.coords) == [(0, 0, 5), (2, 2, 7.25)]
+    tiny = shapely.Polygon([(0, 0, 1), (0.01, 0, 2), (0.01, 0.01, 3)])
+    result = shapely_helpers.simplify_shape(tiny, precision=1)
+    assert [z for *_, z in result.shape.exterior.coords] == [1, 2, 3, 1]
+
+
+def test_simplify_keeps_minimum_vertex_counts():
+    tiny = shapely.Polygon([(0, 0), (0.01, 0), (0.01, 0.01)])
+    result = shapely_helpers.simplify_shape(tiny, precision=1)
+    assert len(result.shape.exterior.coords) == 4
+    line = shapely.LineString([(0, 0), (0.01, 0.01)])
+    result = shapely_helpers.simplify_shape(line, precision=1)
+    assert len(result.shape.coords) == 2
+
+
+def test_simplify_all_geometry_types():
+    square = [(0, 0), (5, 0), (10, 0), (10, 10), (0, 10)]
+    hole = [(2, 2), (2, 3), (2, 4), (4, 4), (4, 2)]
+    shape = shapely.GeometryCollection(
+        [
+            shapely.Point(1, 2),
+            shapely.MultiPoint([(1, 2), (1, 2)]),
+            shapely.LinearRing(square),
+            shapely.MultiPolygon(
+                [shapely.Polygon(square, [hole]), shapely.Polygon()]
+            ),
+            shapely.MultiLineString([[(0, 0, 1), (1, 1, 1), (2, 2, 1)]]),
+            shapely.Polygon(),
+        ]
+    )
+    result = shapely_helpers.simplify_shape(shape, precision=0)
+    assert result.vertices_removed == 4
+    assert result.shape.geom_type == "GeometryCollection"
+    assert make_paths_from_shape(result.shape, precision=0) == [
+        "M1,2Z",
+        "M1,2Z",
+        "M1,2Z",
+        "M0,0L10,0L10,10L0,10L0,0Z",
+        "M0,0L10,0L10,10L0,10L0,0ZM2,2L2,4L4,4L4,2L2,2Z",
+        "M0,0L2,2",
+    ]
+    assert shapely_helpers.simplify_shape(shapely.Polygon()).shape.is_empty
+
+
+def test_simplify_large_coordinates_and_nan():
+    line = shapely.LineString([(1e7, 0), (1e7 + 1, 0), (1e7 + 2, 0)])
+    result = shapely_helpers.simplify_shape(line, precision=6)
+    assert list(result.shape.coords) == [(1e7, 0), (1e7 + 2, 0)]
+    coords = numpy.array([(0, 0), (0, 0), (float("nan"), 1)])
+    assert shapely_helpers._simplify_coordinates(coords, False, 1).shape == (
+        3,
+        2,
+    )
+
+
+def test_add_shape_simplify():
+    circle = shapely.Point(0, 0).buffer(10, quad_segs=64)
+    svg = svg_helpers.make_svg(width=10, height=10)
+    svg.add_shape(circle, precision=1, simplify=True, tolerance=0.5)
+    simplified = shapely_helpers.simplify_shape(
+        circle, precision=1, tolerance=0.5
+    )
+    assert svg.find("g/path").get("d") == make_path(
+        simplified.shape.exterior.coords, closed=True, precision=1
+    )
+
+
+def path_polygons(d):
+    """Polygons from non-compact path data: one per "M...Z" ring, with
+    holes left as separate rings.
+
+    """
+    return [
+        shapely.Polygon(
+            [tuple(map(float, p.split(","))) for p in ring.split("L")]
+        )
+        for ring in re.findall(r"M([^Z]*)Z", d)
+    ]
+
+
+def districts(noise=0.3, seed=1):
+    """Two regions of a 10x10 box split by a noisy shared border, with
+    a lake in the left one and an island in the lake.
+
+    """
+    rng = numpy.random.default_rng(seed)
+    ys = numpy.linspace(0, 10, 200)
+    border = [(float(rng.normal(0, noise)), float(y)) for y in ys]
+    border[0], border[-1] = (0, 0), (0, 10)
+    lake = [(-4, 4), (-2, 4), (-2, 6), (-4, 6)]
+    left = shapely.Polygon([(-5, 0), *border, (-5, 10)], [lake])
+    right = shapely.Polygon([(5, 10), *border[::-1], (5, 0)])
+    island = shapely.Polygon(lake[::-1])
+    return shapely.MultiPolygon([left, right, island])
+
+
+def test_topology_shared_borders_have_no_slivers():
+    shape = districts()
+    regular = make_paths_from_shape(
+        shape, precision=1, simplify=True, tolerance=0.5
+    )
+    shared = make_paths_from_shape(
+        shape, precision=1, simplify=True, tolerance=0.5, topology=True
+    )
+    left, right = path_polygons(regular[0])[0], path_polygons(regular[1])[0]
+    assert left.intersection(right).area > 0
+
+    left, lake = path_polygons(shared[0])
+    (right,) = path_polygons(shared[1])
+    (island,) = path_polygons(shared[2])
+    assert left.intersection(right).area == 0
+    assert left.union(right).equals(shapely.box(-5, 0, 5, 10))
+    assert lake.equals(island)
+    assert len(shared[1]) < len(make_paths_from_shape(shape, precision=1)[1])
+
+
+def test_topology_without_simplify_keeps_every_vertex():
+    shape = districts()
+    shared = make_paths_from_shape(shape, precision=2, topology=True)
+    regular = make_paths_from_shape(shape, precision=2)
+    for a, b in zip(shared, regular, strict=True):
+        assert set(re.split("[MLZ]", a)) == set(re.split("[MLZ]", b))
+        for x, y in zip(path_polygons(a), path_polygons(b), strict=True):
+            assert x.equals(y)
+
+
+def test_topology_other_geometries_and_empty_parts():
+    shape = shapely.GeometryCollection(
+        [
+            shapely.Point(1, 2),
+            shapely.LineString([(0, 0), (1, 1), (2, 2)]),
+            shapely.Polygon(),
+            shapely.box(0, 0, 10, 10),
+            shapely.MultiPolygon([shapely.box(10, 0, 20, 10)]),
+        ]
+    )
+    assert make_paths_from_shape(
+        shape, precision=0, simplify=True, topology=True
+    ) == [
+        "M1,2Z",
+        "M0,0L2,2",
+        # Rings start where a shared border does.
+        "M10,0L10,10L0,10L0,0L10,0Z",
+        "M10,10L10,0L20,0L20,10L10,10Z",
+    ]
+    assert make_paths_from_shape(shapely.Polygon(), topology=True) == [""]
+    assert make_paths_from_shape(
+        shapely.GeometryCollection([shapely.Point(0, 0)]), topology=True
+    ) == ["M0.0,0.0Z"]
+
+
+def test_topology_degenerate_rings_fall_back_to_all_vertices():
+    # Slivers thinner than the tolerance would simplify away entirely.
+    sliver = shapely.Polygon([(0, 0), (10, 0.01), (20, 0), (10, -0.01)])
+    assert make_paths_from_shape(
+        sliver, precision=2, simplify=True, tolerance=0.1, topology=True
+    ) == [make_path(sliver.exterior.coords, closed=True, precision=2)]
+    shape = shapely.MultiPolygon(
+        [
+            shapely.box(0, 0, 10, 10),
+            shapely.Polygon([(0, 0), (10, 0), (5, -0.01)]),
+        ]
+    )
+    paths = make_paths_from_shape(
+        shape, precision=2, simplify=True, tolerance=0.1, topology=True
+    )
+    assert paths[1] == "M0,0L10,0L5,-0.01L0,0Z"
+    loop = numpy.array([(0, 0), (1, 0), (1, 1), (0, 0)], dtype=float)
+    assert shapely_helpers._douglas_peucker(loop, 0.1).all()
+    assert shapely_helpers._douglas_peucker(loop, 2).tolist() == [
+        True,
+        False,
+        False,
+        True,
+    ]
+
+
+def test_topology_compact_and_add_shape():
+    shape = districts()
+    svg = svg_helpers.make_svg(width=10, height=10)
+    svg.add_shape(shape, precision=1, simplify=True, topology=True)
+    paths = [path.get("d") for path in svg.iterfind("g/path")]
+    assert paths == make_paths_from_shape(
+        shape, precision=1, simplify=True, topology=True
+    )
+    compact = make_paths_from_shape(
+        shape, precision=1, simplify=True, topology=True, compact=True
+    )
+    for d, short in zip(paths, compact, strict=True):
+        assert len(short) < len(d)
+        assert decode_path(short) == decode_path(d)
+
+
+def test_viewport_culls_parts_outside():
+    shape = shapely.MultiPolygon(
+        [shapely.Point(x, 0).buffer(1) for x in range(0, 100, 10)]
+    )
+    viewport = shapely_helpers.Viewport((15, -5, 45, 5))
+    visible = viewport.cull(shape)
+    assert visible.geom_type == "GeometryCollection"
+    assert [round(p.centroid.x) for p in visible.geoms] == [20, 30, 40]
+    assert (viewport.culled, viewport.clipped) == (7, 0)
+    part = shape.geoms[2]
+    assert viewport.cull(part) is part
+    assert viewport.cull(shapely.Point(50, 50)) is None
+    assert viewport.cull(shapely.Polygon()) is None
+    assert (viewport.culled, viewport.clipped) == (8, 0)
+
+
+def test_viewport_clips_to_padded_window():
+    viewport = shapely_helpers.Viewport((0, 0, 10, 10), clip=True, padding=1)
+    line = shapely.LineString([(-20, 5), (20, 5)])
+    assert viewport.cull(line).equals(shapely.LineString([(-1, 5), (11, 5)]))
+    # Inside the padding: kept as it is.
+    box = shapely.box(-0.5, -0.5, 5, 5)
+    assert viewport.cull(box) is box
+    # The bounding box overlaps the window but the shape doesn't.
+    corner = shapely.Polygon([(-20, 0), (-20, 40), (20, 40)])
+    ring = shapely.box(-20, -20, 30, 30).exterior
+    clipped = viewport.cull(shapely.GeometryCollection([corner, ring, box]))
+    assert clipped.equals(box)
+    assert (viewport.culled, viewport.clipped) == (2, 1)
+    assert repr(viewport) == (
+        "Viewport((0.0, 0.0, 10.0, 10.0), clip=True, padding=1)"
+    )
+
+
+def test_viewport_from_svg_and_errors():
+    svg = svg_helpers.make_svg(viewBox="-10,20 30 40")
+    viewport = shapely_helpers.Viewport.from_svg(svg, clip=True)
+    assert viewport.bounds == (-10, 20, 20, 60)
+    assert viewport.clip
+    with pytest.raises(ValueError, match="has no viewBox"):
+        shapely_helpers.Viewport.from_svg(svg_helpers.make_svg())
+    with pytest.raises(ValueError, match="can't parse viewBox"):
+        shapely_helpers.Viewport.from_svg(svg_helpers.make_svg(viewBox="0 0"))
+    with pytest.raises(ValueError, match="must be"):
+        shapely_helpers.Viewport((0, 0, 1))
+    with pytest.raises(ValueError, match="must be"):
+        shapely_helpers.Viewport(None)
+    with pytest.raises(ValueError, match="empty"):
+        shapely_helpers.Viewport((0, 0, -1, 1))
+    with pytest.raises(ValueError, match="padding"):
+        shapely_helpers.Viewport((0, 0, 1, 1), padding=-1)
+
+
+def test_add_shape_viewport():
+    svg = svg_helpers.make_svg(viewBox="0 0 10 10")
+    points = shapely.MultiPoint([(1, 1), (20, 20)])
+    assert svg.add_shape(points, viewport=svg).to_string() == (
+        '<g><path d="M1.0,1.0Z" /></g>'
+    )
+    assert svg.add_shape(points, viewport=(15, 15, 25, 25)).to_string() == (
+        '<g><path d="M20.0,20.0Z" /></g>'
+    )
+    viewport = shapely_helpers.Viewport((0, 0, 10, 10), clip=True)
+    assert svg.add_shape(shapely.Point(50, 50), viewport=viewport) is None
+    line = svg.add_shape(
+        shapely.LineString([(5, 5), (15, 5)]), viewport=viewport, fill="none"
+    )
+    assert line.to_string() == (
+        '<g fill="none"><path d="M5.0,5.0L10.0,5.0" /></g>'
+    )
+    assert (viewport.culled, viewport.clipped) == (1, 1)
+    assert len(svg) == 3
+
+
+def mixed_collection():
+    return shapely.GeometryCollection(
+        [
+            big_multipolygon(),
+            shapely.LinearRing([(0, 0), (1, 0.5), (1, 1)]),
+            shapely.GeometryCollection(
+                [
+                    shapely.MultiPoint([(1, 2), (3, 4)]),
+                    shapely.LineString([(0, 0, 1), (1, 1.33333, 2)]),
+                    shapely.Polygon(),
+                ]
+            ),
+            shapely.MultiLineString([random_walk(100, (5, 5)).tolist()]),
+        ]
+    )
+
+
+def big_multipolygon():
+    return shapely.MultiPolygon(
+        [
+            shapely.Point(i * 3, j * 3).buffer(1.01, quad_segs=8)
+            for i in range(10)
+            for j in range(10)
+        ]
+    )
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {},
+        {"precision": 2, "compact": True},
+        {"precision": 1, "simplify": True},
+    ],
+)
+def test_executor_output_matches_serial(monkeypatch, options):
+    monkeypatch.setattr(shapely_helpers, "_EXECUTOR_CHUNK_COORDINATES", 100)
+    shape = mixed_collection()
+    serial = make_paths_from_shape(shape, **options)
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        assert make_paths_from_shape(shape, executor=executor, **options) == (
+            serial
+        )
+        point = shapely.Point(1, 2)
+        assert make_paths_from_shape(point, executor=executor) == ["M1.0,2.0Z"]
+
+
+def test_executor_processes_and_add_shape():
+    shape = mixed_collection()
+    serial = svg_helpers.make_svg()
+    serial.add_shape(shape, precision=2, fill="red")
+    parallel = svg_helpers.make_svg()
+    with concurrent.futures.ProcessPoolExecutor(2) as executor:
+        parallel.add_shape(shape, precision=2, fill="red", executor=executor)
+    assert parallel.to_string() == serial.to_string()
+
+
+def test_executor_with_topology_raises():
+    with (
+        concurrent.futures.ThreadPoolExecutor(1) as executor,
+        pytest.raises(ValueError, match="topology"),
+    ):
+        make_paths_from_shape(
+            big_multipolygon(), topology=True, executor=executor
+        )
+
+
+def test_add_shapes_without_wrapper_groups():
+    svg = svg_helpers.make_svg()
+    features = (
+        feature
+        for feature in [
+            (shapely.box(0, 0, 1, 1), {"fill": "red", "class_": "a"}),
+            (shapely.MultiPoint([(1, 2), (3, 4)]), {"fill": None}),
+            shapely.LineString([(0, 0), (1, 1)]),
+            (shapely.Polygon(), {"fill": "blue"}),
+        ]
+    )
+    added = svg.add_shapes(features, precision=0)
+    assert [child.to_string() for child in svg] == [
+        '<path d="M1,0L1,1L0,1L0,0L1,0Z" fill="red" class="a" />',
+        '<g><path d="M1,2Z" /><path d="M3,4Z" /></g>',
+        '<path d="M0,0L1,1" />',
+    ]
+    assert added == list(svg)
+    assert all(isinstance(node, svg_helpers.Element) for node in svg.iter())
+
+
+def test_add_shapes_attribute_mapper_and_grouping():
+    features = [
+        (shapely.Point(i, 0), {"party": "ab"[i % 2], "name": f"n{i}"})
+        for i in range(5)
+    ] + [(shapely.Point(9, 9), {"party": "c"})]
+    colors = {"a": "red", "b": "blue"}
+
+    def attributes(properties):
+        return {"fill": colors.get(properties["party"])}
+
+    svg = svg_helpers.make_svg()
+    added = svg.add_shapes(features, attributes=attributes, group=True)
+    assert svg.to_string() == (
+        '<svg xmlns="http://www.w3.org/2000/svg">'
+        '<g fill="red"><path d="M0.0,0.0Z" /><path d="M2.0,0.0Z" />'
+        '<path d="M4.0,0.0Z" /></g>'
+        '<g fill="blue"><path d="M1.0,0.0Z" /><path d="M3.0,0.0Z" /></g>'
+        '<path d="M9.0,9.0Z" />'
+        "</svg>"
+    )
+    assert added == list(svg)
+
+    svg = svg_helpers.make_svg()
+    svg.add_shapes(features, attributes=attributes)
+    assert len(svg) == 6
+    assert svg[0].attrib == {"d": "M0.0,0.0Z", "fill": "red"}
+
+
+def test_add_shapes_viewport():
+    viewport = shapely_helpers.Viewport((0, 0, 10, 10), clip=True)
+    svg = svg_helpers.make_svg()
+    svg.add_shapes(
+        [
+            shapely.Point(20, 20),
+            shapely.MultiPoint([(1, 1), (20, 20)]),
+            shapely.LineString([(5, 5), (15, 5)]),
+        ],
+        viewport=viewport,
+    )
+    assert [child.get("d") for child in svg] == [
+        "M1.0,1.0Z",
+        "M5.0,5.0L10.0,5.0",
+    ]
+    assert (viewport.culled, viewport.clipped) == (2, 1)
+    svg.add_shapes([shapely.Point(1, 1)], viewport=(0, 0, 1, 1))
+    assert len(svg) == 3
+
+
+@pytest.mark.parametrize("precision", [1, 2, 3, 6])
+def test_strip_trailing_zeros_matches_regex(precision):
+    rng = numpy.random.default_rng(precision)
+    values = numpy.concatenate(
+        [
+            rng.normal(0, 100, 500),
+            rng.integers(-100, 100, 100),
+            numpy.round(rng.normal(0, 10, 100), 1),
+            [0.0, -0.0, -0.0001, 1e20, 100.0, 0.5, float("nan"), float("inf")],
+        ]
+    ).tolist()
+    text = (f"%.{precision}f,%.{precision}f " * (len(values) // 2)) % tuple(
+        values
+    )
+    assert shapely_helpers._strip_trailing_zeros(text, precision, ", ") == (
+        shapely_helpers._TRAILING_ZEROS.sub(r"\1", text)
+    )
@@ -0,0 +1,106 @@
+import pytest
+
+import svg_helpers
+
+MARKER = (
+    '<g transform="translate({x},{y})" class="marker">'
+    '<circle r="3" fill="{color}" stroke="black" />'
+    "<text>{label}</text>"
+    "</g>"
+)
+
+
+def test_add_stamp_matches_add_from_string():
+    stamp = svg_helpers.Stamp(MARKER)
+    a = svg_helpers.make_svg(width=10, height=10)
+    b = svg_helpers.make_svg(width=10, height=10)
+    for x, y, color in [(1, 2, "red"), (3.5, 4, "blue")]:
+        a.add_stamp(stamp, x=x, y=y, color=color, label=f"{x}<{y}")
+        b.add_from_string(
+            MARKER.replace("{x}", str(x))
+            .replace("{y}", str(y))
+            .replace("{color}", color)
+            .replace("{label}", f"{x}&lt;{y}")
+        )
+    assert a.to_string() == b.to_string()
+
+
+def test_add_stamp_returns_attached_element():
+    stamp = svg_helpers.Stamp('<rect width="{w}" />')
+    svg = svg_helpers.make_svg(width=10, height=10)
+    rect = svg.add_stamp(stamp, w=2)
+    assert list(svg) == [rect]
+    assert isinstance(rect, svg_helpers.Element)
+
+
+def test_placeholders():
+    stamp = svg_helpers.Stamp(MARKER)
+    assert stamp.placeholders == {"x", "y", "color", "label"}
+
+
+def test_stamp_from_element_is_a_copy():
+    source = svg_helpers.Element("g", id="{name}")
+    source.add_element("rect", width=1).tail = "{after}"
+    stamp = svg_helpers.Stamp(source)
+    source.set("id", "changed")
+    source.append(svg_helpers.Element("circle"))
+    made = stamp.make(name="a", after="!")
+    assert made.to_string() == '<g id="a"><rect width="1" />!</g>'
+
+
+def test_copies_are_independent():
+    stamp = svg_helpers.Stamp(MARKER)
+    first = stamp.make(x=1, y=2, color="red", label="a")
+    first.set("class", "changed")
+    first.find("circle").set("stroke", "changed")
+    second = stamp.make(x=1, y=2, color="red", label="a")
+    assert second.get("class") == "marker"
+    assert second.find("circle").get("stroke") == "black"
+
+
+def test_values_are_formatted_and_none_drops_attribute():
+    stamp = svg_helpers.Stamp(
+        '<rect width="{w}" visible="{v}" title="a {t} b">{text}</rect>'
+    )
+    rect = stamp.make(w=None, v=True, t=None, text=None)
+    assert rect.to_string() == '<rect visible="true" />'
+
+
+def test_other_braces_are_kept():
+    stamp = svg_helpers.Stamp(
+        '<style data-x="{ not a placeholder }">.a { fill: {fill}; }</style>'
+    )
+    assert stamp.placeholders == {"fill"}
+    assert stamp.make(fill="red").to_string() == (
+        '<style data-x="{ not a placeholder }">.a { fill: red; }</style>'
+    )
+
+
+def test_missing_and_unknown_values_raise():
+    stamp = svg_helpers.Stamp('<rect width="{w}" height="{h}" />')
+    with pytest.raises(TypeError, match=r"missing values for \['h'\]"):
+        stamp.make(w=1)
+    with pytest.raises(TypeError, match=r"unknown placeholders \['z'\]"):
+        stamp.make(w=1, h=2, z=3)
+
+
+def test_element_class_is_used_for_nodes_and_formatting():
+    class YesNoElement(svg_helpers.Element):
+        @staticmethod
+        def format_attribute_value(value):
+            if isinstance(value, bool):
+                return "yes" if value else "no"
+            return svg_helpers.Element.format_attribute_value(value)
+
+    stamp = svg_helpers.Stamp(
+        '<g visible="{v}"><rect /></g>', element_class=YesNoElement
+    )
+    made = stamp.make(v=False)
+    assert made.get("visible") == "no"
+    assert all(isinstance(node, YesNoElement) for node in made.iter())
+
+
+def test_stamp_without_placeholders():
+    stamp = svg_helpers.Stamp('<use href="#icon" />')
+    assert stamp.placeholders == frozenset()
+    assert stamp.make().to_string() == '<use href="#icon" />'
@@ -0,0 +1,124 @@
+import gzip
+
+import pytest
+import shapely
+
+import svg_helpers
+from svg_helpers.shapely_helpers import Viewport
+from svg_helpers.tiles import export_tiles
+
+
+def make_features():
+    return [
+        (shapely.Point(x, y).buffer(4, quad_segs=8), {"fill": f"#{x:03}"})
+        for x in range(10, 100, 20)
+        for y in range(10, 60, 20)
+    ] + [(shapely.LineString([(0, 120), (128, 120)]), None)]
+
+
+def read_tiles(directory, suffix=".svg"):
+    return {
+        path.relative_to(directory).as_posix(): path.read_bytes()
+        for path in sorted(directory.rglob(f"*{suffix}"))
+    }
+
+
+def test_tiles_match_add_shape_on_each_tile(tmp_path):
+    features = make_features()
+    info = export_tiles(
+        features,
+        tmp_path,
+        bounds=(0, 0, 128, 128),
+        zooms=[2, 0, 1, 1],
+        tile_size=64,
+        precision={0: 0, 1: 1},
+        processes=0,
+    )
+    tiles = read_tiles(tmp_path)
+    assert list(tiles)[:5] == [
+        "0/0/0.svg",
+        "1/0/0.svg",
+        "1/0/1.svg",
+        "1/1/0.svg",
+        "1/1/1.svg",
+    ]
+    assert "2/0/2.svg" not in tiles  # nothing there
+    assert info.tiles == len(tiles)
+    assert info.tiles + info.empty == 1 + 4 + 16
+    assert info.clipped > 0
+
+    # Build the bottom left quarter at zoom 1 by hand.
+    svg = svg_helpers.make_svg(
+        width=64, height=64, viewBox="0.0 64.0 64.0 64.0"
+    )
+    viewport = Viewport((0, 64, 64, 128), clip=True, padding=1)
+    for shape, attributes in features:
+        svg.add_shape(
+            shape,
+            precision=1,
+            simplify=True,
+            viewport=viewport,
+            **(attributes or {}),
+        )
+    expected = tmp_path / "expected.svg"
+    svg.save(expected)
+    assert tiles["1/0/1.svg"] == expected.read_bytes()
+
+
+def test_tiles_in_worker_processes(tmp_path):
+    features = make_features()
+    options = {
+        "bounds": (0, 0, 128, 128),
+        "zooms": range(3),
+        "precision": 2,
+        "tolerance": {2: 0},
+        "pretty": False,
+    }
+    serial = export_tiles(features, tmp_path / "a", processes=0, **options)
+    pooled = export_tiles(features, tmp_path / "b", processes=2, **options)
+    assert serial == pooled
+    assert read_tiles(tmp_path / "a") == read_tiles(tmp_path / "b")
+
+
+def test_tiles_svgz_and_empty(tmp_path):
+    info = export_tiles(
+        [(shapely.box(1.5, 1.5, 2, 2), {"id": "a"})],
+        tmp_path,
+        bounds=(0, 0, 10, 10),
+        zooms=[3],
+        suffix=".svgz",
+        processes=0,
+    )
+    assert (info.tiles, info.empty, info.culled, info.clipped) == (1, 63, 0, 0)
+    (data,) = read_tiles(tmp_path, ".svgz").values()
+    assert b'<g id="a">' in gzip.decompress(data)
+
+    info = export_tiles([], tmp_path, bounds=(0, 0, 1, 1), zooms=[0, 1])
+    assert (info.tiles, info.empty) == (0, 5)
+    info = export_tiles(
+        [(shapely.Point(5, 5), {})],
+        tmp_path,
+        bounds=(10, 10, 20, 20),
+        zooms=[1],
+        processes=0,
+    )
+    assert (info.tiles, info.empty) == (0, 4)
+
+
+def test_tiles_errors(tmp_path):
+    features = make_features()
+    bounds = (0, 0, 1, 1)
+    with pytest.raises(ValueError, match="zooms must be"):
+        export_tiles(features, tmp_path, bounds=bounds, zooms=[-1])
+    with pytest.raises(ValueError, match="zooms must be"):
+        export_tiles(features, tmp_path, bounds=bounds, zooms=[True])
+    with pytest.raises(ValueError, match="precision must be"):
+        export_tiles(
+            features, tmp_path, bounds=bounds, zooms=[0], precision={0: -1}
+        )
+    with pytest.raises(ValueError, match="processes"):
+        export_tiles(
+            features, tmp_path, bounds=bounds, zooms=[0], processes=-1
+        )
+    with pytest.raises(ValueError, match="bounds"):
+        export_tiles(features, tmp_path, bounds=(1, 1, 0, 0), zooms=[0])